@@ -0,0 +1,62 @@
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text.Json;
+using System.Text.Json.Nodes;
+using System.Text.Json.Serialization;
+using Nuform.Core.Domain;
+using Nuform.Core.Services;
+using Xunit;
+
+namespace Nuform.Tests;
+
+// Golden/bom_cases.json is shared with the Python port (utils/bom.py), which
+// checks itself against the same expectations with `python -m utils.bom --golden`.
+public class BomGoldenTests
+{
+    static readonly JsonSerializerOptions Options = new() { Converters = { new JsonStringEnumConverter() } };
+
+    public static IEnumerable<object[]> Cases()
+    {
+        var path = Path.Combine(AppContext.BaseDirectory, "Golden", "bom_cases.json");
+        foreach (var c in JsonNode.Parse(File.ReadAllText(path))!.AsArray())
+            yield return new object[] { c!["name"]!.GetValue<string>() };
+    }
+
+    static JsonNode Case(string name)
+    {
+        var path = Path.Combine(AppContext.BaseDirectory, "Golden", "bom_cases.json");
+        return JsonNode.Parse(File.ReadAllText(path))!.AsArray().Single(c => c!["name"]!.GetValue<string>() == name)!;
+    }
+
+    [Theory]
+    [MemberData(nameof(Cases))]
+    public void BomMatchesGolden(string name)
+    {
+        var c = Case(name);
+        var input = c["input"].Deserialize<BuildingInput>(Options)!;
+        var expected = c["expected"]!;
+
+        var result = CalcService.CalcEstimate(input);
+        var bom = BomService.Build(input, result, new CatalogService(), out var missing);
+
+        Assert.Equal(expected["basePanels"]!.GetValue<int>(), result.Panels.BasePanels);
+        Assert.Equal(expected["roundedPanels"]!.GetValue<int>(), result.Panels.RoundedPanels);
+        Assert.Equal(expected["jTrimLF"]!.GetValue<double>(), result.Trims.JTrimLF, 6);
+        Assert.Equal(expected["insideCorners"]!.GetValue<int>(), result.InsideCorners);
+        Assert.Equal(expected["missing"]!.GetValue<bool>(), missing);
+
+        var lines = expected["bom"]!.AsArray();
+        Assert.Equal(lines.Count, bom.Count);
+        for (int i = 0; i < bom.Count; i++)
+        {
+            Assert.Equal(lines[i]!["partNumber"]!.GetValue<string>(), bom[i].PartNumber);
+            Assert.Equal(lines[i]!["name"]!.GetValue<string>(), bom[i].Name);
+            Assert.Equal(lines[i]!["quantity"]!.GetValue<decimal>(), bom[i].Quantity);
+            Assert.Equal(lines[i]!["unit"]!.GetValue<string>(), bom[i].Unit);
+            Assert.Equal(lines[i]!["category"]!.GetValue<string>(), bom[i].Category);
+            Assert.Equal(lines[i]!["overage"]!.GetValue<decimal>(), bom[i].Overage);
+        }
+    }
+}
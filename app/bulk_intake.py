@@ -0,0 +1,292 @@
+"""Bulk intake: many jobs from one CSV or JSON Lines upload.
+
+Each record carries the same fields as the intake form (``client``,
+``site_address``, ``building_height``, ``segments_json``...). In JSON Lines,
+``segments``/``openings`` may be given as arrays and ``exclusions`` as a
+list. Records are read from the upload as a stream and validated in
+chunks on a process pool. Every chunk's valid bundles get one contiguous
+block of job ids from the allocator and are written by a small thread
+pool. Only a bounded number of chunks is in flight at any time, so memory
+stays flat however large the upload is.
+
+``run_bulk`` yields one report row per record, in input order. A bad
+record is reported and skipped; it never stops the rest of the upload.
+
+    python -m app.bulk_intake bench --count 50000
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Mapping
+
+import orjson
+from pydantic import ValidationError
+
+from app.job_ids import JobIdAllocator, format_job_id, today
+from schema.job_schema import JobBundle
+from schema.run_index import index_for
+
+CHUNK = int(os.getenv("BULK_CHUNK", "500"))
+WORKERS = int(os.getenv("BULK_WORKERS", "0")) or os.cpu_count() or 1
+WRITERS = int(os.getenv("BULK_WRITERS", "4"))
+
+
+def _float(value, message: str) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        raise ValueError(message) from None
+
+
+def _json_list(fields: Mapping, key: str) -> list:
+    value = fields.get(key)
+    if value is None:
+        value = fields.get(f"{key}_json") or "[]"
+    if isinstance(value, (str, bytes)):
+        try:
+            value = orjson.loads(value)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Invalid {key}_json: {e}") from None
+    return value
+
+
+def bundle_from_fields(fields: Mapping) -> JobBundle:
+    """Validate the intake form's fields (or one bulk record) into a bundle.
+
+    The job id and ``outputs.project_root`` are left blank for the caller
+    to fill in once the record is known to be valid.
+
+    Raises ``ValueError`` with a message fit for the user; pydantic's
+    ``ValidationError`` is one.
+    """
+    text = lambda k, default="": str(fields.get(k) or default).strip()
+    client, site_address = text("client"), text("site_address")
+    if not client or not site_address:
+        raise ValueError("Client and site address required")
+    exclusions = fields.get("exclusions") or ""
+    if isinstance(exclusions, str):
+        exclusions = [e.strip() for e in exclusions.split(",") if e.strip()]
+    # One model_validate call so the whole footprint is checked in pydantic's native code.
+    return JobBundle.model_validate({
+        "job": {"id": "", "client": client, "site_address": site_address,
+                "estimator": text("estimator"), "estimate_type": text("estimate_type", "NSD")},
+        "building": {"type": text("building_type"), "material": text("building_material"),
+                     "height_ft": _float(fields.get("building_height"), "Invalid building height")},
+        "footprint": {"segments": _json_list(fields, "segments"), "openings": _json_list(fields, "openings")},
+        "scope": {"description": text("scope_description"), "exclusions": exclusions},
+        "outputs": {"project_root": ""},
+    })
+
+
+def error_message(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    return str(e)
+
+
+# -- reading -----------------------------------------------------------------------
+
+
+def detect_format(filename: str | None, content_type: str | None) -> str:
+    name = (filename or "").lower().removesuffix(".gz")
+    if name.endswith(".csv") or (content_type or "").startswith("text/csv"):
+        return "csv"
+    return "jsonl"
+
+
+def iter_records(stream: IO[bytes], fmt: str, gzipped: bool = False) -> Iterator[dict | Exception]:
+    """Yield each record as a dict, or the exception that made it unreadable."""
+    if gzipped:
+        stream = gzip.GzipFile(fileobj=stream)
+    if fmt == "csv":
+        # A stray non-UTF-8 byte (a sheet saved as cp1252) spoils its row only, not the upload.
+        for row in csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")):
+            if any("\ufffd" in v for v in row.values() if isinstance(v, str)):
+                yield ValueError("Row is not valid UTF-8; save the CSV as UTF-8")
+            else:
+                yield row
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            rec = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+            continue
+        yield rec if isinstance(rec, dict) else ValueError("Expected a JSON object")
+
+
+def _validate_chunk(records: list) -> list:
+    # Runs in the pool: a dumped bundle (job id still blank) or the error text, per record.
+    out = []
+    for rec in records:
+        try:
+            if isinstance(rec, Exception):
+                raise rec
+            out.append(bundle_from_fields(rec).model_dump())
+        except ValueError as e:
+            out.append(error_message(e))
+    return out
+
+
+def _chunks(records: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# -- writing -----------------------------------------------------------------------
+
+
+def _write_chunk(base_dir: Path, bundles: list[dict]) -> list[str]:
+    paths = []
+    for data in bundles:
+        p = base_dir / data["job"]["id"] / "job.json"
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(orjson.dumps(data))
+        paths.append(str(p))
+    return paths
+
+
+def run_bulk(
+    records: Iterable[dict | Exception],
+    base_dir: str | os.PathLike,
+    allocator: JobIdAllocator,
+    pool: Executor | None = None,
+    chunk: int = CHUNK,
+    writers: int = WRITERS,
+    window: int = 2 * WORKERS,
+) -> Iterator[dict]:
+    """Validate, number and save ``records``; yield ``{"row", "ok", "job_id"|"error", ...}`` in order.
+
+    ``pool`` validates chunks (``None`` validates inline), at most
+    ``window`` chunks ahead of the writers. Ids for a chunk are reserved in
+    one call, so they are contiguous and only valid records consume them.
+    """
+    base_dir = Path(base_dir)
+    index = index_for(base_dir)
+    validating: deque[tuple[int, Future | list]] = deque()
+    writing: deque[tuple[int, list, Future]] = deque()
+    row = 0
+
+    with ThreadPoolExecutor(max_workers=writers) as write_pool:
+
+        def number_and_write(first_row: int, results: list) -> None:
+            ok = [r for r in results if isinstance(r, dict)]
+            if ok:
+                day = today()
+                first = allocator.reserve(day, len(ok))
+                for i, data in enumerate(ok):
+                    job_id = format_job_id(day, first + i)
+                    data["job"]["id"] = job_id
+                    data["outputs"]["project_root"] = str(base_dir / job_id)
+            writing.append((first_row, results, write_pool.submit(_write_chunk, base_dir, ok)))
+
+        def report(first_row: int, results: list, done: Future) -> list[dict]:
+            paths = iter(done.result())
+            rows, saved = [], []
+            for i, r in enumerate(results):
+                if isinstance(r, dict):
+                    path = next(paths)
+                    saved.append((r, path))
+                    rows.append({"row": first_row + i, "ok": True, "job_id": r["job"]["id"], "path": path})
+                else:
+                    rows.append({"row": first_row + i, "ok": False, "error": r})
+            # Index before reporting, so a client that hangs up mid-report leaves no unindexed runs.
+            index.record_many(saved)
+            return rows
+
+        def drain(limit_validating: int, limit_writing: int) -> Iterator[dict]:
+            while len(validating) > limit_validating:
+                first_row, fut = validating.popleft()
+                number_and_write(first_row, fut.result() if isinstance(fut, Future) else fut)
+                while len(writing) > limit_writing:
+                    yield from report(*writing.popleft())
+            while len(writing) > limit_writing:
+                yield from report(*writing.popleft())
+
+        for batch in _chunks(records, chunk):
+            first_row = row + 1
+            row += len(batch)
+            validating.append((first_row, pool.submit(_validate_chunk, batch) if pool else _validate_chunk(batch)))
+            yield from drain(max(1, window), writers)
+        yield from drain(0, 0)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_pid: int | None = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """The validation pool, started on first use and kept for later uploads."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool, _pool_pid = ProcessPoolExecutor(max_workers=WORKERS), os.getpid()
+    return _pool
+
+
+# -- benchmark ---------------------------------------------------------------------
+
+
+def _synthetic(count: int, bad_every: int = 50) -> Iterator[bytes]:
+    segs = orjson.dumps([{"length_ft": 40 + k, "angle_deg": 90.0 * k} for k in range(4)]).decode()
+    for i in range(count):
+        rec = {"client": f"Client {i % 700}", "site_address": f"{i} Tender Rd", "estimator": "Bulk",
+               "building_type": "Warehouse", "building_material": "RELINEPRO", "building_height": 12 + i % 18,
+               "segments_json": segs, "openings": [{"type": "door", "width_ft": 3, "height_ft": 7,
+                                                   "wall_index": i % 4, "offset_ft": 2}],
+               "exclusions": "Permits, Electrical"}
+        if bad_every and i % bad_every == bad_every - 1:
+            rec["building_height"] = "tall"
+        yield orjson.dumps(rec) + b"\n"
+
+
+def _bench(count: int, workers: int) -> None:
+    import resource
+    import tempfile
+    import time
+
+    from app.job_ids import make_allocator
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "upload.jsonl"
+        with open(src, "wb") as f:
+            f.writelines(_synthetic(count))
+        runs = Path(tmp) / "runs"
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            t0 = time.perf_counter()
+            with open(src, "rb") as f:
+                rows = run_bulk(iter_records(f, "jsonl"), runs, make_allocator(runs, block=0), pool)
+                ok = sum(1 for r in rows if r["ok"])
+            dt = time.perf_counter() - t0
+        finally:
+            if pool:
+                pool.shutdown()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{count} records, {workers} workers: {ok} saved, {count - ok} rejected in {dt:.2f} s "
+              f"({count / dt * 60:,.0f} jobs/min), peak RSS {peak:.0f} MB")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Bulk intake benchmark.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    be = sub.add_parser("bench")
+    be.add_argument("--count", type=int, default=50_000)
+    be.add_argument("--workers", type=int, default=WORKERS)
+    a = ap.parse_args()
+    _bench(a.count, a.workers)
@@ -1,23 +1,17 @@
 from __future__ import annotations
 
-import json
 import os
-from datetime import datetime
+import tempfile
+from dataclasses import asdict
 from pathlib import Path
 
+import orjson
 from dotenv import load_dotenv
-from flask import Flask, redirect, render_template, request, url_for
-
-from schema.job_schema import (
-    Building,
-    Footprint,
-    JobBundle,
-    JobInfo,
-    Opening,
-    Outputs,
-    Scope,
-    Segment,
-)
+from flask import Flask, jsonify, redirect, render_template, request, send_file, url_for
+
+from app.bulk_intake import bundle_from_fields, detect_format, error_message, get_pool, iter_records, run_bulk
+from app.job_ids import format_job_id, make_allocator, today
+from schema.run_index import index_for
 
 # load environment variables
 load_dotenv()
@@ -26,18 +20,13 @@ BASE_RUN_DIR = os.getenv("BASE_RUN_DIR", "./runs")
 app = Flask(__name__)
 
 
+_allocator = make_allocator(BASE_RUN_DIR)
+
+
 def make_job_id(client: str) -> str:
-    """Generate job id J-YYYYMMDD-### using a counter file."""
-    today = datetime.now().strftime("%Y%m%d")
-    counter_file = Path(BASE_RUN_DIR) / ".counter"
-    counter_file.parent.mkdir(parents=True, exist_ok=True)
-    try:
-        counter = int(counter_file.read_text())
-    except FileNotFoundError:
-        counter = 0
-    counter += 1
-    counter_file.write_text(str(counter))
-    return f"J-{today}-{counter:03d}"
+    """Generate job id J-YYYYMMDD-### from the configured allocator."""
+    day = today()
+    return format_job_id(day, _allocator.reserve(day))
 
 
 @app.get("/")
@@ -48,58 +37,76 @@ def index():
 
 @app.post("/save")
 def save():
-    form = request.form
-    client = form.get("client", "").strip()
-    site_address = form.get("site_address", "").strip()
-    estimator = form.get("estimator", "").strip()
-    estimate_type = form.get("estimate_type", "NSD")
-
-    if not client or not site_address:
-        return "Client and site address required", 400
-
-    building_type = form.get("building_type", "")
-    building_material = form.get("building_material", "")
     try:
-        building_height = float(form.get("building_height", 0))
-    except ValueError:
-        return "Invalid building height", 400
-
-    description = form.get("scope_description", "")
-    exclusions_csv = form.get("exclusions", "")
-    exclusions = [e.strip() for e in exclusions_csv.split(",") if e.strip()]
-
-    segments_data = json.loads(form.get("segments_json", "[]"))
-    openings_data = json.loads(form.get("openings_json", "[]"))
-
-    segments = [Segment.model_validate(s) for s in segments_data]
-    openings = [Opening.model_validate(o) for o in openings_data]
+        bundle = bundle_from_fields(request.form)
+    except ValueError as e:
+        return error_message(e), 400
 
-    job_id = make_job_id(client)
+    # Numbered only once valid, so rejected forms do not burn ids.
+    job_id = make_job_id(bundle.job.client)
     run_dir = Path(BASE_RUN_DIR) / job_id
-
-    bundle = JobBundle(
-        job=JobInfo(
-            id=job_id,
-            client=client,
-            site_address=site_address,
-            estimator=estimator,
-            estimate_type=estimate_type,
-        ),
-        building=Building(type=building_type, material=building_material, height_ft=building_height),
-        footprint=Footprint(segments=segments, openings=openings),
-        scope=Scope(description=description, exclusions=exclusions),
-        outputs=Outputs(project_root=str(run_dir)),
-    )
+    bundle.job.id = job_id
+    bundle.outputs.project_root = str(run_dir)
 
     path = bundle.to_json(str(run_dir / "job.json"))
     return redirect(url_for("done", job_id=job_id, path=path))
 
 
+@app.post("/bulk")
+def bulk():
+    """Save many jobs from a CSV or JSON Lines upload (``file`` field or raw body).
+
+    Returns one JSON line per record (``row`` counts records from 1) and a
+    final ``summary`` line. ``?format=csv|jsonl`` overrides detection.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, name, mimetype = upload.stream, upload.filename, upload.mimetype
+    else:
+        stream, name, mimetype = request.stream, None, request.mimetype
+    fmt = request.args.get("format") or detect_format(name, mimetype)
+    if fmt not in ("csv", "jsonl"):
+        return "format must be csv or jsonl", 400
+    gzipped = (name or "").endswith(".gz") or request.headers.get("Content-Encoding") == "gzip"
+
+    # The upload is closed once this view returns, so it is consumed here and the
+    # report is spooled (to disk past 1 MB) rather than held in memory.
+    report = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    saved = rejected = 0
+    for row in run_bulk(iter_records(stream, fmt, gzipped), BASE_RUN_DIR, _allocator, get_pool()):
+        saved += row["ok"]
+        rejected += not row["ok"]
+        report.write(orjson.dumps(row) + b"\n")
+    report.write(orjson.dumps({"summary": {"saved": saved, "rejected": rejected}}) + b"\n")
+    report.seek(0)
+    return send_file(report, mimetype="application/x-ndjson")
+
+
 @app.get("/done/<job_id>")
 def done(job_id: str):
-    run_dir = Path(BASE_RUN_DIR) / job_id
-    path = run_dir / "job.json"
-    return render_template("done.html", job_id=job_id, path=str(path))
+    summary = index_for(BASE_RUN_DIR).get(job_id)
+    path = summary.path if summary else str(Path(BASE_RUN_DIR) / job_id / "job.json")
+    return render_template("done.html", job_id=job_id, path=path)
+
+
+@app.get("/runs")
+def runs():
+    """Search the run index; all filters are optional query parameters."""
+    args = request.args
+    try:
+        limit = min(int(args.get("limit", 100)), 1000)
+    except ValueError:
+        return "Invalid limit", 400
+    rows = index_for(BASE_RUN_DIR).search(
+        client=args.get("client"),
+        site_address=args.get("site_address"),
+        estimator=args.get("estimator"),
+        estimate_type=args.get("estimate_type"),
+        since=args.get("since"),
+        until=args.get("until"),
+        limit=limit,
+    )
+    return jsonify([asdict(r) for r in rows])
 
 
 if __name__ == "__main__":
@@ -1,29 +1,327 @@
 
-import smtplib
-from email.message import EmailMessage
+"""Outbox-based mailer with pooled SMTP connections.
+
+``queue_email`` writes a complete MIME message to ``<outbox_dir>/<id>.eml``,
+streaming and base64-encoding attachments straight from their file handles,
+then commits it by writing the ``<id>.json`` envelope. ``flush_outbox``
+sends every committed message over a pool of authenticated connections and
+retries each message on its own; messages that still fail move to
+``failed/`` without holding up the rest of the batch. A message some of
+whose recipients were refused is sent to the rest, and a copy with just
+the refused ones (and why) lands in ``failed/`` too. ``send_email`` keeps
+its old signature: queue one message, then flush.
+"""
+import base64, json, os, pathlib, random, smtplib, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.header import Header
+from email.utils import formataddr, formatdate, make_msgid, parseaddr
+from functools import lru_cache
+from ..metrics import RETRIES, external_call
 from ..settings import settings
 from jinja2 import Environment, FileSystemLoader
 
-env = Environment(loader=FileSystemLoader("templates"))
+# Templates ship with the code, so skip Jinja's per-render mtime check.
+env = Environment(loader=FileSystemLoader("templates"), auto_reload=False)
+
+PLAIN_FALLBACK = "HTML email required. Please view in an HTML-capable client."
+B64_CHUNK = 57 * 1024  # whole 57-byte groups -> whole 76-char base64 lines
+SEND_BUFFER = 64 * 1024
+
+@lru_cache(maxsize=None)
+def _template(name:str):
+    return env.get_template(name)
 
 def render_email(context:dict)->str:
-    tmpl = env.get_template("email.html.j2")
-    return tmpl.render(**context)
+    return _template("email.html.j2").render(**context)
+
+# -- composing ----------------------------------------------------------------
+
+def _header(value:str)->str:
+    # Subjects and recipients come from job specs; a line break would start a header of its own.
+    if "\r" in value or "\n" in value:
+        raise ValueError(f"line break in email header value {value!r}")
+    try:
+        value.encode("ascii")
+        return value
+    except UnicodeEncodeError:
+        return Header(value, "utf-8").encode()
+
+def _address(value:str)->str:
+    """One ``To``/``From`` entry, display name encoded if it is not ASCII."""
+    _header(value)
+    name, addr = parseaddr(value)
+    if not addr or "@" not in addr:
+        raise ValueError(f"not an email address: {value!r}")
+    return formataddr((name, addr), charset="utf-8")
+
+def _write_b64(out, src):
+    for chunk in iter(lambda: src.read(B64_CHUNK), b""):
+        out.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+
+def _write_message(out, sender:str, to:list[str], subject:str, html:str, attachments:list[str]):
+    mixed, alt = f"mixed-{uuid.uuid4().hex}", f"alt-{uuid.uuid4().hex}"
+    w = lambda s: out.write(s.encode("utf-8"))
+    w(f"From: {_address(sender)}\r\nTo: {', '.join(map(_address, to))}\r\nSubject: {_header(subject)}\r\n"
+      f"Date: {formatdate(localtime=True)}\r\nMessage-ID: {make_msgid()}\r\nMIME-Version: 1.0\r\n"
+      f'Content-Type: multipart/mixed; boundary="{mixed}"\r\n\r\n')
+    w(f'--{mixed}\r\nContent-Type: multipart/alternative; boundary="{alt}"\r\n\r\n')
+    w(f'--{alt}\r\nContent-Type: text/plain; charset="utf-8"\r\nContent-Transfer-Encoding: 7bit\r\n\r\n{PLAIN_FALLBACK}\r\n')
+    w(f'--{alt}\r\nContent-Type: text/html; charset="utf-8"\r\nContent-Transfer-Encoding: base64\r\n\r\n')
+    out.write(base64.encodebytes(html.encode("utf-8")).replace(b"\n", b"\r\n"))
+    w(f"--{alt}--\r\n")
+    for path in attachments:
+        name = _header(os.path.basename(path).replace('"', ""))
+        w(f'--{mixed}\r\nContent-Type: application/pdf; name="{name}"\r\n'
+          f'Content-Disposition: attachment; filename="{name}"\r\nContent-Transfer-Encoding: base64\r\n\r\n')
+        with open(path, "rb") as src:
+            _write_b64(out, src)
+    w(f"--{mixed}--\r\n")
+
+# -- outbox -------------------------------------------------------------------
+
+def _outbox()->pathlib.Path:
+    return pathlib.Path(settings.outbox_dir)
+
+def queue_email(to:str|list[str], subject:str, html:str, attachments:list[str]|None=None)->str:
+    """Write the message to the outbox and return its id; nothing is sent yet."""
+    box = _outbox()
+    box.mkdir(parents=True, exist_ok=True)
+    msg_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    rcpts = [to] if isinstance(to, str) else list(to)
+    eml = box / f"{msg_id}.eml"
+    tmp = box / f".{msg_id}.eml.tmp"
+    with open(tmp, "wb") as out:
+        _write_message(out, settings.smtp_from, rcpts, subject, html, attachments or [])
+    os.replace(tmp, eml)
+    envelope = {"id": msg_id, "from": parseaddr(settings.smtp_from)[1], "to": [parseaddr(r)[1] for r in rcpts], "attempts": 0}
+    (box / f".{msg_id}.json.tmp").write_text(json.dumps(envelope), encoding="utf-8")
+    os.replace(box / f".{msg_id}.json.tmp", box / f"{msg_id}.json")
+    return msg_id
+
+# -- SMTP pool ----------------------------------------------------------------
+
+class SmtpPool:
+    def __init__(self, size:int|None=None, idle_check:float=30.0):
+        self.size = size or settings.smtp_pool_size
+        self.idle_check = idle_check
+        self._idle: list[tuple[smtplib.SMTP, float]] = []  # most recently used last
+        self._created = 0
+        # Notified whenever a connection comes back or a slot frees up (dropped or failed to connect).
+        self._cond = threading.Condition()
+
+    def _connect(self)->smtplib.SMTP:
+        s = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=60)
+        s.ehlo()
+        try:
+            if settings.smtp_starttls:
+                # Fail closed: a server that does not offer STARTTLS never sees the credentials.
+                if not s.has_extn("starttls"):
+                    raise smtplib.SMTPNotSupportedError("SMTP server does not offer STARTTLS (SMTP_STARTTLS is on)")
+                s.starttls()
+                s.ehlo()
+            if settings.smtp_user:
+                s.login(settings.smtp_user, settings.smtp_pass)
+        except BaseException:
+            s.close()
+            raise
+        return s
+
+    def _get(self)->smtplib.SMTP:
+        while True:
+            with self._cond:
+                while not self._idle and self._created >= self.size:
+                    self._cond.wait()
+                if not self._idle:
+                    self._created += 1
+                    break
+                conn, last_used = self._idle.pop()
+            if time.monotonic() - last_used < self.idle_check:
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except OSError:  # SMTPException included
+                pass
+            self._drop(conn)
+        try:
+            return self._connect()
+        except BaseException:
+            self._free_slot()
+            raise
+
+    def _put(self, conn:smtplib.SMTP):
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _free_slot(self):
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def _drop(self, conn:smtplib.SMTP):
+        self._free_slot()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self._get()
+        try:
+            yield conn
+        except smtplib.SMTPServerDisconnected:
+            self._drop(conn)
+            raise
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # A refused message leaves the session usable once reset.
+            try:
+                conn.rset()
+            except Exception:
+                self._drop(conn)
+                raise
+            self._put(conn)
+            raise
+        except BaseException:
+            # Socket errors and anything unexpected: the session state is unknown.
+            self._drop(conn)
+            raise
+        else:
+            self._put(conn)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.quit()
+            except Exception:
+                conn.close()
+
+def _send_file(conn:smtplib.SMTP, sender:str, rcpts:list[str], path:pathlib.Path):
+    """SMTP MAIL/RCPT/DATA, streaming the message file with dot-stuffing."""
+    code, resp = conn.mail(sender)
+    if code != 250:
+        raise smtplib.SMTPSenderRefused(code, resp, sender)
+    refused = {}
+    for r in rcpts:
+        code, resp = conn.rcpt(r)
+        if code not in (250, 251):
+            refused[r] = (code, resp)
+    if len(refused) == len(rcpts):
+        conn.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+    code, resp = conn.docmd("DATA")
+    if code != 354:
+        raise smtplib.SMTPDataError(code, resp)
+    buf = bytearray()
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"."):
+                buf += b"."
+            buf += line
+            if len(buf) >= SEND_BUFFER:
+                conn.send(bytes(buf))
+                buf.clear()
+    if not buf.endswith(b"\r\n"):
+        buf += b"\r\n"
+    buf += b".\r\n"
+    conn.send(bytes(buf))
+    code, resp = conn.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
+
+def _park(box:pathlib.Path, envelope:dict, eml:pathlib.Path, keep_eml:bool=False):
+    # Envelope first: a message in failed/ always says why.
+    failed = box / "failed"
+    failed.mkdir(exist_ok=True)
+    (failed / f"{envelope['id']}.json").write_text(json.dumps(envelope), encoding="utf-8")
+    if keep_eml:
+        os.replace(eml, failed / eml.name)
+
+def _deliver(pool:SmtpPool, box:pathlib.Path, env_path:pathlib.Path, retries:int)->tuple[str, bool|None, str|dict|None]:
+    """``(id, True, refused recipients or None)``, ``(id, False, error)``, or ``(id, None, reason)`` if skipped."""
+    try:
+        envelope = json.loads(env_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        # Sent or parked by a concurrent flush, or an id that was never queued.
+        return env_path.stem, None, "no such message in the outbox"
+    eml = box / f"{envelope['id']}.eml"
+    if not eml.exists():
+        env_path.unlink(missing_ok=True)
+        return envelope["id"], None, "message file missing"
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            RETRIES.inc(service="smtp")
+        envelope["attempts"] += 1
+        try:
+            with external_call("smtp", "send"), pool.connection() as conn:
+                refused = _send_file(conn, envelope["from"], envelope["to"], eml)
+            if refused:
+                refused = {r: f"{code} {resp.decode(errors='replace') if isinstance(resp, bytes) else resp}"
+                           for r, (code, resp) in refused.items()}
+                _park(box, {**envelope, "to": sorted(refused), "refused": refused, "sent_to":
+                            [r for r in envelope["to"] if r not in refused]}, eml, keep_eml=True)
+            else:
+                eml.unlink(missing_ok=True)
+            env_path.unlink(missing_ok=True)
+            return envelope["id"], True, refused or None
+        except smtplib.SMTPResponseException as e:
+            error = repr(e)
+            if e.smtp_code >= 500:
+                break
+            if attempt < retries:
+                time.sleep(random.uniform(0, min(10.0, 0.5 * 2 ** attempt)))
+        except smtplib.SMTPRecipientsRefused as e:
+            error = repr(e)
+            break
+        except OSError as e:  # includes the remaining SMTPExceptions
+            error = repr(e)
+            if attempt < retries:
+                time.sleep(random.uniform(0, min(10.0, 0.5 * 2 ** attempt)))
+    envelope["error"] = error
+    try:
+        _park(box, envelope, eml, keep_eml=True)
+    except FileNotFoundError:
+        pass  # a concurrent flush got to it first; its envelope copy stands
+    env_path.unlink(missing_ok=True)
+    return envelope["id"], False, error
+
+_pool: SmtpPool | None = None
+
+def get_pool()->SmtpPool:
+    global _pool
+    if _pool is None:
+        _pool = SmtpPool()
+    return _pool
+
+def flush_outbox(pool:SmtpPool|None=None, retries:int|None=None, ids:list[str]|None=None)->dict:
+    """Send queued messages (all, or just ``ids``) over the pool; one failure never drops the batch."""
+    pool = pool or get_pool()
+    retries = settings.smtp_retries if retries is None else retries
+    box = _outbox()
+    if ids is None:
+        envs = sorted(box.glob("*.json")) if box.exists() else []
+    else:
+        envs = [box / f"{i}.json" for i in ids]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=pool.size) as ex:
+        results = list(ex.map(lambda p: _deliver(pool, box, p, retries), envs))
+    elapsed = time.perf_counter() - t0
+    sent = [r[0] for r in results if r[1]]
+    failed = {r[0]: r[2] for r in results if r[1] is False}
+    return {"sent": len(sent), "failed": failed, "elapsed_s": round(elapsed, 3),
+            "refused": {r[0]: r[2] for r in results if r[1] and r[2]},
+            "skipped": {r[0]: r[2] for r in results if r[1] is None},
+            "per_second": round(len(sent) / elapsed, 1) if elapsed and sent else None}
 
 def send_email(to:str, subject:str, html:str, attachments:list[str]|None=None):
-    msg = EmailMessage()
-    msg["From"] = settings.smtp_from
-    msg["To"] = to
-    msg["Subject"] = subject
-    msg.set_content("HTML email required. Please view in an HTML-capable client.")
-    msg.add_alternative(html, subtype="html")
-    for path in attachments or []:
-        with open(path, "rb") as f:
-            data = f.read()
-        msg.add_attachment(data, maintype="application", subtype="pdf", filename=path.split("/")[-1])
-
-    with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as s:
-        s.starttls()
-        if settings.smtp_user:
-            s.login(settings.smtp_user, settings.smtp_pass)
-        s.send_message(msg)
+    msg_id = queue_email(to, subject, html, attachments)
+    report = flush_outbox(ids=[msg_id])
+    if report["failed"]:
+        raise smtplib.SMTPException(f"Sending {msg_id} failed: {report['failed'][msg_id]}")
@@ -0,0 +1,113 @@
+
+"""Shared httpx plumbing for the async API clients.
+
+One pooled ``httpx.AsyncClient`` per event loop keeps TLS connections warm
+across requests. ``send`` retries transport errors and 429/5xx responses
+with full-jitter exponential backoff, honouring ``Retry-After`` when the
+server sends one. A non-idempotent call (POST/PATCH unless the caller says
+otherwise) is retried only when the server cannot have acted on it: the
+connection was never made, or the answer was 429/503. A read timeout or a
+502 after a card was created would otherwise create it twice.
+"""
+import asyncio, random, weakref
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
+from ..metrics import RETRIES, external_call
+from ..settings import settings
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Safe to repeat whatever the method: the request never reached the server, or it declined it.
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+REFUSED_STATUS = {429, 503}
+
+@dataclass
+class RetryPolicy:
+    retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    max_retry_after: float = 60.0  # give up rather than honour a longer Retry-After
+
+    @classmethod
+    def from_settings(cls)->"RetryPolicy":
+        return cls(settings.http_retries, settings.http_backoff_base, settings.http_backoff_max,
+                   settings.http_retry_after_max)
+
+    def backoff(self, attempt:int)->float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+def retry_after(resp:httpx.Response)->float|None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def shared_client()->httpx.AsyncClient:
+    """The pooled client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=settings.http_max_connections,
+                                max_keepalive_connections=settings.http_max_keepalive),
+        )
+    return client
+
+async def close_shared_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+async def send(method:str, url:str, *, policy:RetryPolicy|None=None, client:httpx.AsyncClient|None=None,
+               kwargs_factory=None, idempotent:bool|None=None, service:str|None=None, op:str|None=None,
+               **kwargs)->httpx.Response:
+    """Send with retries. ``kwargs_factory(stack)`` rebuilds per-attempt kwargs such as reopened files.
+
+    ``idempotent`` defaults from the method; pass ``True`` for a POST that only reads.
+    ``service``/``op`` label the call and retry metrics the way the sync clients'
+    ``external_call`` does; they default to the URL host and the method.
+    """
+    policy = policy or RetryPolicy.from_settings()
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    retry_errors = httpx.TransportError if idempotent else UNSENT_ERRORS
+    retry_status = RETRY_STATUS if idempotent else REFUSED_STATUS
+    client = client or shared_client()
+    service = service or httpx.URL(url).host
+    op = op or method
+    for attempt in range(policy.retries + 1):
+        last = attempt == policy.retries
+        if attempt:
+            RETRIES.inc(service=service)
+        with ExitStack() as stack:
+            extra = kwargs_factory(stack) if kwargs_factory else {}
+            try:
+                with external_call(service, op):
+                    resp = await client.request(method, url, **kwargs, **extra)
+            except retry_errors:
+                if last:
+                    raise
+                delay = policy.backoff(attempt)
+            else:
+                if resp.status_code not in retry_status or last:
+                    resp.raise_for_status()
+                    return resp
+                wait = retry_after(resp)
+                if wait is not None and wait > policy.max_retry_after:
+                    resp.raise_for_status()
+                delay = wait if wait is not None else policy.backoff(attempt)
+        await asyncio.sleep(delay)
@@ -0,0 +1,280 @@
+
+"""Caching front for Maximizer autocomplete lookups.
+
+* In-process LRU with a TTL, optionally backed by Redis so API replicas share hits.
+* Prefix reuse: a result set for ``"acm"`` that was complete (fewer matches
+  than were asked for) answers ``"acme"`` by filtering locally.
+* Identical lookups already in flight are coalesced into one upstream call.
+* An AbEntry key that does not exist is cached too, for the shorter
+  ``lookup_cache_negative_ttl``, so a stale key is not looked up on every request.
+* Hit/miss/coalesce counters and a latency window for ``/lookup/stats``.
+"""
+import asyncio, inspect, json, threading, time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from ..settings import settings
+
+def _norm(q:str)->str:
+    return " ".join(q.lower().split())
+
+def name_prefix_match(entry:dict, q:str)->bool:
+    # Mirrors MaximizerClient.read_abentry's CompanyName LIKE 'q%' filter.
+    return _norm(entry.get("name") or "").startswith(q)
+
+class TTLCache:
+    def __init__(self, maxsize:int, ttl:float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl:float|None=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class LookupStats:
+    def __init__(self, window:int=2048):
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "prefix_hits": 0, "redis_hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0, "errors": 0}
+        self._latency_ms = deque(maxlen=window)
+
+    def incr(self, name:str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def observe(self, ms:float):
+        with self._lock:
+            self._latency_ms.append(ms)
+
+    def snapshot(self)->dict:
+        with self._lock:
+            lat = sorted(self._latency_ms)
+            counts = dict(self.counts)
+        pct = lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))], 3) if lat else None
+        lookups = counts["hits"] + counts["prefix_hits"] + counts["redis_hits"] + counts["misses"] + counts["coalesced"]
+        served_locally = lookups - counts["upstream_calls"]
+        return {**counts, "lookups": lookups,
+                "hit_ratio": round(served_locally / lookups, 4) if lookups else None,
+                "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "samples": len(lat)}}
+
+class CachedMaximizer:
+    def __init__(self, client, maxsize:int|None=None, ttl:float|None=None, redis=None,
+                 matcher=name_prefix_match, prefetch:int|None=None):
+        self.client = client
+        # Fetch more rows than the UI shows so short prefixes become complete sooner.
+        self.prefetch = prefetch if prefetch is not None else settings.lookup_cache_prefetch
+        self.ttl = ttl if ttl is not None else settings.lookup_cache_ttl
+        self.negative_ttl = min(self.ttl, settings.lookup_cache_negative_ttl)
+        self.cache = TTLCache(maxsize or settings.lookup_cache_size, self.ttl)
+        self.redis = redis
+        self.matcher = matcher
+        self.stats = LookupStats()
+        self._inflight: dict = {}
+        self._inflight_lock = threading.Lock()
+        self._ainflight: dict = {}
+
+    # -- shared L2 ------------------------------------------------------------
+    def _redis_get(self, keys:list[str])->list:
+        if self.redis is None or not keys:
+            return [None] * len(keys)
+        try:
+            raw = self.redis.mget([f"maxcache:{k}" for k in keys])
+        except Exception:
+            self.stats.incr("errors")
+            return [None] * len(keys)
+        return [json.loads(r) if r is not None else None for r in raw]
+
+    def _ttl(self, value)->float:
+        # AbEntry lookups are cached wrapped, so a key that does not exist is {"entry": None}.
+        return self.negative_ttl if isinstance(value, dict) and value.get("entry", ...) is None else self.ttl
+
+    def _redis_set(self, key:str, value):
+        if self.redis is None:
+            return
+        try:
+            self.redis.setex(f"maxcache:{key}", max(1, int(self._ttl(value))), json.dumps(value))
+        except Exception:
+            self.stats.incr("errors")
+
+    # -- coalescing -----------------------------------------------------------
+    def _load(self, key:str, loader):
+        with self._inflight_lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+        if not leader:
+            self.stats.incr("coalesced")
+            return fut.result()
+        self.stats.incr("misses")
+        try:
+            self.stats.incr("upstream_calls")
+            value = loader()
+            self.cache.set(key, value, self._ttl(value))
+            self._redis_set(key, value)
+            fut.set_result(value)
+            return value
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    # -- lookups --------------------------------------------------------------
+    def _from_search_entry(self, entry:dict, q:str, limit:int, exact:bool):
+        if exact and (entry["complete"] or entry["limit"] >= limit):
+            return entry["results"][:limit]
+        if not exact and entry["complete"]:
+            return [r for r in entry["results"] if self.matcher(r, q)][:limit]
+        return None
+
+    def _search_keys(self, q:str)->list[str]:
+        # Longest key first: the exact query, then shorter and shorter prefixes.
+        return [f"search:{q[:n]}" for n in range(len(q), -1, -1)]
+
+    def _search_local(self, keys:list[str], q:str, limit:int):
+        for i, key in enumerate(keys):
+            entry = self.cache.get(key)
+            if entry is not None:
+                hit = self._from_search_entry(entry, q, limit, i == 0)
+                if hit is not None:
+                    self.stats.incr("hits" if i == 0 else "prefix_hits")
+                    return hit
+        return None
+
+    def _search_shared(self, entries:list, keys:list[str], q:str, limit:int):
+        for i, entry in enumerate(entries):
+            if entry is not None:
+                hit = self._from_search_entry(entry, q, limit, i == 0)
+                if hit is not None:
+                    self.cache.set(keys[i], entry)
+                    self.stats.incr("redis_hits")
+                    return hit
+        return None
+
+    def _search_entry(self, rows:list, fetch:int)->dict:
+        # One extra row was requested so we know whether the result set is complete.
+        return {"results": rows[:fetch], "complete": len(rows) <= fetch, "limit": fetch}
+
+    def search_companies(self, q:str, limit:int=10)->list[dict]:
+        t0 = time.perf_counter()
+        try:
+            q = _norm(q)
+            keys = self._search_keys(q)
+            hit = self._search_local(keys, q, limit)
+            if hit is None:
+                hit = self._search_shared(self._redis_get(keys), keys, q, limit)
+            if hit is not None:
+                return hit
+            fetch = max(limit, self.prefetch)
+            entry = self._load(keys[0], lambda: self._search_entry(self.client.read_abentry(q, fetch + 1), fetch))
+            return entry["results"][:limit]
+        finally:
+            self.stats.observe((time.perf_counter() - t0) * 1000)
+
+    def get_abentry(self, key:str)->dict|None:
+        t0 = time.perf_counter()
+        try:
+            ck = f"entry:{key}"  # {"entry": row or None}; not the old unwrapped "abentry:" values
+            value = self.cache.get(ck)
+            if value is not None:
+                self.stats.incr("hits")
+                return value["entry"]
+            (value,) = self._redis_get([ck])
+            if value is not None:
+                self.cache.set(ck, value, self._ttl(value))
+                self.stats.incr("redis_hits")
+                return value["entry"]
+            return self._load(ck, lambda: {"entry": self.client.get_abentry(key)})["entry"]
+        finally:
+            self.stats.observe((time.perf_counter() - t0) * 1000)
+
+    # -- event-loop variants ----------------------------------------------------
+    # Same behaviour for async clients (sync clients work too); Redis calls run
+    # in a thread so the loop never blocks on them.
+    async def _aload(self, key:str, loader):
+        fut = self._ainflight.get(key)
+        if fut is not None:
+            self.stats.incr("coalesced")
+            return await asyncio.shield(fut)
+        fut = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        self.stats.incr("misses")
+        self.stats.incr("upstream_calls")
+        try:
+            value = await loader()
+            self.cache.set(key, value, self._ttl(value))
+            if self.redis is not None:
+                await asyncio.to_thread(self._redis_set, key, value)
+            fut.set_result(value)
+            return value
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._ainflight.pop(key, None)
+
+    async def _call(self, fn, *args):
+        result = fn(*args)
+        return await result if inspect.isawaitable(result) else result
+
+    async def _aredis_get(self, keys:list[str])->list:
+        if self.redis is None:
+            return [None] * len(keys)
+        return await asyncio.to_thread(self._redis_get, keys)
+
+    async def asearch_companies(self, q:str, limit:int=10)->list[dict]:
+        t0 = time.perf_counter()
+        try:
+            q = _norm(q)
+            keys = self._search_keys(q)
+            hit = self._search_local(keys, q, limit)
+            if hit is None:
+                hit = self._search_shared(await self._aredis_get(keys), keys, q, limit)
+            if hit is not None:
+                return hit
+            fetch = max(limit, self.prefetch)
+            async def loader():
+                return self._search_entry(await self._call(self.client.read_abentry, q, fetch + 1), fetch)
+            return (await self._aload(keys[0], loader))["results"][:limit]
+        finally:
+            self.stats.observe((time.perf_counter() - t0) * 1000)
+
+    async def aget_abentry(self, key:str)->dict|None:
+        t0 = time.perf_counter()
+        try:
+            ck = f"entry:{key}"  # {"entry": row or None}; not the old unwrapped "abentry:" values
+            value = self.cache.get(ck)
+            if value is not None:
+                self.stats.incr("hits")
+                return value["entry"]
+            (value,) = await self._aredis_get([ck])
+            if value is not None:
+                self.cache.set(ck, value, self._ttl(value))
+                self.stats.incr("redis_hits")
+                return value["entry"]
+            async def loader():
+                return {"entry": await self._call(self.client.get_abentry, key)}
+            return (await self._aload(ck, loader))["entry"]
+        finally:
+            self.stats.observe((time.perf_counter() - t0) * 1000)
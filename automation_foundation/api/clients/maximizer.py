@@ -1,25 +1,119 @@
 
-import os, requests
+import asyncio, os
+from ..metrics import external_call
 from ..settings import settings
+from .http import send
+
+ABENTRY_FIELDS = {
+    "Key": 1, "CompanyName": 1, "Phone1": 1, "Email1": 1,
+    "Address": {"AddressLine1": 1, "City": 1, "StateProvince": 1, "ZipCode": 1},
+}
+
+def normalize_abentry(row:dict)->dict:
+    addr = row.get("Address") or {}
+    phone = row.get("Phone1") or {}
+    return {
+        "name": row.get("CompanyName"),
+        "city": addr.get("City"),
+        "phone": phone.get("Value") if isinstance(phone, dict) else phone,
+        "max_abentry_key": row.get("Key"),
+    }
+
+def _search_body(query:str, limit:int)->dict:
+    like = query.replace("%", "").strip() + "%"
+    return {"AbEntry": {
+        "Scope": {"Fields": ABENTRY_FIELDS},
+        "Criteria": {"SearchQuery": {"CompanyName": {"$LIKE": like}}},
+        "OrderBy": {"Fields": [{"CompanyName": "ASC"}]},
+        # Octopus stops after this many rows, so a one-letter prefix doesn't ship the whole address book.
+        "Top": limit,
+    }}
+
+def _key_body(key:str)->dict:
+    return {"AbEntry": {
+        "Scope": {"Fields": ABENTRY_FIELDS},
+        "Criteria": {"SearchQuery": {"Key": {"$EQ": key}}},
+    }}
+
+def _read_rows(data:dict)->list[dict]:
+    if data.get("Code", 0) != 0:
+        raise RuntimeError(f"Maximizer Read failed: {data.get('Msg')}")
+    return (data.get("AbEntry") or {}).get("Data") or []
+
+def _auth_headers()->dict:
+    if settings.max_auth_mode.upper() == "PAT" and settings.max_pat:
+        return {"Authorization": f"Bearer {settings.max_pat}"}
+    return {}
 
 class MaximizerClient:
     def __init__(self):
         self.base = settings.max_base_url.rstrip('/')
+        import requests  # sync client only; the API never loads it
         self.session = requests.Session()
-        mode = settings.max_auth_mode.upper()
-        if mode == "PAT" and settings.max_pat:
-            self.session.headers.update({"Authorization": f"Bearer {settings.max_pat}"})
+        self.session.headers.update(_auth_headers())
         # TODO: Support OAuth / VendorId+AppKey if needed.
 
+    def _read(self, body:dict)->list[dict]:
+        with external_call("maximizer", "read"):
+            r = self.session.post(f"{self.base}/octopus/Read", json=body, timeout=30)
+        r.raise_for_status()
+        return _read_rows(r.json())
+
     def read_abentry(self, query:str, limit:int=10):
-        # TODO: Build proper Octopus Read body for AbEntry filters.
-        # Return normalized list for autocomplete.
-        raise NotImplementedError("Implement Octopus AbEntry Read")
+        # Company-name prefix search, normalized for autocomplete.
+        rows = self._read(_search_body(query, limit))
+        return [normalize_abentry(r) for r in rows[:limit]]
 
     def get_abentry(self, key:str):
-        # TODO: Read a single AbEntry by key and include UDFs.
-        raise NotImplementedError("Implement Octopus AbEntry ReadByKey/UDF")
+        # TODO: include UDFs once their field keys are known.
+        rows = self._read(_key_body(key))
+        return normalize_abentry(rows[0]) if rows else None
 
     def create_opportunity(self, abentry_key:str, payload:dict)->dict:
         # TODO: POST Create Opportunity (Octopus API). Return opportunity key/url.
         raise NotImplementedError("Implement Opportunity Create")
+
+class AsyncMaximizerClient:
+    """httpx version of MaximizerClient on the shared connection pool, for the event loop."""
+
+    def __init__(self, concurrency:int|None=None):
+        self.base = settings.max_base_url.rstrip('/')
+        self.headers = _auth_headers()
+        self._sem = asyncio.Semaphore(concurrency or settings.maximizer_concurrency)
+
+    async def _read(self, body:dict)->list[dict]:
+        async with self._sem:
+            r = await send("POST", f"{self.base}/octopus/Read", json=body, headers=self.headers,
+                           idempotent=True, service="maximizer", op="read")
+        return _read_rows(r.json())
+
+    async def read_abentry(self, query:str, limit:int=10):
+        rows = await self._read(_search_body(query, limit))
+        return [normalize_abentry(r) for r in rows[:limit]]
+
+    async def get_abentry(self, key:str):
+        rows = await self._read(_key_body(key))
+        return normalize_abentry(rows[0]) if rows else None
+
+    async def get_abentries(self, keys:list[str])->list[dict|None]:
+        return await asyncio.gather(*(self.get_abentry(k) for k in keys))
+
+class MockMaximizerClient:
+    """Canned data for local development (MAXIMIZER_USE_MOCK=true)."""
+
+    def read_abentry(self, query:str, limit:int=10):
+        rows = [{"name": "Acme Builders Ltd.", "city": "Toronto", "phone": "555-0100", "max_abentry_key": "AB-12345"}]
+        return [r for r in rows if r["name"].lower().startswith(query.lower())][:limit]
+
+    def get_abentry(self, key:str):
+        return {
+            "max_abentry_key": key,
+            "company_name": "Acme Builders Ltd.",
+            "primary_contact": {"name": "Jane Li", "email": "jane@acme.com"},
+            "billing_address": {"line1": "1 Main St", "city": "Toronto"},
+            "discount_policy": {"type":"tiered","tier":"Gold","percent":7.5},
+            "udf": {"TaxExempt": False, "NSD_CustomerNo": "NSD-9087"}
+        }
+
+    def create_opportunity(self, abentry_key:str, payload:dict)->dict:
+        return {"opportunity_key": "OPP-PLACEHOLDER", "abentry_key": abentry_key}
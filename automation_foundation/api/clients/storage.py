@@ -1,21 +1,198 @@
 
-import os, shutil, json, pathlib
+"""Artifact storage backed by a content-addressed blob store.
+
+Every file saved through ``save_artifact`` is streamed into
+``<filestore_root>/.blobs/<aa>/<bb>/<sha256>`` once, hashed in fixed-size
+chunks, and the canonical and per-job paths are materialized from that
+blob as a hardlink, a reflink (Linux FICLONE) or, failing both, a copy.
+Each materialized path is recorded under ``.blobs/refs`` so ``gc`` can drop
+blobs nothing points at and ``report`` can show how much space dedup saves.
+
+    python -m api.clients.storage report
+    python -m api.clients.storage gc [--dry-run]
+"""
+import os, shutil, json, pathlib, hashlib, tempfile
+from datetime import datetime
 from ..settings import settings
 from slugify import slugify
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CHUNK = 1 << 20
+FICLONE = 0x40049409
+
 def job_dir(job_id:str)->pathlib.Path:
     base = pathlib.Path("artifacts") / f"job-{job_id}"
     base.mkdir(parents=True, exist_ok=True)
     return base
 
 def canonical_paths(job_id:str, company:str, estimate_no:str|None=None)->dict:
-    year = "YYYY"  # TODO: derive from today
+    year = str(datetime.now().year)
     root = pathlib.Path(settings.filestore_root) / year / f"{slugify(company)}-{job_id}"
     sof = root / f"SOF-{job_id}.pdf"
     est = root / (f"Estimate-{estimate_no}.pdf" if estimate_no else f"Estimate-{job_id}.pdf")
     return {"root": root, "sof": sof, "estimate": est}
 
-def save_artifact(src:str, dest:pathlib.Path):
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(src, dest)
+class BlobStore:
+    def __init__(self, root:str|os.PathLike|None=None):
+        self.root = pathlib.Path(root or pathlib.Path(settings.filestore_root) / ".blobs")
+        self.refs = self.root / "refs"
+
+    def blob_path(self, digest:str)->pathlib.Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def put(self, src:str|os.PathLike)->str:
+        """Stream ``src`` into the store and return its SHA-256."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".incoming-")
+        try:
+            with open(src, "rb") as fin, os.fdopen(fd, "wb") as fout:
+                for chunk in iter(lambda: fin.read(CHUNK), b""):
+                    h.update(chunk)
+                    fout.write(chunk)
+            digest = h.hexdigest()
+            dest = self.blob_path(digest)
+            if dest.exists():
+                os.unlink(tmp)
+            else:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                # Blobs are shared through hardlinks, so nobody may edit them in place.
+                os.chmod(tmp, 0o444)
+                os.replace(tmp, dest)
+            return digest
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def materialize(self, digest:str, dest:str|os.PathLike)->str:
+        """Place the blob at ``dest`` (replacing it atomically); returns the method used."""
+        blob = self.blob_path(digest)
+        dest = pathlib.Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists() and dest.samefile(blob):
+            method = "link"
+        else:
+            tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+            if tmp.exists():
+                tmp.unlink()
+            method = _link_or_copy(blob, tmp)
+            os.replace(tmp, dest)
+        self._add_ref(digest, dest)
+        return method
+
+    def _ref_file(self, digest:str)->pathlib.Path:
+        return self.refs / digest[:2] / digest
+
+    def _add_ref(self, digest:str, dest:pathlib.Path):
+        ref = self._ref_file(digest)
+        path = str(dest.resolve())
+        if ref.exists() and path in ref.read_text(encoding="utf-8").splitlines():
+            return
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        with open(ref, "a", encoding="utf-8") as f:
+            f.write(path + "\n")
+
+    def _live_refs(self, digest:str)->list[pathlib.Path]:
+        ref = self._ref_file(digest)
+        if not ref.exists():
+            return []
+        blob, live = self.blob_path(digest), []
+        for line in ref.read_text(encoding="utf-8").splitlines():
+            p = pathlib.Path(line)
+            try:
+                # Links must still share the inode; copies/reflinks must still match in size.
+                if p.samefile(blob) or p.stat().st_size == blob.stat().st_size:
+                    live.append(p)
+            except OSError:
+                continue
+        return live
+
+    def blobs(self):
+        for p in self.root.glob("??/??/*"):
+            if p.is_file() and len(p.name) == 64:
+                yield p.name, p
+
+    def gc(self, dry_run:bool=False)->dict:
+        """Delete blobs no recorded path uses any more; prune dead refs of the rest."""
+        removed = freed = kept = 0
+        for digest, blob in list(self.blobs()):
+            live = self._live_refs(digest)
+            if live or blob.stat().st_nlink > 1:
+                kept += 1
+                if not dry_run and live:
+                    self._ref_file(digest).write_text("".join(f"{p}\n" for p in live), encoding="utf-8")
+                continue
+            removed += 1
+            freed += blob.stat().st_size
+            if not dry_run:
+                os.chmod(blob, 0o644)
+                blob.unlink()
+                self._ref_file(digest).unlink(missing_ok=True)
+        return {"blobs_removed": removed, "bytes_freed": freed, "blobs_kept": kept, "dry_run": dry_run}
+
+    def report(self)->dict:
+        """Physical bytes in the store versus the logical bytes of every live path."""
+        blobs = refs = physical = logical = 0
+        for digest, blob in self.blobs():
+            size = blob.stat().st_size
+            n = len(self._live_refs(digest))
+            blobs += 1
+            refs += n
+            physical += size
+            logical += size * n
+        return {"blobs": blobs, "paths": refs, "physical_bytes": physical, "logical_bytes": logical,
+                "saved_bytes": max(0, logical - physical),
+                "dedup_ratio": round(logical / physical, 3) if physical else None}
+
+def _link_or_copy(src:pathlib.Path, dest:pathlib.Path)->str:
+    try:
+        os.link(src, dest)
+        return "hardlink"
+    except OSError:
+        pass
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as fin, open(dest, "wb") as fout:
+                fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+            return "reflink"
+        except OSError:
+            dest.unlink(missing_ok=True)
+    shutil.copyfile(src, dest)
+    return "copy"
+
+_store: BlobStore | None = None
+
+def get_store()->BlobStore:
+    global _store
+    if _store is None:
+        _store = BlobStore()
+    return _store
+
+def save_artifact(src:str, dest:pathlib.Path, relink_src:bool=True):
+    """Store ``src`` once by content and materialize it at ``dest``.
+
+    With ``relink_src`` the source (usually the per-job copy under
+    ``artifacts/job-*``) is swapped for a link to the same blob too.
+    """
+    store = get_store()
+    digest = store.put(src)
+    store.materialize(digest, dest)
+    if relink_src:
+        store.materialize(digest, src)
     return str(dest)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Artifact blob store maintenance.")
+    ap.add_argument("cmd", choices=["report", "gc"])
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--root", help="blob store root (default <FILESTORE_ROOT>/.blobs)")
+    a = ap.parse_args()
+    store = BlobStore(a.root)
+    out = store.report() if a.cmd == "report" else store.gc(dry_run=a.dry_run)
+    print(json.dumps(out, indent=2))
@@ -1,22 +1,71 @@
 
-import requests
+import asyncio, os
+from ..metrics import external_call
 from ..settings import settings
+from .http import send
 
 class TrelloClient:
     def __init__(self):
         self.key = settings.trello_key
         self.token = settings.trello_token
         self.list_id = settings.trello_list_id
-        self.base = "https://api.trello.com/1"
+        self.base = settings.trello_base_url.rstrip("/")
+        import requests
+        # One session so consecutive calls reuse the TLS connection.
+        self.session = requests.Session()
 
     def create_card(self, name:str, desc:str="")->str:
         params = {"key": self.key, "token": self.token, "idList": self.list_id, "name": name, "desc": desc}
-        r = requests.post(f"{self.base}/cards", params=params, timeout=30)
+        with external_call("trello", "create_card"):
+            r = self.session.post(f"{self.base}/cards", params=params, timeout=30)
         r.raise_for_status()
         return r.json().get("id")
 
     def attach_url(self, card_id:str, url:str, name:str=None):
         params = {"key": self.key, "token": self.token, "url": url, "name": name or url}
-        r = requests.post(f"{self.base}/cards/{card_id}/attachments", params=params, timeout=30)
+        with external_call("trello", "attach_url"):
+            r = self.session.post(f"{self.base}/cards/{card_id}/attachments", params=params, timeout=30)
         r.raise_for_status()
         return True
+
+class AsyncTrelloClient:
+    """httpx version of TrelloClient on the shared connection pool, with bulk attachment helpers."""
+
+    def __init__(self, concurrency:int|None=None):
+        self.key = settings.trello_key
+        self.token = settings.trello_token
+        self.list_id = settings.trello_list_id
+        self.base = settings.trello_base_url.rstrip("/")
+        self._sem = asyncio.Semaphore(concurrency or settings.trello_concurrency)
+
+    def _auth(self, **params)->dict:
+        return {"key": self.key, "token": self.token, **params}
+
+    async def _post(self, op:str, path:str, **kwargs):
+        async with self._sem:
+            return await send("POST", f"{self.base}{path}", service="trello", op=op, **kwargs)
+
+    async def create_card(self, name:str, desc:str="")->str:
+        r = await self._post("create_card", "/cards", params=self._auth(idList=self.list_id, name=name, desc=desc))
+        return r.json().get("id")
+
+    async def attach_url(self, card_id:str, url:str, name:str=None):
+        await self._post("attach_url", f"/cards/{card_id}/attachments", params=self._auth(url=url, name=name or url))
+        return True
+
+    async def attach_file(self, card_id:str, path:str, name:str|None=None)->str:
+        name = name or os.path.basename(path)
+        # The file is reopened on every retry and streamed, never read into memory.
+        def files(stack):
+            fh = stack.enter_context(open(path, "rb"))
+            return {"files": {"file": (name, fh, "application/octet-stream")}}
+        r = await self._post("attach_file", f"/cards/{card_id}/attachments", params=self._auth(name=name),
+                             kwargs_factory=files)
+        return r.json().get("id")
+
+    async def attach_files(self, card_id:str, paths:list[str])->list[str]:
+        """Attach many files to one card concurrently, bounded by ``trello_concurrency``."""
+        return await asyncio.gather(*(self.attach_file(card_id, p) for p in paths))
+
+    async def attach_urls(self, card_id:str, urls:list[str])->list[bool]:
+        return await asyncio.gather(*(self.attach_url(card_id, u) for u in urls))
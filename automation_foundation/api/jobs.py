@@ -0,0 +1,131 @@
+
+"""Idempotent enqueueing of automation jobs.
+
+``JobSpec.job_id`` is the idempotency key: it doubles as the RQ job id, and
+``automate:spec:<job_id>`` holds the hash of the spec first seen for it
+(claimed with ``SET NX``). A repeat with the same spec returns the existing
+job's status instead of enqueueing again; a repeat with a different spec is a
+conflict. A job that failed is requeued under the same id. All callers share
+one Redis connection pool.
+
+Jobs go onto the entry lane's queue for their priority (``api.queues``).
+When a job moves to another lane, its RQ job records the next hop's id in
+``meta["next"]``; status and requeueing follow that chain to the last hop.
+"""
+import hashlib, json, os, pathlib
+from redis import ConnectionPool, Redis
+from rq import Queue
+from rq.job import Job, JobStatus
+from .models import JobSpec
+from .queues import ENTRY_LANE, queue_name
+from .settings import settings
+
+PIPELINE = "worker.worker.run_pipeline"
+SPEC_KEY = "automate:spec:{}"
+
+_redis: Redis | None = None
+_queue: Queue | None = None
+
+def get_redis()->Redis:
+    global _redis
+    if _redis is None:
+        _redis = Redis(connection_pool=ConnectionPool.from_url(settings.redis_url))
+    return _redis
+
+def get_queue()->Queue:
+    global _queue
+    if _queue is None:
+        _queue = Queue(settings.rq_queue, connection=get_redis())
+    return _queue
+
+def pipeline_tail(job:Job)->Job:
+    """The job's latest hop (the job itself unless it has moved to another lane)."""
+    while job.meta.get("next"):
+        nxt = Job.fetch_many([job.meta["next"]], connection=job.connection)[0]
+        if nxt is None:
+            break
+        job = nxt
+    return job
+
+def spec_hash(job:JobSpec)->str:
+    body = json.dumps(job.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+def persist_inputs(jobs:list[JobSpec]):
+    """Write each spec to ``artifacts/job-<id>/inputs/jobspec.json`` (audit copy)."""
+    for job in jobs:
+        base = pathlib.Path("artifacts") / f"job-{job.job_id}" / "inputs"
+        base.mkdir(parents=True, exist_ok=True)
+        tmp = base / f".jobspec.{os.getpid()}.tmp"
+        tmp.write_text(job.model_dump_json(indent=2), encoding="utf-8")
+        os.replace(tmp, base / "jobspec.json")
+
+def enqueue_specs(jobs:list[JobSpec], q:Queue|None=None)->list[dict]:
+    """Enqueue ``jobs`` at most once each, in at most three Redis round trips however many there are
+    (plus one per extra hop for repeats of jobs that have moved lanes).
+
+    Returns one result per spec, in order: ``enqueued`` says whether this
+    call queued it, ``status`` is the RQ status (``None`` while another
+    request is still enqueueing it) and ``conflict`` flags a reused job_id.
+    """
+    q = q or get_queue()
+    r = q.connection
+    hashes = [spec_hash(j) for j in jobs]
+    # Round trip 1: claim every job_id and read back whoever owns it.
+    pipe = r.pipeline(transaction=False)
+    for job, h in zip(jobs, hashes):
+        key = SPEC_KEY.format(job.job_id)
+        pipe.set(key, h, nx=True, ex=settings.automate_result_ttl)
+        pipe.get(key)
+    replies = pipe.execute()
+    claimed = replies[0::2]
+    owners = [v.decode() if isinstance(v, bytes) else v for v in replies[1::2]]
+
+    results: list[dict] = [None] * len(jobs)
+    new, seen = [], {}
+    for i, (job, h) in enumerate(zip(jobs, hashes)):
+        if claimed[i] and job.job_id not in seen:
+            seen[job.job_id] = h
+            new.append(i)
+        elif owners[i] != h or seen.get(job.job_id, h) != h:
+            results[i] = {"job_id": job.job_id, "enqueued": False, "conflict": True, "status": None}
+    dupes = [i for i in range(len(jobs)) if results[i] is None and i not in new]
+    # Round trip 2, only when there are repeats: load the jobs already on file.
+    existing = dict(zip((jobs[i].job_id for i in dupes),
+                        Job.fetch_many([jobs[i].job_id for i in dupes], connection=r))) if dupes else {}
+
+    # Last round trip: enqueue everything newly claimed in one pipeline, grouped by queue.
+    with r.pipeline() as pipe:
+        by_queue: dict[str, list] = {}
+        for i in new:
+            lane = ENTRY_LANE if settings.queue_routing else None
+            rush = jobs[i].priority == "rush"
+            by_queue.setdefault(queue_name(lane, jobs[i].priority), []).append(Queue.prepare_data(
+                PIPELINE, args=(jobs[i].model_dump(),), kwargs={"lane": lane}, job_id=jobs[i].job_id,
+                meta={"job_id": jobs[i].job_id, "spec_hash": hashes[i], "lane": lane},
+                result_ttl=settings.automate_result_ttl, failure_ttl=settings.automate_result_ttl,
+                at_front=rush and lane is None))  # without routing, rush jumps the one queue
+        if by_queue:
+            try:
+                for name, datas in by_queue.items():
+                    (q if name == q.name else Queue(name, connection=r)).enqueue_many(datas, pipeline=pipe)
+                pipe.execute()
+            except BaseException:
+                # Release the claims so a retry is not mistaken for a duplicate.
+                r.delete(*(SPEC_KEY.format(jobs[i].job_id) for i in new))
+                raise
+    for i in new:
+        results[i] = {"job_id": jobs[i].job_id, "enqueued": True, "conflict": False, "status": JobStatus.QUEUED.value}
+
+    for i in dupes:
+        job = existing.get(jobs[i].job_id)
+        job = pipeline_tail(job) if job is not None else None
+        status = JobStatus(job.get_status(refresh=False)) if job is not None else None
+        requeued = False
+        if status == JobStatus.FAILED and jobs[i].job_id not in seen:
+            seen[jobs[i].job_id] = hashes[i]
+            job.requeue()
+            status, requeued = JobStatus.QUEUED, True
+        results[i] = {"job_id": jobs[i].job_id, "enqueued": requeued, "conflict": False,
+                      "status": status.value if status is not None else None}
+    return results
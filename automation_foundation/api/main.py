@@ -1,11 +1,21 @@
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .settings import settings
-from .models import JobSpec
-from redis import Redis
+from .models import JobSpec, UploadRequest
+from .jobs import enqueue_specs, get_queue, get_redis, persist_inputs
+from .clients.http import close_shared_client
+from .clients.lookup_cache import CachedMaximizer
+from .clients.maximizer import AsyncMaximizerClient, MockMaximizerClient
+from .metrics import (ENQUEUED, QUEUE_DEPTH, QUEUE_OLDEST_SECONDS, QUEUE_RUNNING, QUEUE_WORKERS, REGISTRY,
+                      REQUEST_SECONDS, SEATS_IN_USE, SEATS_LIMIT, merge, render, worker_snapshots)
+from .queues import queue_report
+from .semaphore import nsd_seats
+from .uploads import UploadError, UploadStore
+from redis.exceptions import RedisError
 from rq import Queue
-import os, json, pathlib
+import time
 
 app = FastAPI(title="Estimator Automation API", version="0.1.0")
 
@@ -17,45 +27,181 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def get_queue():
-    redis = Redis.from_url(settings.redis_url)
-    return Queue(settings.rq_queue, connection=redis)
+class _TimeRequests:
+    # Plain ASGI rather than @app.middleware: BaseHTTPMiddleware relays the request body
+    # piece by piece through a task, which cost uploads over half their throughput.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # Label by route template, not raw path, so /lookup/abentry/{key} stays one series.
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, route=getattr(route, "path", "unmatched"),
+                                    method=scope["method"], status=status)
+
+app.add_middleware(_TimeRequests)
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+def _queue_status(waits:dict|None=None)->dict:
+    r = get_redis()
+    seats = nsd_seats(r)
+    return {"queues": queue_report(r, waits), "nsd_seats": {"in_use": seats.in_use(), "limit": seats.limit}}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    workers = []
+    try:
+        workers = worker_snapshots(get_redis())
+        status = _queue_status()
+        for name, row in status["queues"].items():
+            QUEUE_DEPTH.set(row["depth"], queue=name)
+            QUEUE_OLDEST_SECONDS.set(row["oldest_wait_s"] or 0.0, queue=name)
+            QUEUE_RUNNING.set(row["running"], queue=name)
+            QUEUE_WORKERS.set(row["workers"], queue=name)
+        SEATS_IN_USE.set(status["nsd_seats"]["in_use"], semaphore="nsd")
+        SEATS_LIMIT.set(status["nsd_seats"]["limit"], semaphore="nsd")
+    except RedisError:
+        pass  # still serve the API's own numbers while Redis is down
+    return render(merge([REGISTRY.snapshot()] + workers))
+
+@app.get("/queues")
+def queues():
+    """Depth, oldest wait, running jobs, workers and observed wait percentiles per queue, plus NSD seats."""
+    try:
+        waits = merge(worker_snapshots(get_redis())).get("queue_wait_seconds")
+        return _queue_status(waits)
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Redis unavailable: {e}")
+
+_maximizer: CachedMaximizer | None = None
+
+def get_maximizer()->CachedMaximizer:
+    global _maximizer
+    if _maximizer is None:
+        client = MockMaximizerClient() if settings.maximizer_use_mock else AsyncMaximizerClient()
+        redis = get_redis() if settings.lookup_cache_redis else None
+        _maximizer = CachedMaximizer(client, redis=redis)
+    return _maximizer
+
+@app.on_event("shutdown")
+async def _close_http():
+    await close_shared_client()
+
 @app.get("/lookup/company")
-def lookup_company(q: str, limit: int = 10):
-    # TODO: Implement Maximizer AbEntry Read filter
-    # For now, return a stubbed result
-    return [{
-        "name": "Acme Builders Ltd.",
-        "city": "Toronto",
-        "phone": "555-0100",
-        "max_abentry_key": "AB-12345"
-    }]
+async def lookup_company(q: str, limit: int = 10, mx: CachedMaximizer = Depends(get_maximizer)):
+    return await mx.asearch_companies(q, limit)
 
 @app.get("/lookup/abentry/{key}")
-def hydrate_abentry(key: str):
-    # TODO: Fetch full AbEntry + UDFs from Maximizer
-    return {
-        "max_abentry_key": key,
-        "company_name": "Acme Builders Ltd.",
-        "primary_contact": {"name": "Jane Li", "email": "jane@acme.com"},
-        "billing_address": {"line1": "1 Main St", "city": "Toronto"},
-        "discount_policy": {"type":"tiered","tier":"Gold","percent":7.5},
-        "udf": {"TaxExempt": False, "NSD_CustomerNo": "NSD-9087"}
-    }
+async def hydrate_abentry(key: str, mx: CachedMaximizer = Depends(get_maximizer)):
+    entry = await mx.aget_abentry(key)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"AbEntry {key} not found")
+    return entry
+
+@app.get("/lookup/stats")
+def lookup_stats(mx: CachedMaximizer = Depends(get_maximizer)):
+    return mx.stats.snapshot()
+
+def get_uploads()->UploadStore:
+    return UploadStore(get_redis())
+
+def _upload_call(fn, *args):
+    try:
+        return fn(*args)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=e.detail)
+
+async def _upload_acall(fn, *args):
+    try:
+        return await fn(*args)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=e.detail)
+
+@app.post("/uploads")
+def create_upload(req: UploadRequest, store: UploadStore = Depends(get_uploads)):
+    """Start an upload; send it whole (``PUT /uploads/{id}``) or in chunks (``PUT /uploads/{id}/chunks/{n}``)."""
+    return _upload_call(store.create, req.job_id, req.filename, req.size, req.kind, req.sha256, req.chunk_size)
+
+@app.get("/uploads/{upload_id}")
+def upload_status(upload_id: str, store: UploadStore = Depends(get_uploads)):
+    return _upload_call(store.status, upload_id)
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def put_upload_chunk(upload_id: str, index: int, request: Request, store: UploadStore = Depends(get_uploads)):
+    sha256 = request.headers.get("x-chunk-sha256")
+    return await _upload_acall(store.write_chunk, upload_id, index, request.stream(), sha256)
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, store: UploadStore = Depends(get_uploads)):
+    return await _upload_acall(store.complete, upload_id)
+
+@app.put("/uploads/{upload_id}")
+async def put_upload(upload_id: str, request: Request, store: UploadStore = Depends(get_uploads)):
+    return await _upload_acall(store.write_whole, upload_id, request.stream())
+
+@app.post("/jobs/{job_id}/files")
+async def post_job_files(job_id: str, request: Request, store: UploadStore = Depends(get_uploads)):
+    """multipart/form-data upload; each file part becomes an upload of ``job_id``."""
+    ctype = request.headers.get("content-type", "")
+    boundary = ctype.partition("boundary=")[2].split(";")[0].strip().strip('"')
+    if not ctype.startswith("multipart/form-data") or not boundary:
+        raise HTTPException(status_code=415, detail="expected multipart/form-data")
+    return await _upload_acall(store.write_multipart, job_id, boundary.encode(), request.stream())
+
+@app.get("/jobs/{job_id}/files")
+def list_job_files(job_id: str, store: UploadStore = Depends(get_uploads)):
+    return store.list_job(job_id)
+
+def _resolve_uploads(jobs:list[JobSpec], store:UploadStore):
+    # Attachments sent as upload_id get the stored path, so the worker (and the spec hash) see a file.
+    for job in jobs:
+        for a in job.attachments or []:
+            if a.upload_id and not a.path:
+                a.path = _upload_call(store.resolve, job.job_id, a.upload_id)
+
+def _persist_new(jobs:list[JobSpec], results:list[dict], tasks:BackgroundTasks):
+    # Audit copies are written after the response goes out, and only for jobs this call queued.
+    fresh = [j for j, r in zip(jobs, results) if r["enqueued"]]
+    if fresh:
+        tasks.add_task(persist_inputs, fresh)
+
+def _result_label(result:dict)->str:
+    return "conflict" if result["conflict"] else "enqueued" if result["enqueued"] else "duplicate"
 
 @app.post("/automate")
-def automate(job: JobSpec, q: Queue = Depends(get_queue)):
-    # Persist inputs for audit/idempotency
-    base = pathlib.Path("artifacts") / f"job-{job.job_id}" / "inputs"
-    base.mkdir(parents=True, exist_ok=True)
-    (base / "jobspec.json").write_text(job.model_dump_json(indent=2), encoding="utf-8")
-
-    # Enqueue pipeline
-    job_meta = {"job_id": job.job_id}
-    rq_job = q.enqueue("worker.worker.run_pipeline", job.model_dump(), job_meta=job_meta)
-    return {"enqueued": True, "rq_job_id": rq_job.id}
+def automate(job: JobSpec, tasks: BackgroundTasks, q: Queue = Depends(get_queue),
+             store: UploadStore = Depends(get_uploads)):
+    _resolve_uploads([job], store)
+    result = enqueue_specs([job], q)[0]
+    ENQUEUED.inc(result=_result_label(result))
+    if result["conflict"]:
+        raise HTTPException(status_code=409, detail=f"job_id {job.job_id} was already submitted with a different spec")
+    _persist_new([job], [result], tasks)
+    return {"enqueued": result["enqueued"], "rq_job_id": job.job_id, "status": result["status"]}
+
+@app.post("/automate/bulk")
+def automate_bulk(jobs: list[JobSpec], tasks: BackgroundTasks, q: Queue = Depends(get_queue),
+                  store: UploadStore = Depends(get_uploads)):
+    _resolve_uploads(jobs, store)
+    results = enqueue_specs(jobs, q)
+    for r in results:
+        ENQUEUED.inc(result=_result_label(r))
+    _persist_new(jobs, results, tasks)
+    return results
@@ -0,0 +1,252 @@
+
+"""In-process counters, histograms and per-stage spans, shared by the API and workers.
+
+Recording is a dict lookup, a ``bisect`` and a lock, cheap enough to leave
+on everywhere. ``span`` times a block, records it in ``stage_seconds`` and,
+given a job's ``logs`` directory, appends it to ``logs/spans.jsonl``. The
+job_id set with ``job_context`` is the correlation id: it travels from
+``/automate`` (where it is also the RQ job id) into every span the worker
+writes, including spans on pipeline threads started with ``copy_context``.
+
+Workers publish their registry to Redis after each job (``publish``); the
+API's ``/metrics`` renders its own registry plus every worker snapshot in
+the Prometheus text format. A forking worker calls ``share_with_forks`` so
+each short-lived child adds its job to the parent's entry instead of
+leaving one key per job.
+
+    python -m api.metrics            # merged worker stats as JSON
+    python -m api.metrics --prom     # same, Prometheus text
+"""
+import bisect, contextvars, json, os, pathlib, socket, threading, time
+from contextlib import contextmanager
+from redis.exceptions import WatchError
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+WORKER_KEY = "metrics:worker:{}"
+WORKER_TTL = 24 * 3600
+
+current_job_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("job_id", default=None)
+_fork_parent: int | None = None
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name:str, help:str):
+        self.name, self.help = name, help
+        self.values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount:float=1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def snapshot(self)->dict:
+        with self._lock:
+            return {"kind": self.kind, "help": self.help, "series": [[dict(k), v] for k, v in self.values.items()]}
+
+class Gauge(Counter):
+    """A value that is set, not added to: queue depths, seats in use."""
+    kind = "gauge"
+
+    def set(self, value:float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = float(value)
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name:str, help:str, buckets:tuple=LATENCY_BUCKETS):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        self.values: dict[tuple, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value:float, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def snapshot(self)->dict:
+        with self._lock:
+            return {"kind": self.kind, "help": self.help, "buckets": list(self.buckets),
+                    "series": [[dict(k), list(v)] for k, v in self.values.items()]}
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(self, name:str, help:str)->Counter:
+        return self.metrics.setdefault(name, Counter(name, help))
+
+    def gauge(self, name:str, help:str)->Gauge:
+        return self.metrics.setdefault(name, Gauge(name, help))
+
+    def histogram(self, name:str, help:str, buckets:tuple=LATENCY_BUCKETS)->Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help, buckets))
+
+    def snapshot(self)->dict:
+        return {name: m.snapshot() for name, m in self.metrics.items()}
+
+    def reset(self):
+        for m in self.metrics.values():
+            m.values.clear()
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("stage_seconds", "Pipeline stage duration by stage and outcome.")
+QUEUE_WAIT_SECONDS = REGISTRY.histogram("queue_wait_seconds", "Time from enqueue to a worker starting the job, by queue.")
+JOB_SECONDS = REGISTRY.histogram("job_seconds", "Whole pipeline duration by outcome.")
+EXTERNAL_SECONDS = REGISTRY.histogram("external_call_seconds", "Outbound call latency by service, operation and outcome.")
+RETRIES = REGISTRY.counter("retries_total", "Retried outbound calls by service.")
+JOBS = REGISTRY.counter("jobs_total", "Finished pipeline runs by outcome.")
+REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "API request latency by route, method and status.")
+ENQUEUED = REGISTRY.counter("automate_enqueued_total", "Specs posted to /automate by result.")
+SEMAPHORE_WAIT_SECONDS = REGISTRY.histogram("semaphore_wait_seconds", "Time spent waiting for a shared seat, by semaphore and outcome.")
+SEMAPHORE_LEASES_LOST = REGISTRY.counter("semaphore_leases_lost_total", "Seat leases that lapsed while still held, by semaphore.")
+QUEUE_DEPTH = REGISTRY.gauge("queue_depth", "Jobs waiting, by queue (set by the API when scraped).")
+QUEUE_OLDEST_SECONDS = REGISTRY.gauge("queue_oldest_wait_seconds", "Age of the oldest waiting job, by queue.")
+QUEUE_RUNNING = REGISTRY.gauge("queue_running", "Jobs being worked on, by queue.")
+QUEUE_WORKERS = REGISTRY.gauge("queue_workers", "Workers listening, by queue.")
+SEATS_IN_USE = REGISTRY.gauge("semaphore_in_use", "Seats held, by semaphore.")
+SEATS_LIMIT = REGISTRY.gauge("semaphore_limit", "Seats available, by semaphore.")
+
+@contextmanager
+def job_context(job_id:str):
+    token = current_job_id.set(job_id)
+    try:
+        yield
+    finally:
+        current_job_id.reset(token)
+
+def log_span(logs:pathlib.Path, name:str, start:float, duration:float, outcome:str="ok", **attrs):
+    """Append one span to ``logs/spans.jsonl``, tagged with the current job_id."""
+    rec = {"job_id": current_job_id.get(), "span": name, "start": start, "duration_s": round(duration, 6),
+           "outcome": outcome, "pid": os.getpid(), "thread": threading.current_thread().name, **attrs}
+    # One short write per span; O_APPEND keeps lines from concurrent stages whole.
+    with open(logs / "spans.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(rec, default=str) + "\n")
+
+@contextmanager
+def span(name:str, logs:pathlib.Path|None=None, histogram:Histogram=STAGE_SECONDS, **attrs):
+    """Time the block; record it under ``histogram`` (label ``stage``) and in ``logs/spans.jsonl``."""
+    start, t0 = time.time(), time.perf_counter()
+    outcome = "ok"
+    try:
+        yield attrs
+    except BaseException as e:
+        outcome = "error"
+        attrs["error"] = repr(e)
+        raise
+    finally:
+        duration = time.perf_counter() - t0
+        histogram.observe(duration, stage=name, outcome=outcome)
+        if logs is not None:
+            log_span(logs, name, start, duration, outcome, **attrs)
+
+@contextmanager
+def external_call(service:str, op:str):
+    """Time one outbound call (CRM, Trello, SMTP, NSD...)."""
+    t0 = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        EXTERNAL_SECONDS.observe(time.perf_counter() - t0, service=service, op=op, outcome=outcome)
+
+# -- export ---------------------------------------------------------------------
+
+def merge(snapshots:list[dict])->dict:
+    """Sum several registry snapshots series by series (gauges too: each is set by one process)."""
+    out: dict = {}
+    for snap in snapshots:
+        for name, m in snap.items():
+            dst = out.setdefault(name, {**m, "series": []})
+            index = {json.dumps(l, sort_keys=True): i for i, (l, _) in enumerate(dst["series"])}
+            for labels, value in m["series"]:
+                k = json.dumps(labels, sort_keys=True)
+                if k not in index:
+                    index[k] = len(dst["series"])
+                    dst["series"].append([labels, list(value) if m["kind"] == "histogram" else value])
+                elif m["kind"] != "histogram":
+                    dst["series"][index[k]][1] += value
+                else:
+                    acc = dst["series"][index[k]][1]
+                    for i, v in enumerate(value):
+                        acc[i] += v
+    return out
+
+def _labels(labels:dict, **extra)->str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items.items()) + "}"
+
+def render(snapshot:dict)->str:
+    """Prometheus text exposition format."""
+    lines = []
+    for name, m in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['kind']}")
+        for labels, value in m["series"]:
+            if m["kind"] != "histogram":
+                lines.append(f"{name}{_labels(labels)} {value}")
+                continue
+            cum = 0
+            for bound, n in zip(m["buckets"] + ["+Inf"], value[:-1]):
+                cum += n
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cum}")
+            lines.append(f"{name}_sum{_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_labels(labels)} {cum}")
+    return "\n".join(lines) + "\n"
+
+def share_with_forks():
+    """Make children forked from this process publish into this process's entry."""
+    global _fork_parent
+    if _fork_parent is None:
+        # Children start from zero so the parent's own numbers are not added once per job.
+        os.register_at_fork(after_in_child=REGISTRY.reset)
+    _fork_parent = os.getpid()
+
+def publish(redis, registry:Registry=REGISTRY):
+    """Store this worker's snapshot in Redis for the API's ``/metrics``."""
+    if _fork_parent is None or _fork_parent == os.getpid():
+        key = WORKER_KEY.format(f"{socket.gethostname()}:{os.getpid()}")
+        redis.set(key, json.dumps(registry.snapshot()), ex=WORKER_TTL)
+        return
+    # A forked child recorded only its own job, so add that to the parent's entry.
+    key = WORKER_KEY.format(f"{socket.gethostname()}:{_fork_parent}")
+    snap = registry.snapshot()
+    with redis.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                current = pipe.get(key)
+                merged = merge([json.loads(current), snap] if current else [snap])
+                pipe.multi()
+                pipe.set(key, json.dumps(merged), ex=WORKER_TTL)
+                pipe.execute()
+                return
+            except WatchError:
+                continue
+
+def worker_snapshots(redis)->list[dict]:
+    keys = list(redis.scan_iter(WORKER_KEY.format("*"), count=500))
+    return [json.loads(v) for v in redis.mget(keys) if v] if keys else []
+
+if __name__ == "__main__":
+    import argparse
+    from .jobs import get_redis
+    ap = argparse.ArgumentParser(description="Dump merged worker metrics.")
+    ap.add_argument("--prom", action="store_true", help="Prometheus text instead of JSON")
+    a = ap.parse_args()
+    merged = merge(worker_snapshots(get_redis()))
+    print(render(merged) if a.prom else json.dumps(merged, indent=2))
@@ -1,5 +1,5 @@
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional, List, Literal, Dict, Any
 
 class Contact(BaseModel):
@@ -9,7 +9,22 @@ class Contact(BaseModel):
 
 class Attachment(BaseModel):
     kind: Literal["SOF","Plans","Photos"]
-    path: str
+    path: Optional[str] = None
+    upload_id: Optional[str] = None  # a finished upload of this job (POST /uploads); the API fills in path
+
+    @model_validator(mode="after")
+    def _path_or_upload(self):
+        if not self.path and not self.upload_id:
+            raise ValueError("attachment needs a path or an upload_id")
+        return self
+
+class UploadRequest(BaseModel):
+    job_id: str
+    filename: str
+    size: int = Field(..., ge=0)
+    kind: Literal["SOF","Plans","Photos"] = "Plans"
+    sha256: Optional[str] = Field(None, description="Whole-file SHA-256 to verify on completion")
+    chunk_size: Optional[int] = Field(None, gt=0)
 
 class LineItem(BaseModel):
     room: str
@@ -39,3 +54,4 @@ class JobSpec(BaseModel):
     line_items: List[LineItem]
     attachments: Optional[List[Attachment]] = None
     tags: Optional[List[str]] = None
+    priority: Literal["normal","rush"] = "normal"
@@ -0,0 +1,127 @@
+
+"""Queues per resource ("lanes"), rush lanes, and queue depth/wait reporting.
+
+A job hops between lanes as its stages need different resources: the
+pipeline starts on ``ENTRY_LANE``, and when the next ready stage needs a
+resource the current lane does not run (see ``LANES``), the worker enqueues
+the rest of the job on that lane's queue (``worker.worker.run_pipeline``).
+So a 30-second NSD session only ever occupies a browser worker, and SOF
+rendering never waits behind one. Rush jobs use ``<queue>.<lane>.rush``;
+workers list it first, and RQ always empties earlier queues first.
+
+With ``QUEUE_ROUTING=false`` everything runs on ``RQ_QUEUE`` as before
+(rush jobs are put at the front of it).
+
+    rq worker -w rq.worker.SimpleWorker $(python -m api.queues --names browser)
+    python -m api.queues          # depth, oldest wait and workers per queue
+"""
+import time
+from datetime import timezone
+from rq import Queue, Worker
+from rq.job import Job
+from rq.utils import utcparse
+from .settings import settings
+
+# Lane -> stage resources its workers run. CPU workers also take the fast API stages
+# next to their rendering, which saves a hop; browser workers do nothing but NSD.
+LANES = {"api": ("api",), "cpu": ("cpu", "api"), "browser": ("browser",)}
+ENTRY_LANE = "cpu"  # opportunity and SOF, the first stages, run here
+PRIORITIES = ("rush", "normal")
+
+def queue_name(lane:str|None, priority:str="normal")->str:
+    if lane is None or not settings.queue_routing:
+        return settings.rq_queue
+    name = f"{settings.rq_queue}.{lane}"
+    return f"{name}.rush" if priority == "rush" else name
+
+def queue_names(lanes=None)->list[str]:
+    """Every queue of ``lanes`` (all by default), rush first: the argument list for ``rq worker``."""
+    if not settings.queue_routing:
+        return [settings.rq_queue]
+    lanes = lanes or LANES
+    return [queue_name(lane, p) for lane in lanes for p in PRIORITIES]
+
+def pick_lane(resources)->str:
+    """The lane whose workers can run the most of ``resources`` (ties go to the earlier lane)."""
+    resources = list(resources)
+    return max(LANES, key=lambda lane: sum(r in LANES[lane] for r in resources))
+
+def get_lane_queue(lane:str|None, priority:str, connection)->Queue:
+    return Queue(queue_name(lane, priority), connection=connection)
+
+def _wait_quantile(buckets:list, counts:list, q:float)->float|None:
+    # Upper bound of the bucket holding the q-th observation; None past the last bound.
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for bound, n in zip(buckets + [None], counts):
+        seen += n
+        if seen >= q * total:
+            return bound
+    return None
+
+def queue_report(redis, histogram:dict|None=None)->dict[str, dict]:
+    """Depth, age of the oldest waiting job, running jobs and workers per queue.
+
+    ``histogram`` is a merged ``queue_wait_seconds`` snapshot; when given,
+    each queue also gets its observed wait count, p50 and p95 (bucket upper
+    bounds) for sizing the pool behind it.
+    """
+    names = queue_names()
+    with redis.pipeline(transaction=False) as pipe:
+        for name in names:
+            q = Queue(name, connection=redis)
+            pipe.llen(q.key)
+            pipe.lindex(q.key, 0)
+            pipe.zcard(q.started_job_registry.key)
+        replies = pipe.execute()
+    heads = [h.decode() if isinstance(h, bytes) else h for h in replies[1::3]]
+    with redis.pipeline(transaction=False) as pipe:
+        for h in heads:
+            pipe.hget(Job.key_for(h or ""), "enqueued_at")
+        enqueued = pipe.execute()
+    workers = {}
+    for w in Worker.all(connection=redis):
+        for name in w.queue_names():
+            workers[name] = workers.get(name, 0) + 1
+
+    series = {}
+    if histogram:
+        for labels, value in histogram["series"]:
+            acc = series.setdefault(labels.get("queue"), [0] * len(value))
+            for i, v in enumerate(value):
+                acc[i] += v
+
+    now = time.time()
+    report = {}
+    for i, name in enumerate(names):
+        oldest = None
+        if enqueued[i]:
+            at = enqueued[i].decode() if isinstance(enqueued[i], bytes) else enqueued[i]
+            oldest = max(0.0, now - utcparse(at).replace(tzinfo=timezone.utc).timestamp())
+        row = {"depth": replies[3 * i], "oldest_wait_s": oldest, "running": replies[3 * i + 2],
+               "workers": workers.get(name, 0)}
+        if name in series:
+            counts = series[name][:-1]
+            row.update(waited=sum(counts), wait_p50_s=_wait_quantile(histogram["buckets"], counts, 0.5),
+                       wait_p95_s=_wait_quantile(histogram["buckets"], counts, 0.95))
+        report[name] = row
+    return report
+
+if __name__ == "__main__":
+    import argparse, json
+    from .jobs import get_redis
+    from .metrics import merge, worker_snapshots
+    from .semaphore import nsd_seats
+    ap = argparse.ArgumentParser(description="Queue names for a worker, or the queue report.")
+    ap.add_argument("--names", nargs="*", metavar="LANE", help="print the queues of these lanes (all if none)")
+    a = ap.parse_args()
+    if a.names is not None:
+        print(" ".join(queue_names(a.names or None)))
+    else:
+        r = get_redis()
+        waits = merge(worker_snapshots(r)).get("queue_wait_seconds")
+        seats = nsd_seats(r)
+        print(json.dumps({"queues": queue_report(r, waits),
+                          "nsd_seats": {"in_use": seats.in_use(), "limit": seats.limit}}, indent=2))
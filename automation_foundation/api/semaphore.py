@@ -0,0 +1,141 @@
+
+"""A counting semaphore in Redis, shared by every worker on every host.
+
+Holders live in a sorted set scored by lease expiry (Redis server time, so
+host clocks do not matter). Acquiring drops expired leases and adds ours in
+one WATCH/MULTI transaction if fewer than ``limit`` remain; a worker that
+dies mid-session therefore gives its seat back after ``lease`` seconds.
+While a seat is held a daemon thread extends the lease every third of it;
+a lease that lapsed anyway (the holder stalled longer than ``lease``) is
+logged and counted in ``semaphore_leases_lost_total``. Every acquire attempt
+and renewal also pushes out the key's own TTL, so the set outlives any
+session that keeps renewing.
+Releasing pushes onto a wake-up list that waiters block on, so a freed seat
+is taken at once rather than at the next poll.
+
+    with nsd_seats().hold():
+        run_nsd_flow(...)
+"""
+import logging, threading, time, uuid
+from contextlib import contextmanager
+from redis.exceptions import WatchError
+from .metrics import SEMAPHORE_LEASES_LOST, SEMAPHORE_WAIT_SECONDS
+from .settings import settings
+
+SEMAPHORE_KEY = "semaphore:{}"
+log = logging.getLogger(__name__)
+
+class SeatTimeout(TimeoutError):
+    pass
+
+class RedisSemaphore:
+    def __init__(self, redis, name:str, limit:int, lease:float=120.0, poll:float=1.0):
+        self.redis, self.name, self.limit, self.lease, self.poll = redis, name, limit, lease, poll
+        self.key = SEMAPHORE_KEY.format(name)
+        self.wake_key = self.key + ":free"
+        self.ttl = int(lease) + 60
+
+    def _now(self)->float:
+        sec, usec = self.redis.time()
+        return sec + usec / 1e6
+
+    def try_acquire(self)->str|None:
+        """A lease token if a seat is free right now, else ``None``."""
+        token = uuid.uuid4().hex
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.key)
+                    now = self._now()
+                    live = pipe.zcount(self.key, f"({now}", "+inf")
+                    if live >= self.limit:
+                        pipe.unwatch()
+                        self.redis.expire(self.key, self.ttl)
+                        return None
+                    pipe.multi()
+                    pipe.zremrangebyscore(self.key, "-inf", now)
+                    pipe.zadd(self.key, {token: now + self.lease})
+                    pipe.expire(self.key, self.ttl)
+                    pipe.execute()
+                    return token
+                except WatchError:
+                    continue
+
+    def acquire(self, timeout:float|None=None)->str:
+        """Block until a seat is free; raises ``SeatTimeout`` after ``timeout`` seconds."""
+        t0 = time.monotonic()
+        outcome = "timeout"
+        try:
+            while True:
+                token = self.try_acquire()
+                if token is not None:
+                    outcome = "ok"
+                    return token
+                left = None if timeout is None else timeout - (time.monotonic() - t0)
+                if left is not None and left <= 0:
+                    raise SeatTimeout(f"no {self.name} seat free after {timeout:.0f}s ({self.limit} in use)")
+                # Also wakes up on its own now and then: a crashed holder's lease expires without a push.
+                wait = self.poll if left is None else min(self.poll, left)
+                self.redis.blpop([self.wake_key], timeout=max(1, round(wait)))
+        finally:
+            SEMAPHORE_WAIT_SECONDS.observe(time.monotonic() - t0, semaphore=self.name, outcome=outcome)
+
+    def renew(self, token:str)->bool:
+        """Push the lease out again; ``False`` if it had already expired (its seat may be someone else's now)."""
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.key)
+                    now = self._now()
+                    score = pipe.zscore(self.key, token)
+                    if score is None or score <= now:
+                        pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.zadd(self.key, {token: now + self.lease}, xx=True)
+                    pipe.expire(self.key, self.ttl)
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    def release(self, token:str):
+        with self.redis.pipeline() as pipe:
+            pipe.zrem(self.key, token)
+            pipe.lpush(self.wake_key, 1)
+            pipe.ltrim(self.wake_key, 0, self.limit - 1)
+            pipe.expire(self.wake_key, self.ttl)
+            pipe.execute()
+
+    def in_use(self)->int:
+        return self.redis.zcount(self.key, f"({self._now()}", "+inf")
+
+    @contextmanager
+    def hold(self, timeout:float|None=None):
+        token = self.acquire(timeout)
+        stop = threading.Event()
+
+        def keep_alive():
+            while not stop.wait(self.lease / 3):
+                if not self.renew(token):
+                    # Nothing to interrupt the session with; make the overrun visible instead.
+                    SEMAPHORE_LEASES_LOST.inc(semaphore=self.name)
+                    log.warning("%s seat lease %s lapsed while held; the seat limit may be exceeded",
+                                self.name, token[:8])
+                    return
+
+        t = threading.Thread(target=keep_alive, name=f"{self.name}-lease", daemon=True)
+        t.start()
+        try:
+            yield token
+        finally:
+            stop.set()
+            t.join()
+            self.release(token)
+
+def nsd_seats(redis=None)->RedisSemaphore:
+    """The licensed NSD seats (``NSD_SEATS``), shared by all browser workers."""
+    if redis is None:
+        from .jobs import get_redis
+        redis = get_redis()
+    return RedisSemaphore(redis, "nsd", settings.nsd_seats, lease=settings.nsd_seat_lease)
@@ -6,7 +6,25 @@ class Settings(BaseSettings):
     allowed_origins: str = "http://localhost:3000,http://localhost:8000"
     redis_url: str = "redis://localhost:6379/0"
     rq_queue: str = "automation"
+    queue_routing: bool = True  # per-resource queues (api/queues.py); false = everything on rq_queue
+    automate_result_ttl: int = 7 * 24 * 3600  # how long a job_id stays deduplicated
     filestore_root: str = "./artifacts"
+    parser_cache_dir: str = "./artifacts/.cache/estimates"
+    parser_cache_max_mb: float = 64  # least recently used entries go first; 0 = no cap
+    sof_cache_dir: str = "./artifacts/.cache/sof"
+    sof_cache_max_mb: float = 1024
+    # Attachment uploads (api/uploads.py)
+    upload_dir: str = "./artifacts/uploads"
+    upload_chunk_size: int = 8 * 1024 * 1024
+    upload_max_bytes: int = 4 * 1024 ** 3
+    upload_ttl: int = 7 * 24 * 3600
+    # Outbound HTTP (async clients)
+    http_max_connections: int = 20
+    http_max_keepalive: int = 10
+    http_retries: int = 3
+    http_backoff_base: float = 0.5
+    http_backoff_max: float = 10.0
+    http_retry_after_max: float = 60.0
     # Maximizer
     max_base_url: str = "https://api.maximizer.com"
     max_auth_mode: str = "PAT"
@@ -14,20 +32,40 @@ class Settings(BaseSettings):
     max_vendor_id: str | None = None
     max_app_key: str | None = None
     max_tenant: str | None = None
+    maximizer_use_mock: bool = True
+    lookup_cache_ttl: float = 300.0
+    lookup_cache_negative_ttl: float = 60.0
+    lookup_cache_size: int = 5000
+    lookup_cache_prefetch: int = 50
+    lookup_cache_redis: bool = False
+    maximizer_concurrency: int = 8
     # NSD
     nsd_url: str = "https://nsd.example.com/login"
     nsd_user: str | None = None
     nsd_pass: str | None = None
+    nsd_ready_selector: str = "text=Dashboard"
+    nsd_pool_size: int = 2
+    nsd_context_max_uses: int = 25
+    nsd_storage_state: str = "./artifacts/.cache/nsd_state.json"
+    nsd_seats: int = 2  # licensed concurrent sessions across all workers; 0 = no limit
+    nsd_seat_lease: float = 120.0
+    nsd_seat_timeout: float = 900.0
     # Trello
     trello_key: str | None = None
     trello_token: str | None = None
     trello_list_id: str | None = None
+    trello_concurrency: int = 4
+    trello_base_url: str = "https://api.trello.com/1"
     # Email
     smtp_host: str | None = None
     smtp_port: int = 587
     smtp_user: str | None = None
     smtp_pass: str | None = None
     smtp_from: str = "Estimating <estimating@example.com>"
+    smtp_starttls: bool = True
+    smtp_pool_size: int = 4
+    smtp_retries: int = 3
+    outbox_dir: str = "./artifacts/outbox"
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8",
                                       env_prefix="", case_sensitive=False)
@@ -0,0 +1,431 @@
+
+"""Job attachments uploaded over HTTP, streamed to disk and bound to a job_id.
+
+Files are written as they arrive, ``WRITE_BLOCK`` bytes at a time from a
+thread (hashlib and ``os.pwrite`` release the GIL), so memory per request
+stays at one block however big the file. There are three ways in:
+
+* ``POST /jobs/{job_id}/files``: multipart/form-data, one upload per file part.
+* ``PUT /uploads/{id}``: the whole file as the body of an upload created
+  with ``POST /uploads`` (Content-Length or chunked transfer encoding).
+* ``PUT /uploads/{id}/chunks/{n}``: the file in ``chunk_size`` pieces, in
+  any order and in parallel. ``GET /uploads/{id}`` lists the chunks still
+  missing, so an interrupted upload resumes where it stopped, and
+  ``POST /uploads/{id}/complete`` finishes it. Each chunk is streamed to a
+  file of its own and copied into place only once its size and hash check
+  out, so a bad retry never spoils a chunk already received; ``complete``
+  waits for no chunk (it answers 409 while one is still being copied in).
+
+Every file is size-checked (against the declared size and
+``UPLOAD_MAX_BYTES``) and hashed while streaming. A single-stream upload's
+``sha256`` is of the whole file. A chunked upload is hashed per chunk and
+gets ``chunks_sha256``, the SHA-256 of its chunk digests in order; it is
+re-read for a whole-file ``sha256`` only when the client declared one to
+check. Upload state is kept in Redis, so chunks of one file may land on
+different API processes sharing ``UPLOAD_DIR``. A finished upload is
+referenced from ``/automate`` as ``{"kind": "Plans", "upload_id": ...}``.
+
+    python -m api.uploads gc      # drop partial files whose upload expired
+"""
+import email.message, hashlib, os, pathlib, re, time, uuid
+from starlette.concurrency import run_in_threadpool
+from .settings import settings
+
+WRITE_BLOCK = 1 << 20
+UPLOAD_KEY = "upload:{}"
+JOB_UPLOADS_KEY = "upload:job:{}"
+MAX_PART_HEADERS = 16 * 1024
+CHUNK_LEASE = 600  # seconds a crashed chunk writer can hold up complete()
+
+class UploadError(ValueError):
+    def __init__(self, status:int, detail:str):
+        super().__init__(detail)
+        self.status, self.detail = status, detail
+
+def safe_name(filename:str)->str:
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", pathlib.PurePath(filename or "").name).strip("._")
+    return name[:120] or "upload.bin"
+
+class _Sink:
+    """Writes a byte stream at ``offset`` of ``fd`` in ``WRITE_BLOCK`` pieces, hashing it on the way."""
+    def __init__(self, fd:int, offset:int, limit:int):
+        self.fd, self.offset, self.limit = fd, offset, limit
+        self.size = 0
+        self.sha = hashlib.sha256()
+        self.buf = bytearray()
+
+    def _write(self, block:bytes):
+        self.sha.update(block)
+        view = memoryview(block)
+        while view:
+            n = os.pwrite(self.fd, view, self.offset)
+            self.offset += n
+            view = view[n:]
+
+    async def feed(self, data:bytes):
+        self.size += len(data)
+        if self.size > self.limit:
+            raise UploadError(413, f"more than the {self.limit} bytes expected")
+        self.buf += data
+        if len(self.buf) >= WRITE_BLOCK:
+            block, self.buf = bytes(self.buf), bytearray()
+            await run_in_threadpool(self._write, block)
+
+    async def close(self)->str:
+        if self.buf:
+            await run_in_threadpool(self._write, bytes(self.buf))
+            self.buf = bytearray()
+        return self.sha.hexdigest()
+
+class MultipartReader:
+    """Incremental multipart/form-data parser: ``feed`` bytes, get back events.
+
+    Events are ``("part", headers)``, ``("data", bytes)`` and ``("end", None)``;
+    at most one delimiter's worth of bytes is held back between calls.
+    """
+    def __init__(self, boundary:bytes):
+        self.delim = b"\r\n--" + boundary
+        self.buf = b"\r\n"  # so the opening boundary looks like every other delimiter
+        self.state = "preamble"
+
+    def feed(self, data:bytes)->list[tuple]:
+        if self.state == "done":
+            return []  # epilogue
+        self.buf += data
+        out = []
+        while True:
+            if self.state == "preamble":
+                i = self.buf.find(self.delim)
+                if i < 0:
+                    self.buf = self.buf[-len(self.delim):]
+                    return out
+                self.buf, self.state = self.buf[i + len(self.delim):], "delimiter"
+            if self.state == "delimiter":
+                if len(self.buf) < 2:
+                    return out
+                if self.buf.startswith(b"--"):
+                    self.state = "done"
+                    return out
+                if not self.buf.startswith(b"\r\n"):
+                    raise UploadError(400, "malformed multipart body")
+                self.buf, self.state = self.buf[2:], "headers"
+            if self.state == "headers":
+                i = self.buf.find(b"\r\n\r\n")
+                if i < 0:
+                    if len(self.buf) > MAX_PART_HEADERS:
+                        raise UploadError(400, "multipart part headers too large")
+                    return out
+                headers = {}
+                for line in self.buf[:i].decode("utf-8", "replace").split("\r\n"):
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                self.buf, self.state = self.buf[i + 4:], "body"
+                out.append(("part", headers))
+            if self.state == "body":
+                i = self.buf.find(self.delim)
+                if i < 0:
+                    keep = len(self.delim) - 1
+                    if len(self.buf) > keep:
+                        out.append(("data", self.buf[:-keep]))
+                        self.buf = self.buf[-keep:]
+                    return out
+                if i:
+                    out.append(("data", self.buf[:i]))
+                self.buf, self.state = self.buf[i + len(self.delim):], "delimiter"
+                out.append(("end", None))
+
+    @property
+    def done(self)->bool:
+        return self.state == "done"
+
+def _disposition(headers:dict)->tuple[str|None, str|None]:
+    msg = email.message.Message()
+    msg["content-disposition"] = headers.get("content-disposition", "")
+    return msg.get_param("name", header="content-disposition"), msg.get_param("filename", header="content-disposition")
+
+class UploadStore:
+    def __init__(self, redis, root:str|os.PathLike|None=None):
+        self.redis = redis
+        self.root = pathlib.Path(root or settings.upload_dir)
+
+    # -- state -------------------------------------------------------------------
+
+    def job_dir(self, job_id:str)->pathlib.Path:
+        return self.root / safe_name(job_id)
+
+    def _chunk_file(self, job_id:str, upload_id:str, index:int, token:str)->pathlib.Path:
+        return self.job_dir(job_id) / ".chunks" / f"{upload_id}.{index}.{token}"
+
+    def _partial(self, job_id:str, upload_id:str)->pathlib.Path:
+        return self.job_dir(job_id) / ".partial" / upload_id
+
+    def _save(self, meta:dict):
+        key = UPLOAD_KEY.format(meta["upload_id"])
+        with self.redis.pipeline() as pipe:
+            pipe.hset(key, mapping={k: "" if v is None else str(v) for k, v in meta.items()})
+            pipe.expire(key, settings.upload_ttl)
+            pipe.sadd(JOB_UPLOADS_KEY.format(meta["job_id"]), meta["upload_id"])
+            pipe.expire(JOB_UPLOADS_KEY.format(meta["job_id"]), settings.upload_ttl)
+            pipe.execute()
+
+    def get(self, upload_id:str)->dict:
+        raw = self.redis.hgetall(UPLOAD_KEY.format(upload_id))
+        if not raw:
+            raise UploadError(404, f"upload {upload_id} not found")
+        meta = {k.decode(): v.decode() for k, v in raw.items()}
+        for k in ("size", "chunk_size", "chunks"):
+            meta[k] = int(meta[k]) if meta.get(k) else None
+        for k in ("sha256", "chunks_sha256", "path"):
+            meta[k] = meta.get(k) or None
+        return meta
+
+    def create(self, job_id:str, filename:str, size:int|None, kind:str="Plans",
+               sha256:str|None=None, chunk_size:int|None=None)->dict:
+        """Register an upload of ``size`` bytes (``None``: not known yet) and reserve its file."""
+        if size is not None and not 0 <= size <= settings.upload_max_bytes:
+            raise UploadError(413, f"size must be between 0 and {settings.upload_max_bytes} bytes")
+        chunk_size = chunk_size or settings.upload_chunk_size
+        if chunk_size <= 0:
+            raise UploadError(400, "chunk_size must be positive")
+        upload_id = uuid.uuid4().hex
+        partial = self._partial(job_id, upload_id)
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        with open(partial, "wb") as f:
+            if size:
+                f.truncate(size)  # sparse; chunks fill it in place
+        meta = {"upload_id": upload_id, "job_id": job_id, "filename": safe_name(filename), "kind": kind,
+                "size": size, "sha256": sha256.lower() if sha256 else None, "chunk_size": chunk_size,
+                "chunks": -(-size // chunk_size) if size else (0 if size == 0 else None),
+                "chunks_sha256": None, "state": "open", "path": None}
+        self._save(meta)
+        return meta
+
+    def status(self, upload_id:str)->dict:
+        meta = self.get(upload_id)
+        received = sorted(int(i) for i in self.redis.smembers(UPLOAD_KEY.format(upload_id) + ":chunks"))
+        got = set(received)
+        missing = [i for i in range(meta["chunks"] or 0) if i not in got] if meta["state"] == "open" else []
+        return {**meta, "received": len(received), "missing": missing}
+
+    def list_job(self, job_id:str)->list[dict]:
+        ids = sorted(i.decode() for i in self.redis.smembers(JOB_UPLOADS_KEY.format(job_id)))
+        out = []
+        for upload_id in ids:
+            try:
+                out.append(self.get(upload_id))
+            except UploadError:
+                continue  # expired
+        return out
+
+    def _open(self, upload_id:str, completing:bool=False)->dict:
+        """The upload's meta if it still takes data; ``completing``: the caller holds the complete() flag."""
+        meta = self.get(upload_id)
+        if meta["state"] != "open":
+            raise UploadError(409, f"upload {upload_id} is already {meta['state']}")
+        if meta.pop("completing", None) and not completing:
+            raise UploadError(409, f"upload {upload_id} is being completed")
+        return meta
+
+    def _finish(self, meta:dict, size:int, sha256:str|None, chunks_sha256:str|None=None)->dict:
+        if meta["sha256"] and sha256 and meta["sha256"] != sha256:
+            raise UploadError(422, f"sha256 mismatch: expected {meta['sha256']}, got {sha256}")
+        final = self.job_dir(meta["job_id"]) / f"{meta['upload_id']}-{meta['filename']}"
+        os.replace(self._partial(meta["job_id"], meta["upload_id"]), final)
+        meta.update(size=size, sha256=sha256 or meta["sha256"], chunks_sha256=chunks_sha256,
+                    state="complete", path=str(final))
+        self._save(meta)
+        return meta
+
+    def _discard(self, meta:dict):
+        self._partial(meta["job_id"], meta["upload_id"]).unlink(missing_ok=True)
+        self.redis.delete(UPLOAD_KEY.format(meta["upload_id"]))
+
+    # -- writing -----------------------------------------------------------------
+
+    async def _stream_to(self, path:pathlib.Path, offset:int, limit:int, stream)->tuple[int, str]:
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            sink = _Sink(fd, offset, limit)
+            async for data in stream:
+                await sink.feed(data)
+            return sink.size, await sink.close()
+        finally:
+            os.close(fd)
+
+    def _mark_writing(self, key:str, token:str):
+        with self.redis.pipeline() as pipe:
+            pipe.zadd(key + ":writing", {token: time.time() + CHUNK_LEASE})
+            pipe.expire(key + ":writing", CHUNK_LEASE)
+            pipe.execute()
+
+    async def write_chunk(self, upload_id:str, index:int, stream, sha256:str|None=None)->dict:
+        """Store chunk ``index`` from ``stream``; its length must be exactly the chunk's."""
+        meta = self._open(upload_id)
+        if meta["size"] is None or not 0 <= index < meta["chunks"]:
+            raise UploadError(400, f"chunk {index} is out of range")
+        offset = index * meta["chunk_size"]
+        length = min(meta["chunk_size"], meta["size"] - offset)
+        key, token = UPLOAD_KEY.format(upload_id), uuid.uuid4().hex
+        tmp = self._chunk_file(meta["job_id"], upload_id, index, token)
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        tmp.touch()
+        self._mark_writing(key, token)
+        try:
+            size, digest = await self._stream_to(tmp, 0, length, stream)
+            if size != length:
+                raise UploadError(400, f"chunk {index} is {size} bytes, expected {length}")
+            if sha256 and sha256.lower() != digest:
+                raise UploadError(422, f"chunk {index} sha256 mismatch")
+            # Marker first, then the state: complete() flags itself first, then looks for markers,
+            # so either it sees this write or this write sees it.
+            self._mark_writing(key, token)
+            self._open(upload_id)
+            await run_in_threadpool(_copy_into, tmp, self._partial(meta["job_id"], upload_id), offset)
+            with self.redis.pipeline() as pipe:
+                pipe.hset(key + ":digests", index, digest)
+                pipe.sadd(key + ":chunks", index)
+                pipe.expire(key + ":digests", settings.upload_ttl)
+                pipe.expire(key + ":chunks", settings.upload_ttl)
+                pipe.execute()
+        finally:
+            tmp.unlink(missing_ok=True)
+            self.redis.zrem(key + ":writing", token)
+        return {"upload_id": upload_id, "chunk": index, "size": size, "sha256": digest}
+
+    async def complete(self, upload_id:str)->dict:
+        """Finish a chunked upload once every chunk is in."""
+        status = self.status(upload_id)
+        if status["state"] != "open":
+            raise UploadError(409, f"upload {upload_id} is already {status['state']}")
+        if status["missing"]:
+            raise UploadError(409, f"{len(status['missing'])} chunks missing, first {status['missing'][0]}")
+        key = UPLOAD_KEY.format(upload_id)
+        # Only one complete() at a time gets past here; the flag is cleared when it is done either way.
+        if not self.redis.hsetnx(key, "completing", 1):
+            raise UploadError(409, f"upload {upload_id} is being completed")
+        try:
+            meta = self._open(upload_id, completing=True)
+            if self.redis.zcount(key + ":writing", f"({time.time()}", "+inf"):
+                raise UploadError(409, f"upload {upload_id} has chunks still being written")
+            ids = list(range(meta["chunks"] or 0))
+            digests = self.redis.hmget(key + ":digests", ids) if ids else []  # size 0: no chunks at all
+            chunks_sha256 = hashlib.sha256(b"".join(bytes.fromhex(d.decode()) for d in digests)).hexdigest()
+            sha256 = None
+            if meta["sha256"]:
+                # Chunks arrive out of order, so a whole-file hash needs one sequential re-read.
+                sha256 = await run_in_threadpool(_file_sha256, self._partial(meta["job_id"], upload_id))
+            done = self._finish(meta, meta["size"], sha256, chunks_sha256)
+            self.redis.delete(key + ":digests", key + ":chunks", key + ":writing")
+            return done
+        finally:
+            self.redis.hdel(key, "completing")
+
+    async def write_whole(self, upload_id:str, stream)->dict:
+        """The entire file from one request body."""
+        meta = self._open(upload_id)
+        limit = settings.upload_max_bytes if meta["size"] is None else meta["size"]
+        try:
+            size, digest = await self._stream_to(self._partial(meta["job_id"], upload_id), 0, limit, stream)
+        except UploadError:
+            self._discard(meta)
+            raise
+        if meta["size"] is not None and size != meta["size"]:
+            self._discard(meta)
+            raise UploadError(400, f"received {size} bytes, expected {meta['size']}")
+        return self._finish(meta, size, digest)
+
+    async def write_multipart(self, job_id:str, boundary:bytes, stream)->list[dict]:
+        """Every file part of a multipart/form-data body, each as its own upload of ``job_id``.
+
+        A ``kind`` field applies to the file parts after it; other fields are ignored.
+        """
+        reader = MultipartReader(boundary)
+        kind, field, done = "Plans", None, []
+        meta = fd = sink = None
+        try:
+            async for data in stream:
+                for event, value in reader.feed(data):
+                    if event == "part":
+                        name, filename = _disposition(value)
+                        if filename is not None:
+                            meta = self.create(job_id, filename, None, kind)
+                            fd = os.open(self._partial(job_id, meta["upload_id"]), os.O_WRONLY)
+                            sink = _Sink(fd, 0, settings.upload_max_bytes)
+                        else:
+                            field = [name, b""]
+                    elif event == "data":
+                        if sink is not None:
+                            await sink.feed(value)
+                        elif field is not None and len(field[1]) < 1024:
+                            field[1] += value
+                    elif sink is not None:
+                        digest = await sink.close()
+                        os.close(fd)
+                        fd = None
+                        done.append(self._finish(meta, sink.size, digest))
+                        meta = sink = None
+                    else:
+                        if field[0] == "kind":
+                            kind = field[1].decode("utf-8", "replace").strip() or kind
+                        field = None
+            if not reader.done:
+                raise UploadError(400, "multipart body ended early")
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            if meta is not None:
+                self._discard(meta)
+            raise
+        return done
+
+    # -- use -----------------------------------------------------------------------
+
+    def resolve(self, job_id:str, upload_id:str)->str:
+        """Path of a finished upload of ``job_id``, for an attachment given by ``upload_id``."""
+        meta = self.get(upload_id)
+        if meta["job_id"] != job_id:
+            raise UploadError(409, f"upload {upload_id} belongs to job {meta['job_id']}")
+        if meta["state"] != "complete":
+            raise UploadError(409, f"upload {upload_id} is not complete")
+        return meta["path"]
+
+    def gc(self, dry_run:bool=False)->list[str]:
+        """Remove partial files, and chunks left by crashed writers, whose upload has expired from Redis."""
+        removed = []
+        for partial in (*self.root.glob("*/.partial/*"), *self.root.glob("*/.chunks/*")):
+            if not self.redis.exists(UPLOAD_KEY.format(partial.name.split(".", 1)[0])):
+                removed.append(str(partial))
+                if not dry_run:
+                    partial.unlink(missing_ok=True)
+        return removed
+
+def _copy_into(src:pathlib.Path, dst:pathlib.Path, offset:int):
+    fd = os.open(dst, os.O_WRONLY)
+    try:
+        with open(src, "rb") as f:
+            for block in iter(lambda: f.read(WRITE_BLOCK), b""):
+                view = memoryview(block)
+                while view:
+                    n = os.pwrite(fd, view, offset)
+                    offset += n
+                    view = view[n:]
+    finally:
+        os.close(fd)
+
+def _file_sha256(path:pathlib.Path)->str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(WRITE_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+if __name__ == "__main__":
+    import argparse
+    from .jobs import get_redis
+    ap = argparse.ArgumentParser(description="Upload store maintenance.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    g = sub.add_parser("gc")
+    g.add_argument("--dry-run", action="store_true")
+    a = ap.parse_args()
+    for path in UploadStore(get_redis()).gc(a.dry_run):
+        print(path)
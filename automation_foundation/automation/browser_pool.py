@@ -0,0 +1,217 @@
+
+"""Long-lived Playwright browsers with warm, logged-in NSD contexts.
+
+One pool lives in each worker process. Contexts are created from the saved
+storage state (so they start logged in), handed out one job at a time,
+health-checked on checkout and recycled after ``nsd_context_max_uses`` jobs
+or whenever a job raises. ``BrowserPool`` uses the sync API and must stay on
+the thread that created it; ``AsyncBrowserPool`` runs up to ``size`` NSD
+sessions concurrently on one event loop.
+"""
+import asyncio, os, pathlib
+from contextlib import asynccontextmanager, contextmanager
+from api.settings import settings
+
+class _Slot:
+    def __init__(self, ctx, page):
+        self.ctx = ctx
+        self.page = page
+        self.uses = 0
+
+def _state_path(storage_state)->pathlib.Path:
+    return pathlib.Path(storage_state or settings.nsd_storage_state)
+
+def _login_sync(page, state:pathlib.Path):
+    page.goto(settings.nsd_url)
+    if settings.nsd_user and page.locator("#username").count():
+        page.fill("#username", settings.nsd_user)
+        page.fill("#password", settings.nsd_pass or "")
+        page.click("button[type=submit]")
+        page.wait_for_selector(settings.nsd_ready_selector)
+        state.parent.mkdir(parents=True, exist_ok=True)
+        page.context.storage_state(path=str(state))
+
+async def _login_async(page, state:pathlib.Path):
+    await page.goto(settings.nsd_url)
+    if settings.nsd_user and await page.locator("#username").count():
+        await page.fill("#username", settings.nsd_user)
+        await page.fill("#password", settings.nsd_pass or "")
+        await page.click("button[type=submit]")
+        await page.wait_for_selector(settings.nsd_ready_selector)
+        state.parent.mkdir(parents=True, exist_ok=True)
+        await page.context.storage_state(path=str(state))
+
+class BrowserPool:
+    def __init__(self, size:int|None=None, max_uses:int|None=None, storage_state:str|None=None):
+        self.size = size or settings.nsd_pool_size
+        self.max_uses = max_uses or settings.nsd_context_max_uses
+        self.state = _state_path(storage_state)
+        self._pw = None
+        self._browser = None
+        self._idle: list[_Slot] = []
+
+    def _ensure_browser(self):
+        if self._browser is None or not self._browser.is_connected():
+            if self._pw is None:
+                # Imported on first launch so importing the worker does not load Playwright.
+                from playwright.sync_api import sync_playwright
+                self._pw = sync_playwright().start()
+            self._idle.clear()
+            self._browser = self._pw.chromium.launch(headless=True)
+        return self._browser
+
+    def _new_slot(self)->_Slot:
+        state = str(self.state) if self.state.exists() else None
+        ctx = self._ensure_browser().new_context(accept_downloads=True, storage_state=state)
+        page = ctx.new_page()
+        try:
+            _login_sync(page, self.state)
+        except Exception:
+            ctx.close()
+            raise
+        return _Slot(ctx, page)
+
+    @staticmethod
+    def _healthy(slot:_Slot)->bool:
+        try:
+            return not slot.page.is_closed() and slot.page.evaluate("1") == 1
+        except Exception:
+            return False
+
+    def _discard(self, slot:_Slot):
+        try:
+            slot.ctx.close()
+        except Exception:
+            pass
+
+    def warm(self):
+        """Pre-create contexts up to ``size`` so the first jobs skip login."""
+        while len(self._idle) < self.size:
+            self._idle.append(self._new_slot())
+
+    @contextmanager
+    def session(self):
+        """Yield a logged-in page; the context goes back to the pool afterwards."""
+        self._ensure_browser()
+        slot = None
+        while self._idle:
+            candidate = self._idle.pop()
+            if self._healthy(candidate):
+                slot = candidate
+                break
+            self._discard(candidate)
+        slot = slot or self._new_slot()
+        ok = False
+        try:
+            yield slot.page
+            ok = True
+        finally:
+            slot.uses += 1
+            if ok and slot.uses < self.max_uses and len(self._idle) < self.size:
+                self._idle.append(slot)
+            else:
+                self._discard(slot)
+
+    def close(self):
+        for slot in self._idle:
+            self._discard(slot)
+        self._idle.clear()
+        if self._browser is not None:
+            self._browser.close()
+            self._browser = None
+        if self._pw is not None:
+            self._pw.stop()
+            self._pw = None
+
+class AsyncBrowserPool:
+    def __init__(self, size:int|None=None, max_uses:int|None=None, storage_state:str|None=None):
+        self.size = size or settings.nsd_pool_size
+        self.max_uses = max_uses or settings.nsd_context_max_uses
+        self.state = _state_path(storage_state)
+        self._pw = None
+        self._browser = None
+        self._idle: list[_Slot] = []
+        self._sem = asyncio.Semaphore(self.size)
+        self._launch_lock = asyncio.Lock()
+
+    async def _ensure_browser(self):
+        async with self._launch_lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._pw is None:
+                    from playwright.async_api import async_playwright
+                    self._pw = await async_playwright().start()
+                self._idle.clear()
+                self._browser = await self._pw.chromium.launch(headless=True)
+        return self._browser
+
+    async def _new_slot(self)->_Slot:
+        state = str(self.state) if self.state.exists() else None
+        ctx = await (await self._ensure_browser()).new_context(accept_downloads=True, storage_state=state)
+        page = await ctx.new_page()
+        try:
+            await _login_async(page, self.state)
+        except Exception:
+            await ctx.close()
+            raise
+        return _Slot(ctx, page)
+
+    @staticmethod
+    async def _healthy(slot:_Slot)->bool:
+        try:
+            return not slot.page.is_closed() and await slot.page.evaluate("1") == 1
+        except Exception:
+            return False
+
+    async def _discard(self, slot:_Slot):
+        try:
+            await slot.ctx.close()
+        except Exception:
+            pass
+
+    async def warm(self):
+        slots = await asyncio.gather(*(self._new_slot() for _ in range(self.size - len(self._idle))))
+        self._idle.extend(slots)
+
+    @asynccontextmanager
+    async def session(self):
+        async with self._sem:
+            await self._ensure_browser()
+            slot = None
+            while self._idle:
+                candidate = self._idle.pop()
+                if await self._healthy(candidate):
+                    slot = candidate
+                    break
+                await self._discard(candidate)
+            slot = slot or await self._new_slot()
+            ok = False
+            try:
+                yield slot.page
+                ok = True
+            finally:
+                slot.uses += 1
+                if ok and slot.uses < self.max_uses:
+                    self._idle.append(slot)
+                else:
+                    await self._discard(slot)
+
+    async def close(self):
+        for slot in self._idle:
+            await self._discard(slot)
+        self._idle.clear()
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+
+_pool: BrowserPool | None = None
+_pool_pid: int | None = None
+
+def get_pool()->BrowserPool:
+    """The worker process's pool. Browsers never survive a fork, so a child starts its own."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool, _pool_pid = BrowserPool(), os.getpid()
+    return _pool
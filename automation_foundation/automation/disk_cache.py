@@ -0,0 +1,39 @@
+
+"""Size cap for the content-addressed caches under ``artifacts/.cache``.
+
+Entries are whole files named by a digest of their input, so any of them
+can go at any time: the next lookup is a miss and rebuilds it. ``prune``
+deletes the least recently used entries until the directory fits its
+budget. Use is read from the inode change time, which ``touch`` bumps on a
+hit and which hard-linking a cached file into a job directory bumps by
+itself, without touching the mtime the job's copy shares.
+"""
+import os, pathlib
+
+def touch(path:pathlib.Path)->bool:
+    """Mark ``path`` as just used; False if it is gone (pruned by another process)."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def prune(directory:pathlib.Path, max_mb:float, pattern:str="*")->int:
+    """Delete the least recently used ``pattern`` files until the rest fit in ``max_mb``; 0 = no cap."""
+    if not max_mb:
+        return 0
+    entries = []
+    for p in directory.glob(pattern):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_ctime, st.st_size, p))
+    total, budget, removed = sum(e[1] for e in entries), max_mb * 1024 * 1024, 0
+    for _, size, p in sorted(entries, key=lambda e: e[0]):
+        if total <= budget:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
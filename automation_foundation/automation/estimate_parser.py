@@ -1,11 +1,171 @@
 
-import pdfplumber, re
+import hashlib, json, os, pathlib, re, threading
+from concurrent.futures import ProcessPoolExecutor
+from api.settings import settings
+from automation.disk_cache import prune, touch
 
-def parse_estimate_pdf(path:str)->dict:
+# Bump when the patterns change so cached results are not reused.
+PARSER_VERSION = 2
+
+FIELDS = {
+    "total": re.compile(r"(?<!sub)Total\s*\$?([\d,]+\.\d{2})", re.I),
+    "estimate_no": re.compile(r"Estimate\s*(?:No\.?|Number|#)\s*[:#]?\s*([A-Z0-9][A-Z0-9-]*)", re.I),
+    "tax": re.compile(r"(?:HST|GST|PST|Sales\s+Tax|Tax)\s*(?:\(?[\d.]+\s*%\)?)?\s*:?\s*\$?([\d,]+\.\d{2})", re.I),
+}
+MONEY_FIELDS = ("total", "tax")
+
+# "<qty> <description> <unit price> <amount>" rows, e.g. "2 Solid core door 36x84 450.00 900.00"
+LINE_ITEM = re.compile(
+    r"^\s*(?P<qty>\d+(?:\.\d+)?)\s+(?P<description>.+?)\s+\$?(?P<unit_price>[\d,]+\.\d{2})\s+\$?(?P<amount>[\d,]+\.\d{2})\s*$"
+)
+
+PAGES_PER_WORKER = 25   # documents longer than this are split across a process pool
+HASH_CHUNK = 1 << 20
+
+def _money(s:str)->float:
+    return float(s.replace(",", ""))
+
+def _iter_page_text(pdf, start:int=0, stop:int|None=None):
+    # Close each page after use so pdfplumber drops its cached layout objects.
+    for page in pdf.pages[start:stop]:
+        try:
+            yield page.extract_text() or ""
+        finally:
+            page.close()
+
+def _scan_pdf(pdf, start:int=0, stop:int|None=None)->dict:
+    """First match of every field within pages [start, stop), stopping once all are found."""
+    found, scanned, pages = {}, 0, 0
+    for offset, text in enumerate(_iter_page_text(pdf, start, stop)):
+        pages += 1
+        scanned += len(text)
+        for name, rx in FIELDS.items():
+            if name not in found:
+                m = rx.search(text)
+                if m:
+                    found[name] = (start + offset, m.group(1))
+        if len(found) == len(FIELDS):
+            break
+    return {"found": found, "raw_len": scanned, "pages": pages}
+
+def _scan(path:str, start:int=0, stop:int|None=None)->dict:
+    import pdfplumber  # lazy: ~40 ms of pdfminer imports nobody else needs
+    with pdfplumber.open(path) as pdf:
+        return _scan_pdf(pdf, start, stop)
+
+def _merge(parts:list[dict])->dict:
+    # Earliest page wins, matching a scan over the whole document.
+    found = {}
+    for part in parts:
+        for name, (page_no, value) in part["found"].items():
+            if name not in found or page_no < found[name][0]:
+                found[name] = (page_no, value)
+    return found
+
+_pool: ProcessPoolExecutor | None = None
+_pool_key: tuple | None = None
+_pool_lock = threading.Lock()
+
+def _parse_pool(workers:int)->ProcessPoolExecutor:
+    """The process pool for long documents, started on first use and kept for later parses."""
+    global _pool, _pool_key
+    # A forked child (PrewarmedWorker) cannot use its parent's pool; it starts its own.
+    key = (os.getpid(), workers)
+    with _pool_lock:
+        if _pool_key != key:
+            if _pool is not None and _pool_key[0] == key[0]:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool, _pool_key = ProcessPoolExecutor(max_workers=workers), key
+        return _pool
+
+def _scan_ranges(path:str, pdf, n_pages:int, workers:int)->list[dict]:
+    """Scan a long document in ``PAGES_PER_WORKER`` ranges: the first here on the open ``pdf``, the rest on a pool.
+
+    Ranges are consumed in page order; once those done so far hold every
+    field, later ones cannot change the result, so they are cancelled.
+    """
+    bounds = [(s, min(s + PAGES_PER_WORKER, n_pages)) for s in range(0, n_pages, PAGES_PER_WORKER)]
+    futures = [_parse_pool(workers).submit(_scan, path, s, e) for s, e in bounds[1:]]
+    try:
+        parts = [_scan_pdf(pdf, *bounds[0])]
+        for f in futures:
+            if len(_merge(parts)) == len(FIELDS):
+                break
+            parts.append(f.result())
+    finally:
+        # Ranges still queued are dropped; one already running finishes in the background.
+        for f in futures:
+            f.cancel()
+    return parts
+
+def file_digest(path:str)->str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _cache_path(digest:str)->pathlib.Path:
+    return pathlib.Path(settings.parser_cache_dir) / f"v{PARSER_VERSION}-{digest}.json"
+
+def parse_estimate_pdf(path:str, use_cache:bool=True, max_workers:int|None=None)->dict:
+    """Estimate number, total and tax from the first page each appears on.
+
+    Scanning stops once every field is found, so ``raw_len`` is the text
+    length of the ``pages_scanned`` pages that were read, not of the whole
+    document (``pages``).
+    """
+    cache = None
+    if use_cache:
+        cache = _cache_path(file_digest(path))
+        if touch(cache):
+            try:
+                return json.loads(cache.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                pass  # pruned between the two calls
+
+    import pdfplumber
+    workers = max_workers or os.cpu_count() or 1
+    with pdfplumber.open(path) as pdf:
+        n_pages = len(pdf.pages)
+        if n_pages > PAGES_PER_WORKER and workers > 1:
+            parts = _scan_ranges(path, pdf, n_pages, workers)
+        else:
+            parts = [_scan_pdf(pdf)]
+
+    values = {name: v for name, (_, v) in _merge(parts).items()}
+    for name in MONEY_FIELDS:
+        if name in values:
+            values[name] = _money(values[name])
+
+    result = {
+        "estimate_no": values.get("estimate_no"),
+        "total": values.get("total"),
+        "tax": values.get("tax"),
+        "raw_len": sum(p["raw_len"] for p in parts),
+        "pages": n_pages,
+        "pages_scanned": sum(p["pages"] for p in parts),
+    }
+    if cache is not None:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(result), encoding="utf-8")
+        os.replace(tmp, cache)
+        prune(cache.parent, settings.parser_cache_max_mb, "*.json")
+    return result
+
+def iter_line_items(path:str):
+    """Yield line items page by page; the table is never held in memory."""
+    import pdfplumber
     with pdfplumber.open(path) as pdf:
-        text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-    total = None
-    m = re.search(r"Total\s*\$?([\d,]+\.\d{2})", text, re.I)
-    if m: total = float(m.group(1).replace(",",""))
-    # TODO: parse estimate number, taxes, line items as needed
-    return {"estimate_no":"EST-PLACEHOLDER", "total": total, "raw_len": len(text)}
+        for page_no, text in enumerate(_iter_page_text(pdf)):
+            for line in text.splitlines():
+                m = LINE_ITEM.match(line)
+                if m:
+                    yield {
+                        "page": page_no,
+                        "qty": float(m["qty"]),
+                        "description": m["description"],
+                        "unit_price": _money(m["unit_price"]),
+                        "amount": _money(m["amount"]),
+                    }
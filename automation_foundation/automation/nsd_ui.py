@@ -1,24 +1,23 @@
 
-from playwright.sync_api import sync_playwright
-from api.settings import settings
+import pathlib, shutil
+from api.metrics import external_call
+from automation.browser_pool import AsyncBrowserPool, BrowserPool, get_pool
 
-def run_nsd_flow(job, sof_pdf_path:str, out_pdf_path:str)->dict:
+def run_nsd_flow(job, sof_pdf_path:str, out_pdf_path:str, pool:BrowserPool|None=None)->dict:
     # TODO: Implement the real NSD UI sequence.
-    # This stub logs in and pretends to generate an estimate PDF.
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        ctx = browser.new_context(accept_downloads=True)
-        page = ctx.new_page()
-        page.goto(settings.nsd_url)
-        # page.fill("#username", settings.nsd_user)
-        # page.fill("#password", settings.nsd_pass)
-        # page.click("button[type=submit]")
-        # page.wait_for_selector("text=Dashboard")
-
+    # This stub borrows a logged-in page from the worker's pool and pretends to generate an estimate PDF.
+    with external_call("nsd", "estimate"), (pool or get_pool()).session() as page:
         # Upload SOF, navigate to print, intercept download...
         # For now, just copy the SOF as a placeholder for output to prove the pipeline.
-        import shutil
-        shutil.copy2(sof_pdf_path, out_pdf_path)
+        # A previous run's output may be a read-only link into the blob store; replace, never overwrite.
+        pathlib.Path(out_pdf_path).unlink(missing_ok=True)
+        shutil.copyfile(sof_pdf_path, out_pdf_path)
+    return {"estimate_no": "EST-PLACEHOLDER"}
 
-        ctx.close(); browser.close()
+async def run_nsd_flow_async(job, sof_pdf_path:str, out_pdf_path:str, pool:AsyncBrowserPool)->dict:
+    # Same flow as run_nsd_flow; lets one worker drive several NSD sessions at once.
+    async with pool.session() as page:
+        with external_call("nsd", "estimate"):
+            pathlib.Path(out_pdf_path).unlink(missing_ok=True)
+            shutil.copyfile(sof_pdf_path, out_pdf_path)
     return {"estimate_no": "EST-PLACEHOLDER"}
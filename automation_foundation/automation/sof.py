@@ -1,11 +1,91 @@
 
+"""SOF PDF rendering with warm templates, stylesheet and fonts.
+
+The compiled template, the parsed ``sof.css`` and WeasyPrint's font
+configuration are built once per process and reused for every render.
+Output is keyed by the SHA-256 of the rendered HTML: if a PDF for the same
+content already exists under ``sof_cache_dir`` it is linked into place and
+WeasyPrint is not called at all. The cache is kept under ``sof_cache_max_mb``
+by dropping the least recently used PDFs.
+"""
+import hashlib, os, pathlib, shutil
+from concurrent.futures import ProcessPoolExecutor
 from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
+from api.settings import settings
+from automation.disk_cache import prune
+
+TEMPLATES = pathlib.Path("templates")
+
+env = Environment(loader=FileSystemLoader(str(TEMPLATES)))
+
+class SofRenderer:
+    def __init__(self, cache_dir:str|None=None):
+        # Imported here so processes that never render do not pay for WeasyPrint/Pango.
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+        self.template = env.get_template("sof.html.j2")
+        self.font_config = FontConfiguration()
+        css_text = (TEMPLATES / "sof.css").read_text(encoding="utf-8")
+        self.stylesheets = [CSS(string=css_text, font_config=self.font_config)]
+        self.cache_dir = pathlib.Path(cache_dir or settings.sof_cache_dir)
+        # The stylesheet is part of the output, so it is part of the key.
+        self._salt = hashlib.sha256(css_text.encode("utf-8")).digest()
+
+    def render_html(self, job_data:dict)->str:
+        return self.template.render(job=job_data)
+
+    def content_key(self, html:str)->str:
+        return hashlib.sha256(self._salt + html.encode("utf-8")).hexdigest()
 
-env = Environment(loader=FileSystemLoader("templates"))
+    def render(self, job_data:dict, out_path:str)->str:
+        from weasyprint import HTML
+        html = self.render_html(job_data)
+        cached = self.cache_dir / f"{self.content_key(html)}.pdf"
+        if cached.exists():
+            try:  # linking bumps the entry's ctime, which is what prune() orders by
+                _link(cached, pathlib.Path(out_path))
+                return out_path
+            except FileNotFoundError:
+                pass  # pruned by another process in between; render it again
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cached.with_suffix(f".{os.getpid()}.tmp")
+        HTML(string=html, base_url=str(TEMPLATES)).write_pdf(
+            str(tmp), stylesheets=self.stylesheets, font_config=self.font_config)
+        os.replace(tmp, cached)
+        _link(cached, pathlib.Path(out_path))
+        prune(self.cache_dir, settings.sof_cache_max_mb, "*.pdf")
+        return out_path
+
+def _link(src:pathlib.Path, dest:pathlib.Path):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists():
+        if dest.samefile(src):
+            return
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+_renderer: SofRenderer | None = None
+
+def get_renderer()->SofRenderer:
+    global _renderer
+    if _renderer is None:
+        _renderer = SofRenderer()
+    return _renderer
 
 def generate_sof_pdf(job, out_path:str):
-    tmpl = env.get_template("sof.html.j2")
-    html = tmpl.render(job=job.model_dump())
-    HTML(string=html).write_pdf(out_path)
-    return out_path
+    return get_renderer().render(job.model_dump(), out_path)
+
+def _render_one(args):
+    job_data, out_path = args
+    return get_renderer().render(job_data, out_path)
+
+def render_batch(items, max_workers:int|None=None, chunksize:int=4)->list[str]:
+    """Render ``[(job, out_path), ...]`` across a process pool; each process warms up once."""
+    work = [(job.model_dump() if hasattr(job, "model_dump") else job, str(out)) for job, out in items]
+    if len(work) <= 1 or max_workers == 1:
+        return [_render_one(w) for w in work]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=get_renderer) as ex:
+        return list(ex.map(_render_one, work, chunksize=chunksize))
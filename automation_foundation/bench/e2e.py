@@ -0,0 +1,581 @@
+
+"""End-to-end throughput: ``/automate`` at set arrival rates, through RQ workers, against local stand-ins.
+
+Nothing leaves the machine:
+
+* Redis: fakeredis, with the API and one worker thread per ``--workers``
+  slot in this process; or ``--redis URL`` (the db is flushed) with one
+  ``SimpleWorker`` process per slot, as in docker-compose;
+* NSD: ``bench.stub_nsd``. Browser workers log in to it through the real
+  Playwright pool; ``--nsd http`` instead logs in and prints the estimate
+  over plain HTTP, for hosts without Chromium;
+* SOF: rendered with WeasyPrint; ``--sof copy`` writes a fixed PDF instead;
+* Maximizer: ``bench.stub_maximizer`` behind ``/lookup/company``, which every
+  arrival calls first, as the intake form does;
+* Trello and SMTP: ``bench.stub_trello`` and ``bench.smtp_sink``. The card
+  and the email send are commented out in ``build_stages``, so the bench
+  appends them as ``trello`` and ``send`` stages on the api lane.
+
+Each ``--rates`` value (jobs per minute) is one phase: ``--jobs`` arrivals
+at that rate (``--poisson`` for exponential gaps), then the queues drain.
+Per phase it reports completed jobs per minute, end-to-end latency,
+per-stage wall time (from each job's ``spans.jsonl``) and CPU, queue wait
+per queue, ``/automate`` and lookup latency, CPU and peak RSS per lane,
+and the stand-ins' call counts. ``--out`` saves the results as JSON and
+``--baseline`` compares against an earlier file (``bench.results``),
+exiting 1 on regressions.
+
+    python -m bench.e2e --rates 30 60 120 --jobs 40 --out bench-e2e.json
+    python -m bench.e2e --nsd http --sof copy --rates 120 --jobs 60        # no Chromium or Pango here
+    python -m bench.e2e --rates 60 --baseline bench-e2e.json --tolerance 0.2
+    python -m bench.e2e --redis redis://localhost:6379/15 --workers cpu=2,browser=2,api=1
+"""
+import argparse, asyncio, contextvars, dataclasses, json, os, pathlib, random, re, shutil, subprocess, sys
+import tempfile, threading, time
+from datetime import timezone
+from urllib.parse import quote, urljoin
+from rq import SimpleWorker
+from rq.timeouts import TimerDeathPenalty
+from api.settings import Settings, settings
+from bench.results import percentiles
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+NSD_MODES = ("browser", "http")
+SOF_MODES = ("render", "copy")
+WORKER_THREAD = "bench-worker"
+DONE = ("finished", "failed", "stopped", "canceled")
+ERROR_LINE = re.compile(r"^[\w.]*(Error|Exception|Timeout)\b")
+
+# -- worker side --------------------------------------------------------------------
+
+_LANE: contextvars.ContextVar[str | None] = contextvars.ContextVar("bench_lane", default=None)
+STAGE_CPU: dict[tuple, float] = {}  # (lane, stage, ran on the worker's own thread) -> CPU seconds
+_cpu_lock = threading.Lock()
+_local = threading.local()
+
+def _timed(stage):
+    """The stage with its CPU time (on whichever thread runs it) added to ``STAGE_CPU``."""
+    fn = stage.fn
+    def run(**kwargs):
+        t0 = time.thread_time()
+        try:
+            return fn(**kwargs)
+        finally:
+            key = (_LANE.get(), stage.name, threading.current_thread().name.startswith(WORKER_THREAD))
+            with _cpu_lock:
+                STAGE_CPU[key] = STAGE_CPU.get(key, 0.0) + time.thread_time() - t0
+    return dataclasses.replace(stage, fn=run)
+
+def _trello():
+    if getattr(_local, "trello", None) is None:
+        from api.clients.trello import TrelloClient
+        _local.trello = TrelloClient()
+    return _local.trello
+
+def _browser_pool():
+    # Sync Playwright stays on the thread that started it, so each worker thread gets its own pool.
+    if getattr(_local, "pool", None) is None:
+        from automation.browser_pool import BrowserPool
+        _local.pool = BrowserPool()
+    return _local.pool
+
+def http_nsd_flow(job, sof_pdf_path:str, out_pdf_path:str)->dict:
+    """``run_nsd_flow`` without a browser: the same login and print round trips to the stub, over HTTP."""
+    import requests
+    from api.metrics import external_call
+    session = getattr(_local, "nsd", None)
+    if session is None:
+        session = _local.nsd = requests.Session()
+        session.post(settings.nsd_url, data={"username": settings.nsd_user, "password": settings.nsd_pass},
+                     timeout=30).raise_for_status()
+    with external_call("nsd", "estimate"), open(sof_pdf_path, "rb") as f:
+        r = session.post(urljoin(settings.nsd_url, "/estimates"), data=f, timeout=120)
+    r.raise_for_status()
+    pathlib.Path(out_pdf_path).unlink(missing_ok=True)
+    pathlib.Path(out_pdf_path).write_bytes(r.content)
+    return {"estimate_no": r.headers.get("X-Estimate-No")}
+
+def copy_sof(job, out_path:str):
+    from bench.stub_nsd import estimate_pdf
+    pathlib.Path(out_path).write_bytes(estimate_pdf(f"SOF-{job.job_id}", items=len(job.line_items)))
+
+def install_stages(nsd:str, sof:str):
+    """Add the delivery stages to ``worker.worker``'s pipeline, time every stage, and swap in the stand-ins."""
+    import worker.worker as w
+    from api.clients.emailer import send_email
+    from worker.pipeline import Stage
+    build = w.build_stages
+
+    def trello(job, estimate):
+        no = estimate.get("estimate_no") or ""
+        return {"trello_card": _trello().create_card(f"Estimate {no} — {job.customer.name}", "Automated estimate")}
+
+    def send(job, estimate, estimate_pdf, email_html):
+        send_email(job.customer.email or "ops@example.com", f"Estimate {estimate.get('estimate_no') or ''}",
+                   email_html, [estimate_pdf])
+        return {"sent": True}
+
+    def build_stages(logs, outputs, seats=None):
+        stages = build(logs, outputs, seats) + [
+            Stage("trello", trello, inputs=("job", "estimate"), outputs=("trello_card",), resource="api"),
+            Stage("send", send, inputs=("job", "estimate", "estimate_pdf", "email_html"), outputs=("sent",),
+                  resource="api"),
+        ]
+        return [_timed(s) for s in stages]
+
+    w.build_stages = build_stages
+    if nsd == "http":
+        w.run_nsd_flow = http_nsd_flow
+    else:
+        from automation.nsd_ui import run_nsd_flow
+        w.run_nsd_flow = lambda job, sof_pdf, out_pdf: run_nsd_flow(job, sof_pdf, out_pdf, pool=_browser_pool())
+    if sof == "copy":
+        w.generate_sof_pdf = copy_sof
+
+class BenchWorker(SimpleWorker):
+    """A SimpleWorker that tags its jobs with its lane and can dump ``STAGE_CPU`` after each one."""
+    lane: str | None = None
+    dump: str | None = None
+
+    def execute_job(self, job, queue):
+        token = _LANE.set(self.lane)
+        try:
+            return super().execute_job(job, queue)
+        finally:
+            _LANE.reset(token)
+            if self.dump:
+                with _cpu_lock:
+                    rows = [[*k, v] for k, v in STAGE_CPU.items()]
+                pathlib.Path(f"{self.dump}.tmp").write_text(json.dumps(rows), encoding="utf-8")
+                os.replace(f"{self.dump}.tmp", self.dump)
+
+    def work(self, *args, **kwargs):
+        try:
+            return super().work(*args, **kwargs)
+        finally:
+            pool = getattr(_local, "pool", None)
+            if pool is not None:
+                pool.close()
+
+class ThreadWorker(BenchWorker):
+    """Runs off the main thread: no signal handlers, a timer for job timeouts, and a short dequeue wait
+    so ``_stop_requested`` is noticed within a second."""
+    death_penalty_class = TimerDeathPenalty
+
+    def _install_signal_handlers(self):
+        pass
+
+    @property
+    def dequeue_timeout(self)->int:
+        return 1
+
+def _worker_main(lane:str, nsd:str, sof:str):
+    # A --redis worker process; its settings come from the environment the harness set.
+    from redis import Redis
+    from rq import Queue
+    from api.queues import queue_names
+    install_stages(nsd, sof)
+    r = Redis.from_url(settings.redis_url)
+    w = BenchWorker([Queue(n, connection=r) for n in queue_names([lane])], connection=r,
+                    name=f"bench-{lane}-{os.getpid()}")
+    w.lane, w.dump = lane, f"stage-cpu-{lane}-{os.getpid()}.json"
+    w.work(logging_level="WARNING")
+
+# -- harness side -------------------------------------------------------------------
+
+def start_stubs(args)->dict:
+    from bench import smtp_sink, stub_maximizer, stub_nsd, stub_trello
+    return {"nsd": stub_nsd.serve(latency=args.nsd_latency, print_latency=args.nsd_print_s),
+            "maximizer": stub_maximizer.serve(latency=args.maximizer_latency),
+            "trello": stub_trello.serve(latency=args.trello_latency),
+            "smtp": smtp_sink.serve()}
+
+def stub_counts(stubs:dict)->dict:
+    return {"maximizer_calls": stubs["maximizer"].calls["n"], "trello_cards": stubs["trello"].calls["cards"],
+            "emails": stubs["smtp"].messages}
+
+def stub_env(stubs:dict, redis_url:str, workdir:pathlib.Path)->dict:
+    """Settings, as environment variables, that point the API and workers at the stand-ins."""
+    port = lambda name: stubs[name].server_address[1]
+    return {"REDIS_URL": redis_url, "QUEUE_ROUTING": "true",
+            "NSD_URL": f"http://127.0.0.1:{port('nsd')}/login", "NSD_USER": "bench", "NSD_PASS": "bench",
+            "NSD_STORAGE_STATE": str(workdir / "nsd_state.json"),
+            "MAXIMIZER_USE_MOCK": "false", "MAX_BASE_URL": f"http://127.0.0.1:{port('maximizer')}", "MAX_PAT": "bench",
+            "TRELLO_BASE_URL": f"http://127.0.0.1:{port('trello')}/1", "TRELLO_KEY": "bench", "TRELLO_TOKEN": "bench",
+            "TRELLO_LIST_ID": "bench",
+            "SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(port("smtp")), "SMTP_STARTTLS": "false", "SMTP_USER": "",
+            "FILESTORE_ROOT": str(workdir / "store"), "OUTBOX_DIR": str(workdir / "outbox"),
+            "UPLOAD_DIR": str(workdir / "uploads")}
+
+def _reload_settings():
+    fresh = Settings()
+    for name in Settings.model_fields:
+        setattr(settings, name, getattr(fresh, name))
+
+def _parse_workers(spec:str)->dict[str, int]:
+    from api.queues import LANES
+    out = {}
+    for part in filter(None, spec.split(",")):
+        lane, _, n = part.partition("=")
+        if lane not in LANES:
+            raise SystemExit(f"unknown lane {lane!r}; lanes are {', '.join(LANES)}")
+        out[lane] = int(n or 1)
+    return out
+
+class Workers:
+    """The worker pool: threads on fakeredis, or processes on a real Redis; plus CPU/RSS accounting."""
+
+    def __init__(self, lanes:dict[str, int], redis, fake_server, args, workdir:pathlib.Path):
+        import psutil
+        self.lanes, self.workdir = lanes, workdir
+        self.me = psutil.Process()
+        self.threads: list[tuple[str, ThreadWorker, threading.Thread]] = []
+        self.procs: list[tuple[str, subprocess.Popen, object]] = []
+        self.peak_rss: dict[str, float] = {}
+        self._sampling = threading.Event()
+        if fake_server is not None:
+            import fakeredis
+            from rq import Queue
+            from api.queues import queue_names
+            install_stages(args.nsd, args.sof)
+            for lane, n in lanes.items():
+                for i in range(n):
+                    conn = fakeredis.FakeRedis(server=fake_server)
+                    w = ThreadWorker([Queue(q, connection=conn) for q in queue_names([lane])], connection=conn,
+                                     name=f"bench-{lane}-{i}")
+                    w.lane = lane
+                    t = threading.Thread(target=w.work, kwargs={"logging_level": "WARNING"},
+                                         name=f"{WORKER_THREAD}-{lane}-{i}", daemon=True)
+                    t.start()
+                    self.threads.append((lane, w, t))
+        else:
+            env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+            for lane, n in lanes.items():
+                for _ in range(n):
+                    p = subprocess.Popen([sys.executable, "-m", "bench.e2e", "--_worker", lane, "--nsd", args.nsd,
+                                          "--sof", args.sof], cwd=workdir, env=env)
+                    self.procs.append((lane, p, psutil.Process(p.pid)))
+        threading.Thread(target=self._sample, daemon=True).start()
+
+    @staticmethod
+    def _tree(proc)->list:
+        try:
+            return [proc, *proc.children(recursive=True)]
+        except Exception:
+            return [proc]
+
+    def _rss_by_group(self)->dict[str, float]:
+        groups = {"harness": self._tree(self.me)}
+        for lane, _, proc in self.procs:
+            groups.setdefault(lane, []).extend(self._tree(proc))
+        out = {}
+        for name, procs in groups.items():
+            total = 0
+            for p in procs:
+                try:
+                    total += p.memory_info().rss
+                except Exception:
+                    pass
+            out[name] = total / 1e6
+        return out
+
+    def _sample(self):
+        while True:
+            if self._sampling.is_set():
+                for name, mb in self._rss_by_group().items():
+                    self.peak_rss[name] = max(self.peak_rss.get(name, 0.0), mb)
+            time.sleep(0.25)
+
+    def _stage_cpu(self)->dict[tuple, float]:
+        if self.threads:
+            with _cpu_lock:
+                return dict(STAGE_CPU)
+        rows = {}
+        for path in self.workdir.glob("stage-cpu-*.json"):
+            try:
+                for lane, stage, on_worker, v in json.loads(path.read_text(encoding="utf-8")):
+                    key = (lane, stage, on_worker)
+                    rows[key] = rows.get(key, 0.0) + v
+            except (OSError, ValueError):
+                continue
+        return rows
+
+    def cpu(self)->dict:
+        """Cumulative CPU seconds: per lane, per (lane, stage), and for the harness process tree."""
+        def tree_cpu(proc)->float:
+            total = 0.0
+            for p in self._tree(proc):
+                try:
+                    t = p.cpu_times()
+                    total += t.user + t.system
+                except Exception:
+                    pass
+            return total
+        stage = self._stage_cpu()
+        lanes = {lane: 0.0 for lane in self.lanes}
+        if self.threads:
+            # A worker thread's own time covers RQ and its inline stages; pool-thread stages are added from STAGE_CPU.
+            times = {t.id: t.user_time + t.system_time for t in self.me.threads()}
+            for lane, _, thread in self.threads:
+                lanes[lane] += times.get(thread.native_id, 0.0)
+            for (lane, _, on_worker), v in stage.items():
+                if lane in lanes and not on_worker:
+                    lanes[lane] += v
+        else:
+            for lane, _, proc in self.procs:
+                lanes[lane] += tree_cpu(proc)
+        return {"lanes": lanes, "stages": stage, "harness": tree_cpu(self.me)}
+
+    def start_phase(self):
+        self.peak_rss.clear()
+        self._sampling.set()
+
+    def stop(self):
+        self._sampling.clear()
+        for _, w, _ in self.threads:
+            w._stop_requested = True
+        for _, _, t in self.threads:
+            t.join(timeout=30)
+        for _, p, _ in self.procs:
+            p.terminate()
+        for _, p, _ in self.procs:
+            try:
+                p.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+def _specs(prefix:str, n:int, rush_every:int)->list[dict]:
+    base = json.loads((ROOT / "sample-job.json").read_text(encoding="utf-8"))
+    return [{**base, "job_id": f"{prefix}-{i:04d}",
+             "priority": "rush" if rush_every and i % rush_every == rush_every - 1 else "normal"} for i in range(n)]
+
+async def _submit(app, spec:dict, rng:random.Random)->dict:
+    from bench.stub_maximizer import WORDS
+    from bench.uploads import call
+    rec = {"job_id": spec["job_id"], "arrived": time.time()}
+    # The intake form looks the customer up before submitting.
+    q = f"{rng.choice(WORDS)} {rng.choice(WORDS)}"[:rng.randint(3, 9)]
+    t0 = time.perf_counter()
+    status, rows = await call(app, "GET", f"/lookup/company?q={quote(q)}&limit=5")
+    rec["lookup_s"] = time.perf_counter() - t0
+    if status == 200 and rows:
+        hit = rows[0]
+        spec = {**spec, "customer": {**spec["customer"], "name": hit["name"], "max_abentry_key": hit["max_abentry_key"]}}
+    t0 = time.perf_counter()
+    status, res = await call(app, "POST", "/automate", [json.dumps(spec).encode()], {"content-type": "application/json"})
+    rec["automate_s"] = time.perf_counter() - t0
+    rec["accepted"] = status == 200 and bool(res and res.get("enqueued"))
+    if not rec["accepted"]:
+        rec["error"] = res
+    return rec
+
+async def _arrivals(app, specs:list[dict], per_min:float, poisson:bool, rng:random.Random)->list[dict]:
+    t0, at, tasks = time.perf_counter(), 0.0, []
+    for spec in specs:
+        await asyncio.sleep(max(0.0, t0 + at - time.perf_counter()))
+        tasks.append(asyncio.create_task(_submit(app, spec, rng)))
+        at += rng.expovariate(per_min / 60) if poisson else 60 / per_min
+    return await asyncio.gather(*tasks)
+
+def _ts(dt)->float:
+    return dt.replace(tzinfo=timezone.utc).timestamp()  # RQ stores naive UTC
+
+def _drain(redis, job_ids:list[str], timeout:float)->tuple[dict, dict[str, list[str]]]:
+    """Follow every job across its hops until its last hop is done; returns the last hops and every hop id."""
+    from rq.job import Job
+    hops = {j: [j] for j in job_ids}
+    done, pending, deadline = {}, set(job_ids), time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        ids = sorted(pending)
+        for jid, job in zip(ids, Job.fetch_many([hops[j][-1] for j in ids], connection=redis)):
+            if job is None:
+                continue
+            if job.meta.get("next"):
+                hops[jid].append(job.meta["next"])
+            elif job.get_status(refresh=False) in DONE:
+                done[jid] = job
+                pending.discard(jid)
+        if pending:
+            time.sleep(0.1)
+    return done, hops
+
+def _error_line(job)->str:
+    # The exception line of the traceback (messages can run on for several lines after it).
+    result = job.latest_result()
+    lines = (result.exc_string or "").strip().splitlines() if result else []
+    return next((l for l in reversed(lines) if ERROR_LINE.match(l)), lines[-1] if lines else "unknown error")
+
+def _spans(workdir:pathlib.Path, job_ids)->tuple[dict, dict]:
+    stages, hops = {}, {}
+    for jid in job_ids:
+        path = workdir / "artifacts" / f"job-{jid}" / "logs" / "spans.jsonl"
+        if not path.exists():
+            continue
+        for line in path.read_text(encoding="utf-8").splitlines():
+            rec = json.loads(line)
+            if rec.get("resumed") or rec.get("outcome") != "ok":
+                continue
+            into = hops if rec["span"].startswith("pipeline") else stages
+            into.setdefault(rec["span"], []).append(rec["duration_s"])
+    return stages, hops
+
+def run_phase(app, redis, workers:Workers, stubs:dict, workdir:pathlib.Path, name:str, per_min:float, jobs:int,
+              args)->dict:
+    from rq.job import Job
+    specs = _specs(name.upper(), jobs, args.rush_every)
+    rng = random.Random(f"{args.seed}-{name}")
+    cpu0, counts0 = workers.cpu(), stub_counts(stubs)
+    workers.start_phase()
+    t0 = time.time()
+    arrivals = asyncio.run(_arrivals(app, specs, per_min, args.poisson, rng))
+    accepted = [a["job_id"] for a in arrivals if a["accepted"]]
+    done, hops = _drain(redis, accepted, args.timeout)
+    cpu1, counts1 = workers.cpu(), stub_counts(stubs)
+    finished = {j: job for j, job in done.items() if job.get_status(refresh=False) == "finished"}
+    arrived = {a["job_id"]: a["arrived"] for a in arrivals}
+    ends = {j: _ts(job.ended_at) for j, job in finished.items() if job.ended_at}
+    span_s = (max(ends.values()) - t0) if ends else time.time() - t0
+
+    waits = {}
+    all_hops = [h for j in accepted for h in hops[j]]
+    for job in Job.fetch_many(all_hops, connection=redis):
+        if job is not None and job.started_at and job.enqueued_at:
+            waits.setdefault(job.origin, []).append(_ts(job.started_at) - _ts(job.enqueued_at))
+    stages, pipeline = _spans(workdir, accepted)
+    stage_cpu = {}
+    for key, v in cpu1["stages"].items():
+        stage_cpu[key[1]] = stage_cpu.get(key[1], 0.0) + v - cpu0["stages"].get(key, 0.0)
+
+    failed = {j: _error_line(job) for j, job in done.items() if j not in finished}
+    return {
+        "name": name, "offered_per_min": per_min, "jobs": jobs, "accepted": len(accepted),
+        "completed": len(finished), "failed": len(failed), "unfinished": len(accepted) - len(done),
+        "elapsed_s": round(span_s, 3), "jobs_per_min": round(len(finished) / span_s * 60, 2) if span_s else 0.0,
+        "e2e_s": percentiles([ends[j] - arrived[j] for j in ends]),
+        "api": {"automate_s": percentiles([a["automate_s"] for a in arrivals]),
+                "lookup_s": percentiles([a["lookup_s"] for a in arrivals])},
+        "stages": {s: {"wall_s": percentiles(v), "cpu_per_job_s": round(stage_cpu.get(s, 0.0) / max(1, len(v)), 6)}
+                   for s, v in stages.items()},
+        "hops": {s: percentiles(v) for s, v in pipeline.items()},
+        "queue_wait_s": {q: percentiles(v) for q, v in sorted(waits.items())},
+        "workers": {lane: {"n": n, "cpu_s": round(cpu1["lanes"][lane] - cpu0["lanes"][lane], 3),
+                           "cpu_pct": round(100 * (cpu1["lanes"][lane] - cpu0["lanes"][lane]) / span_s, 1)
+                           if span_s else None,
+                           **({"peak_rss_mb": round(workers.peak_rss.get(lane, 0.0), 1)} if workers.procs else {})}
+                    for lane, n in workers.lanes.items()},
+        "harness": {"cpu_s": round(cpu1["harness"] - cpu0["harness"], 3),
+                    "peak_rss_mb": round(workers.peak_rss.get("harness", 0.0), 1)},
+        "stubs": {k: counts1[k] - counts0[k] for k in counts1},
+        "errors": sorted(set(failed.values()))[:5],
+    }
+
+def _print_phase(p:dict):
+    ms = lambda d, k: f"{d[k] * 1000:9.1f}" if d.get("n") else "        -"
+    print(f"\n{p['name']}: offered {p['offered_per_min']:g}/min, {p['completed']}/{p['jobs']} completed "
+          f"({p['failed']} failed, {p['unfinished']} unfinished) in {p['elapsed_s']:.1f} s -> "
+          f"{p['jobs_per_min']:.1f} jobs/min")
+    print(f"  {'ms':<26}{'p50':>9}{'p95':>10}{'p99':>10}{'CPU/job':>10}")
+    rows = [("end to end", p["e2e_s"], None), ("POST /automate", p["api"]["automate_s"], None),
+            ("GET /lookup/company", p["api"]["lookup_s"], None)]
+    rows += [(f"stage {s}", v["wall_s"], v["cpu_per_job_s"]) for s, v in p["stages"].items()]
+    rows += [(s, v, None) for s, v in p["hops"].items()]
+    rows += [(f"wait {q}", v, None) for q, v in p["queue_wait_s"].items()]
+    for label, d, cpu in rows:
+        print(f"  {label:<26}{ms(d, 'p50')} {ms(d, 'p95')} {ms(d, 'p99')}" +
+              (f" {cpu * 1000:9.1f}" if cpu is not None else ""))
+    threads = True
+    for lane, w in p["workers"].items():
+        threads &= "peak_rss_mb" not in w
+        rss = "" if threads else f", peak RSS {w['peak_rss_mb']:.0f} MB"
+        print(f"  workers {lane} x{w['n']}: CPU {w['cpu_s']:.2f} s ({w['cpu_pct']}% of wall){rss}")
+    h = p["harness"]
+    print(f"  harness ({'API, stubs and worker threads' if threads else 'API and stubs'}): CPU {h['cpu_s']:.2f} s, "
+          f"peak RSS {h['peak_rss_mb']:.0f} MB; stubs {p['stubs']}")
+    for e in p["errors"]:
+        print(f"  error: {e}")
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end throughput against local stand-ins.")
+    ap.add_argument("--rates", type=float, nargs="+", default=[30.0], help="arrival rates, jobs per minute (one phase each)")
+    ap.add_argument("--jobs", type=int, default=30, help="arrivals per phase")
+    ap.add_argument("--poisson", action="store_true", help="exponential inter-arrival gaps instead of fixed ones")
+    ap.add_argument("--rush-every", type=int, default=0, help="every n-th job is a rush job")
+    ap.add_argument("--warmup", type=int, default=2, help="jobs run (and not counted) before the first phase")
+    ap.add_argument("--workers", default="cpu=1,browser=1,api=1", help="lane=count,...")
+    ap.add_argument("--nsd", choices=NSD_MODES, default="browser")
+    ap.add_argument("--sof", choices=SOF_MODES, default="render")
+    ap.add_argument("--nsd-latency", type=float, default=0.02, help="stub NSD delay per request, seconds")
+    ap.add_argument("--nsd-print-s", type=float, default=1.0, help="stub NSD delay to print an estimate")
+    ap.add_argument("--maximizer-latency", type=float, default=0.08)
+    ap.add_argument("--trello-latency", type=float, default=0.05)
+    ap.add_argument("--timeout", type=float, default=600, help="seconds to wait for a phase to drain")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--redis", help="real Redis URL (its db is flushed); workers become processes")
+    ap.add_argument("--out", help="write the results as JSON")
+    ap.add_argument("--baseline", help="compare with an earlier --out file; exit 1 on regressions")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    ap.add_argument("--keep", action="store_true", help="keep the work directory (artifacts, spans)")
+    ap.add_argument("--_worker", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args._worker:
+        return _worker_main(args._worker, args.nsd, args.sof)
+
+    from bench.results import load, report, save
+    lanes = _parse_workers(args.workers)
+    out = os.path.abspath(args.out) if args.out else None
+    baseline = load(args.baseline) if args.baseline else None
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="bench-e2e-"))
+    # Jobs write artifacts/ and read templates/ relative to the cwd; keep them out of the tree.
+    os.symlink(ROOT / "templates", workdir / "templates")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    stubs = start_stubs(args)
+    os.environ.update(stub_env(stubs, args.redis or "redis://fakeredis/0", workdir))
+    _reload_settings()
+
+    import api.jobs
+    fake_server = None
+    if args.redis:
+        from redis import Redis
+        redis = Redis.from_url(args.redis)
+        redis.flushdb()
+    else:
+        import fakeredis
+        fake_server = fakeredis.FakeServer()
+        redis = fakeredis.FakeRedis(server=fake_server)
+    api.jobs._redis = redis
+    from api.main import app
+
+    workers = Workers(lanes, redis, fake_server, args, workdir)
+    phases, ok = [], True
+    try:
+        if args.warmup:
+            w = run_phase(app, redis, workers, stubs, workdir, "warmup", 600.0, args.warmup, args)
+            print(f"warmup: {w['completed']}/{w['jobs']} jobs in {w['elapsed_s']:.1f} s" +
+                  "".join(f"\n  error: {e}" for e in w["errors"]))
+        for rate in args.rates:
+            p = run_phase(app, redis, workers, stubs, workdir, f"rate-{rate:g}", rate, args.jobs, args)
+            _print_phase(p)
+            phases.append(p)
+            ok &= p["completed"] == p["jobs"]
+    finally:
+        workers.stop()
+        os.chdir(cwd)
+        if args.keep:
+            print(f"\nwork directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "keep", "_worker")}
+    doc = {"results": {"phases": phases}}
+    if out:
+        doc = save(out, "e2e", config, doc["results"])
+        print(f"\nresults written to {out}")
+    if baseline is not None:
+        if baseline.get("config") != config:
+            print("note: the baseline ran with a different configuration")
+        ok &= report(doc, baseline, args.tolerance)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
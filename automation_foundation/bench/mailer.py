@@ -0,0 +1,68 @@
+
+"""Messages per second: one SMTP connection per message vs the pooled outbox.
+
+    python -m bench.mailer --messages 200 --attachment-mb 2
+"""
+import argparse, os, smtplib, tempfile, time
+from email.message import EmailMessage
+from api.settings import settings
+from api.clients import emailer
+from bench.smtp_sink import serve
+
+def per_message(to:str, subject:str, html:str, attachments:list[str]):
+    # The pre-outbox path: whole attachments in memory and a new session per message.
+    msg = EmailMessage()
+    msg["From"] = settings.smtp_from
+    msg["To"] = to
+    msg["Subject"] = subject
+    msg.set_content(emailer.PLAIN_FALLBACK)
+    msg.add_alternative(html, subtype="html")
+    for path in attachments:
+        with open(path, "rb") as f:
+            msg.add_attachment(f.read(), maintype="application", subtype="pdf", filename=os.path.basename(path))
+    with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as s:
+        s.send_message(msg)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=100)
+    ap.add_argument("--attachment-mb", type=float, default=1.0)
+    ap.add_argument("--fail-every", type=int, default=0, help="sink answers every n-th message with 451")
+    args = ap.parse_args()
+
+    sink = serve(fail_every=args.fail_every)
+    settings.smtp_host, settings.smtp_port = "127.0.0.1", sink.server_address[1]
+    settings.smtp_user, settings.smtp_starttls = None, False  # the sink speaks plain SMTP
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.outbox_dir = f"{tmp}/outbox"
+        pdf = f"{tmp}/Estimate.pdf"
+        with open(pdf, "wb") as f:
+            f.write(os.urandom(int(args.attachment_mb * 1024 * 1024)))
+        html = emailer.render_email({"customer": "Acme", "total": 1299.5, "estimate_no": "EST-1"})
+
+        t0 = time.perf_counter()
+        for i in range(args.messages):
+            try:
+                per_message("ops@example.com", f"Estimate {i}", html, [pdf])
+            except smtplib.SMTPException:
+                pass
+        elapsed = time.perf_counter() - t0
+        print(f"per-message connect: {args.messages / elapsed:7.1f} msg/s  ({sink.connections} connections)")
+
+        sink.connections = sink.messages = 0
+        t0 = time.perf_counter()
+        for i in range(args.messages):
+            emailer.queue_email("ops@example.com", f"Estimate {i}", html, [pdf])
+        queued = time.perf_counter() - t0
+        pool = emailer.SmtpPool()
+        report = emailer.flush_outbox(pool=pool, retries=2)
+        pool.close()
+        total = time.perf_counter() - t0
+        print(f"outbox + pool x{pool.size}:  {report['sent'] / total:7.1f} msg/s end to end "
+              f"(queue {queued:.2f}s, send {report['elapsed_s']:.2f}s, {sink.connections} connections, "
+              f"{len(report['failed'])} failed)")
+    sink.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+
+"""Autocomplete latency and upstream volume against the stub Maximizer, with and without the cache.
+
+Simulates estimators typing company names one keystroke at a time, several at once.
+``--check`` instead asserts the cache's behaviour against the stub and exits
+non-zero on the first regression: results equal the uncached client's,
+prefix reuse only from complete result sets, coalescing (threads and
+asyncio), lookups surviving Redis errors, and hits shared through Redis.
+
+    python -m bench.maximizer_lookup --users 8 --latency 0.08
+    python -m bench.maximizer_lookup --check
+"""
+import argparse, asyncio, random, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from redis.exceptions import ConnectionError as RedisConnectionError
+from api.settings import settings
+from api.clients.lookup_cache import CachedMaximizer, LookupStats
+from api.clients.maximizer import AsyncMaximizerClient, MaximizerClient
+from bench.stub_maximizer import WORDS, serve
+
+def keystrokes(rng:random.Random)->list[str]:
+    name = f"{rng.choice(WORDS)} {rng.choice(WORDS)}"
+    return [name[:i] for i in range(1, len(name) + 1)]
+
+def simulate(lookup, users:int, sessions:int, seed:int=1)->LookupStats:
+    stats = LookupStats(window=100_000)
+    def user(uid:int):
+        rng = random.Random(seed + uid)
+        for _ in range(sessions):
+            for q in keystrokes(rng):
+                t0 = time.perf_counter()
+                lookup(q, 10)
+                stats.observe((time.perf_counter() - t0) * 1000)
+    with ThreadPoolExecutor(users) as ex:
+        list(ex.map(user, range(users)))
+    return stats
+
+def report(label:str, stats:LookupStats, upstream:int):
+    snap = stats.snapshot()["latency_ms"]
+    print(f"{label:<11} lookups={snap['samples']:>5} upstream={upstream:>5} "
+          f"p50={snap['p50']:7.2f}ms p95={snap['p95']:7.2f}ms p99={snap['p99']:7.2f}ms")
+
+class _BrokenRedis:
+    """A Redis that is down: every call raises."""
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RedisConnectionError("connection refused")
+        return fail
+
+def check(server, prefetch:int=50):
+    """Assert the cache against the stub; ``AssertionError`` names the first regression."""
+    client = MaximizerClient()
+    calls = lambda: server.calls["n"]
+    def fresh(**kw)->CachedMaximizer:
+        return CachedMaximizer(client, ttl=300, prefetch=prefetch, **kw)
+    def counters(c:CachedMaximizer)->dict:
+        return {k: v for k, v in c.stats.snapshot().items() if k != "latency_ms"}
+    # Expected answers from the uncached client, fetched before any upstream calls are counted.
+    want = {q: client.read_abentry(q, 10) for q in
+            ("acme apex", "acme apex b", "ac", "delta eagle", "summit stoll b")}
+
+    # Prefix reuse: "acme apex" matches fewer than `prefetch` rows, so the set is
+    # complete and longer queries are answered from it without going upstream.
+    c = fresh()
+    complete, longer = "acme apex", "acme apex b"
+    assert 0 < len(client.read_abentry(complete, prefetch + 1)) <= prefetch, "fixture: expected a complete set"
+    n = calls()
+    assert c.search_companies(complete) == want[complete], "miss result differs from upstream"
+    assert calls() == n + 1, "miss did not go upstream exactly once"
+    assert c.search_companies(longer) == want[longer], "prefix hit result differs"
+    assert c.search_companies(complete) == want[complete], "exact hit result differs"
+    assert calls() == n + 1, "complete prefix set was not reused"
+    assert counters(c)["prefix_hits"] == 1 and counters(c)["hits"] == 1, counters(c)
+
+    # An incomplete set ("a" matches far more than `prefetch`) must never answer a longer query.
+    c = fresh()
+    assert len(client.read_abentry("a", prefetch + 1)) > prefetch, "fixture: expected an incomplete set"
+    c.search_companies("a")
+    n = calls()
+    assert c.search_companies("ac") == want["ac"], "longer query after incomplete set differs"
+    assert calls() == n + 1, "incomplete prefix set was reused"
+    assert counters(c)["prefix_hits"] == 0, counters(c)
+
+    # Coalescing: identical lookups in flight together make one upstream call.
+    c = fresh()
+    n, users, barrier = calls(), 8, threading.Barrier(8)
+    def same(_):
+        barrier.wait()
+        return c.search_companies("beacon birch")
+    with ThreadPoolExecutor(users) as ex:
+        results = list(ex.map(same, range(users)))
+    assert calls() == n + 1, f"threads: {calls() - n} upstream calls for one query"
+    assert all(r == results[0] for r in results) and counters(c)["coalesced"] == users - 1, counters(c)
+
+    async def gathered():
+        ac = CachedMaximizer(AsyncMaximizerClient(), ttl=300, prefetch=prefetch)
+        out = await asyncio.gather(*(ac.asearch_companies("cedar crown") for _ in range(users)))
+        return ac, out
+    n = calls()
+    ac, results = asyncio.run(gathered())
+    assert calls() == n + 1, f"asyncio: {calls() - n} upstream calls for one query"
+    assert all(r == results[0] for r in results) and counters(ac)["coalesced"] == users - 1, counters(ac)
+
+    # The row cap travels in the Read request: the stub sends back no more than was asked for.
+    assert len(client.read_abentry("a", 5)) == 5 and server.calls["rows"] == 5, "Top not sent upstream"
+
+    # A key that does not exist is cached as such: the second lookup stays local.
+    c = fresh()
+    n = calls()
+    assert c.get_abentry("AB-99999") is None and c.get_abentry("AB-99999") is None, "missing key returned a row"
+    assert calls() == n + 1, f"not-found looked up {calls() - n} times"
+    assert asyncio.run(c.aget_abentry("AB-99999")) is None and calls() == n + 1, "async not-found went upstream"
+
+    # Redis down: lookups still answer (from upstream and the local tier) and count errors.
+    c = fresh(redis=_BrokenRedis())
+    assert c.search_companies("delta eagle") == want["delta eagle"], "result with Redis down differs"
+    assert c.get_abentry("AB-00001") == client.get_abentry("AB-00001"), "abentry with Redis down differs"
+    assert counters(c)["errors"] >= 2, counters(c)
+    n = calls()
+    c.search_companies("delta eagle")
+    assert calls() == n, "local tier not used while Redis is down"
+
+    # Shared tier: a second replica with an empty local cache is answered from Redis.
+    try:
+        import fakeredis
+    except ImportError:
+        print("shared Redis tier: skipped (pip install fakeredis)")
+    else:
+        shared = fakeredis.FakeRedis()
+        a, b = fresh(redis=shared), fresh(redis=shared)
+        a.search_companies("summit stoll")
+        n = calls()
+        assert b.search_companies("summit stoll b") == want["summit stoll b"], "shared hit differs"
+        assert calls() == n and counters(b)["redis_hits"] == 1, counters(b)
+        a.get_abentry("AB-99998")
+        assert b.get_abentry("AB-99998") is None and calls() == n + 1, "shared not-found went upstream"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=8)
+    ap.add_argument("--sessions", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.08, help="stub Maximizer response time in seconds")
+    ap.add_argument("--check", action="store_true", help="assert cache behaviour instead of benchmarking")
+    args = ap.parse_args()
+
+    server = serve(latency=args.latency)
+    settings.max_base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    if args.check:
+        try:
+            check(server)
+        except AssertionError as e:
+            print(f"lookup cache FAILED: {e}")
+            sys.exit(1)
+        finally:
+            server.shutdown()
+        print("lookup cache OK")
+        return
+    client = MaximizerClient()
+
+    stats = simulate(client.read_abentry, args.users, args.sessions)
+    report("direct", stats, server.calls["n"])
+
+    server.calls["n"] = 0
+    cached = CachedMaximizer(client, ttl=300)
+    stats = simulate(cached.search_companies, args.users, args.sessions)
+    report("cold cache", stats, server.calls["n"])
+
+    # Same population typing again, as happens over a working day.
+    server.calls["n"] = 0
+    stats = simulate(cached.search_companies, args.users, args.sessions, seed=101)
+    report("warm cache", stats, server.calls["n"])
+    print("cache counters:", {k: v for k, v in cached.stats.snapshot().items() if k != "latency_ms"})
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
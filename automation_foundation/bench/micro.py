@@ -0,0 +1,132 @@
+
+"""Micro-benchmarks for the hot pure-Python paths: geometry, JobBundle serialization, estimate parsing.
+
+Each case is timed in ``--repeat`` samples of at least ``--min-time``
+seconds; the per-call time of the samples is reported in microseconds
+(p50 is the one to watch) together with calls per second. ``utils`` and
+``schema`` live at the repository root, one level up; their groups are
+skipped if that is not on disk.
+
+    python -m bench.micro
+    python -m bench.micro --only parse --out micro.json
+    python -m bench.micro --baseline micro.json --tolerance 0.1   # exit 1 on regressions
+"""
+import argparse, pathlib, random, sys, tempfile, time
+from bench.results import load, percentiles, report, save
+
+REPO = pathlib.Path(__file__).resolve().parent.parent.parent
+GROUPS = ("geometry", "bundle", "parse")
+
+def timeit(fn, repeat:int, min_time:float)->dict:
+    """Per-call microseconds over ``repeat`` samples, each looping ``fn`` for at least ``min_time``."""
+    fn()  # warm caches and lazy imports
+    t0 = time.perf_counter()
+    fn()
+    once = max(time.perf_counter() - t0, 1e-7)
+    n = max(1, int(min_time / once))
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        samples.append((time.perf_counter() - t0) / n)
+    us = percentiles(samples, scale=1e6)
+    return {"calls": n * repeat, "us": us, "per_s": round(1e6 / us["p50"], 1)}
+
+def _footprint(rng:random.Random, walls:int)->tuple[list[dict], list[dict]]:
+    # A closed, irregular polygon with a few openings per wall.
+    step = 360.0 / walls
+    segments = [{"length_ft": rng.uniform(10, 120), "angle_deg": i * step} for i in range(walls)]
+    openings = []
+    for w, s in enumerate(segments):
+        for _ in range(rng.randrange(4)):
+            openings.append({"type": rng.choice(["door", "window", "dock"]), "width_ft": rng.uniform(3, 12),
+                             "height_ft": rng.uniform(7, 14), "wall_index": w,
+                             "offset_ft": rng.uniform(0, s["length_ft"])})
+    return segments, openings
+
+def geometry_cases(rng:random.Random)->dict:
+    from utils.geometry import perimeter, place_openings, poly_points, polygon_area
+    cases = {}
+    for walls in (8, 64):
+        segments, openings = _footprint(rng, walls)
+        cases[f"poly_points+area+perimeter/{walls} walls"] = lambda s=segments: (
+            lambda p: (polygon_area(p), perimeter(p)))(poly_points((0, 0), s))
+        cases[f"place_openings/{walls} walls, {len(openings)} openings"] = \
+            lambda s=segments, o=openings: place_openings(s, o, 20.0)
+    return cases
+
+def bundle_cases(rng:random.Random, workdir:pathlib.Path)->dict:
+    from schema.bulk_io import _synthetic
+    from schema.job_schema import JobBundle
+    bundle = next(_synthetic(1, seed=rng.randrange(1 << 30)))
+    raw = bundle.model_dump_json().encode()
+    path = workdir / "job.json"
+    path.write_bytes(raw)
+    return {f"model_dump_json/{len(raw)} B": bundle.model_dump_json,
+            "model_validate_json": lambda: JobBundle.model_validate_json(raw),
+            "from_json (file)": lambda: JobBundle.from_json(str(path))}
+
+def parse_cases(workdir:pathlib.Path)->dict:
+    from automation.estimate_parser import iter_line_items, parse_estimate_pdf
+    from bench.stub_nsd import estimate_pdf
+    cases = {}
+    for pages, items in ((1, 6), (10, 60)):
+        pdf = workdir / f"estimate-{pages}p.pdf"
+        pdf.write_bytes(estimate_pdf("EST-000001", items=items, pages=pages))
+        cases[f"parse_estimate_pdf/{pages} page(s), no cache"] = \
+            lambda p=str(pdf): parse_estimate_pdf(p, use_cache=False, max_workers=1)
+        cases[f"iter_line_items/{pages} page(s)"] = lambda p=str(pdf): sum(1 for _ in iter_line_items(p))
+    cached = str(workdir / "estimate-1p.pdf")
+    parse_estimate_pdf(cached)
+    cases["parse_estimate_pdf/cache hit"] = lambda: parse_estimate_pdf(cached)
+    return cases
+
+def main():
+    ap = argparse.ArgumentParser(description="Micro-benchmarks.")
+    ap.add_argument("--only", nargs="*", choices=GROUPS, default=list(GROUPS))
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds per sample")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write the results as JSON")
+    ap.add_argument("--baseline", help="compare with an earlier --out file; exit 1 on regressions")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    args = ap.parse_args()
+    from api.settings import settings
+
+    if str(REPO) not in sys.path:
+        sys.path.append(str(REPO))
+    rng = random.Random(args.seed)
+    results, ok = {}, True
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = pathlib.Path(tmp)
+        settings.parser_cache_dir = str(workdir / "cache")
+        for group in args.only:
+            try:
+                if group == "geometry":
+                    cases = geometry_cases(rng)
+                elif group == "bundle":
+                    cases = bundle_cases(rng, workdir)
+                else:
+                    cases = parse_cases(workdir)
+            except ImportError as e:
+                print(f"{group}: skipped ({e})")
+                continue
+            print(group)
+            rows = results[group] = []
+            for name, fn in cases.items():
+                r = timeit(fn, args.repeat, args.min_time)
+                rows.append({"name": name, **r})
+                print(f"  {name:<48} {r['us']['p50']:12.1f} us  (p95 {r['us']['p95']:.1f})  {r['per_s']:>12,.0f}/s")
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}
+    doc = {"results": results}
+    if args.out:
+        doc = save(args.out, "micro", config, results)
+        print(f"results written to {args.out}")
+    if args.baseline:
+        ok &= report(doc, load(args.baseline), args.tolerance)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
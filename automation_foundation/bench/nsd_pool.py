@@ -0,0 +1,74 @@
+
+"""Jobs per minute against the stub NSD app: per-job browser launch vs the warm pool.
+
+    python -m bench.nsd_pool --jobs 30 --concurrency 4
+"""
+import argparse, asyncio, tempfile, time
+from playwright.sync_api import sync_playwright
+from api.settings import settings
+from automation.browser_pool import AsyncBrowserPool, BrowserPool
+from bench.stub_nsd import serve
+
+def per_job_launch(dashboard:str):
+    # The pre-pool flow: new Playwright, browser, context and login for every job.
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        ctx = browser.new_context(accept_downloads=True)
+        page = ctx.new_page()
+        page.goto(settings.nsd_url)
+        page.fill("#username", settings.nsd_user)
+        page.fill("#password", settings.nsd_pass)
+        page.click("button[type=submit]")
+        page.wait_for_selector(settings.nsd_ready_selector)
+        page.goto(dashboard)
+        ctx.close(); browser.close()
+
+def _rate(label:str, jobs:int, elapsed:float):
+    print(f"{label:<22} {jobs:>4} jobs in {elapsed:6.2f}s  ->  {jobs / elapsed * 60:8.1f} jobs/min")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=4)
+    args = ap.parse_args()
+
+    server = serve()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    dashboard = f"{base}/dashboard"
+    settings.nsd_url = f"{base}/login"
+    settings.nsd_user, settings.nsd_pass = "bench", "bench"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        for _ in range(args.jobs):
+            per_job_launch(dashboard)
+        _rate("per-job launch", args.jobs, time.perf_counter() - t0)
+
+        pool = BrowserPool(size=1, storage_state=f"{tmp}/sync.json")
+        try:
+            pool.warm()
+            t0 = time.perf_counter()
+            for _ in range(args.jobs):
+                with pool.session() as page:
+                    page.goto(dashboard)
+            _rate("sync pool", args.jobs, time.perf_counter() - t0)
+        finally:
+            pool.close()
+
+        async def run_async():
+            apool = AsyncBrowserPool(size=args.concurrency, storage_state=f"{tmp}/async.json")
+            try:
+                await apool.warm()
+                async def one():
+                    async with apool.session() as page:
+                        await page.goto(dashboard)
+                t0 = time.perf_counter()
+                await asyncio.gather(*(one() for _ in range(args.jobs)))
+                _rate(f"async pool x{args.concurrency}", args.jobs, time.perf_counter() - t0)
+            finally:
+                await apool.close()
+        asyncio.run(run_async())
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
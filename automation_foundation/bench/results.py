@@ -0,0 +1,110 @@
+
+"""Benchmark results as JSON files, and regression checks between two of them.
+
+``save`` writes ``{"bench", "config", "env", "results"}``; ``compare`` walks
+both ``results`` trees and reports every numeric metric that got worse by
+more than ``tolerance`` (a fraction). Latencies, CPU and memory
+(``p50``/``p95``/``p99``/``mean`` and names ending ``_s``/``_ms``/``_us``/``_mb``)
+must not grow; rates (names ending ``per_min``/``per_s``) must not shrink.
+Anything else (counts, ``max``) is reported but never fails a run.
+
+    python -m bench.results bench-e2e.json baseline.json --tolerance 0.15   # exit 1 on regressions
+"""
+import json, os, platform, subprocess, sys, time
+
+LOWER_IS_BETTER = ("p50", "p95", "p99", "mean")
+LOWER_SUFFIXES = ("_s", "_ms", "_us", "_mb")
+HIGHER_SUFFIXES = ("per_min", "per_s")
+
+def percentiles(values, scale:float=1.0)->dict:
+    """Nearest-rank p50/p90/p95/p99, mean and max of ``values`` (times ``scale``), rounded for JSON."""
+    v = sorted(values)
+    if not v:
+        return {"n": 0}
+    pick = lambda q: v[min(len(v) - 1, max(0, round(q * len(v) + 0.5) - 1))]
+    out = {"n": len(v)}
+    for name, q in (("p50", .5), ("p90", .9), ("p95", .95), ("p99", .99)):
+        out[name] = round(pick(q) * scale, 6)
+    out["mean"] = round(sum(v) / len(v) * scale, 6)
+    out["max"] = round(v[-1] * scale, 6)
+    return out
+
+def environment()->dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        rev = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "git": rev, "at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+def save(path:str, bench:str, config:dict, results:dict)->dict:
+    doc = {"bench": bench, "config": config, "env": environment(), "results": results}
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    os.replace(tmp, path)
+    return doc
+
+def load(path:str)->dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def flatten(tree, prefix:str="")->dict[str, float]:
+    """``{"a.b.p95": 1.2, ...}`` for every numeric leaf; list items are keyed by their ``name`` or index."""
+    out = {}
+    if isinstance(tree, dict):
+        items = tree.items()
+    elif isinstance(tree, list):
+        items = ((str(x.get("name", i)) if isinstance(x, dict) else str(i), x) for i, x in enumerate(tree))
+    else:
+        if isinstance(tree, (int, float)) and not isinstance(tree, bool):
+            out[prefix] = tree
+        return out
+    for k, v in items:
+        out.update(flatten(v, f"{prefix}.{k}" if prefix else str(k)))
+    return out
+
+def direction(key:str)->int:
+    """-1 if lower is better, +1 if higher is better, 0 if the metric is informational."""
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith(HIGHER_SUFFIXES):
+        return 1
+    if leaf in LOWER_IS_BETTER or leaf.endswith(LOWER_SUFFIXES):
+        return -1
+    return 0
+
+def compare(current:dict, baseline:dict, tolerance:float=0.15, floor:float=5e-3)->list[dict]:
+    """Metrics of ``current["results"]`` worse than ``baseline["results"]`` by more than ``tolerance``.
+
+    Changes smaller than ``floor`` in absolute terms (5 ms, or 5 kB of RSS) are noise and ignored.
+    """
+    cur, base = flatten(current["results"]), flatten(baseline["results"])
+    worse = []
+    for key in sorted(cur.keys() & base.keys()):
+        sign = direction(key)
+        b, c = base[key], cur[key]
+        if not sign or abs(c - b) < floor:
+            continue
+        change = (c - b) / abs(b) if b else float("inf")
+        if -sign * change > tolerance:
+            worse.append({"metric": key, "baseline": b, "current": c, "change": round(change, 4)})
+    return worse
+
+def report(current:dict, baseline:dict, tolerance:float)->bool:
+    """Print regressions against ``baseline``; True if there are none."""
+    worse = compare(current, baseline, tolerance)
+    print(f"vs baseline {baseline['env'].get('git') or ''} ({baseline['env'].get('at')}), tolerance {tolerance:.0%}: "
+          f"{len(worse)} regression(s)")
+    for w in worse:
+        print(f"  {w['metric']:<60} {w['baseline']:>12g} -> {w['current']:<12g} ({w['change']:+.0%})")
+    return not worse
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    ap.add_argument("current")
+    ap.add_argument("baseline")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    a = ap.parse_args()
+    sys.exit(0 if report(load(a.current), load(a.baseline), a.tolerance) else 1)
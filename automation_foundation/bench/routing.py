@@ -0,0 +1,154 @@
+
+"""Lane routing, rush priority and the NSD seat limit, against fakeredis (or a real Redis).
+
+Two checks:
+
+* seats: ``--holders`` threads contend for ``--seats`` NSD seats; the most
+  ever held at once must not exceed the limit.
+* routing: ``--jobs`` specs (every ``--rush-every``-th a rush job) go
+  through ``enqueue_specs`` and are worked lane by lane with burst
+  ``SimpleWorker``s until every queue is empty. SOF, NSD and parsing are
+  replaced by file writes so only our own routing is measured. Every job
+  must finish on its last hop, and on each lane rush jobs must run first.
+
+    python -m bench.routing --jobs 40 --seats 2 --holders 8
+    python -m bench.routing --redis redis://localhost:6379/15   # a real Redis (flushes that db)
+"""
+import argparse, json, os, pathlib, shutil, sys, tempfile, threading, time
+from api.settings import settings
+
+def _redis(url:str|None):
+    if url:
+        from redis import Redis
+        r = Redis.from_url(url)
+        r.flushdb()
+        return r
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit("pip install fakeredis, or pass --redis URL")
+    return fakeredis.FakeRedis()
+
+def seats_check(r, seats:int, holders:int, hold_s:float)->dict:
+    from api.semaphore import RedisSemaphore
+    sem = RedisSemaphore(r, "bench-nsd", seats, lease=30, poll=0.05)
+    lock, held, peak, waits = threading.Lock(), [0], [0], []
+
+    def holder():
+        t0 = time.perf_counter()
+        with sem.hold(timeout=60):
+            waits.append(time.perf_counter() - t0)
+            with lock:
+                held[0] += 1
+                peak[0] = max(peak[0], held[0])
+            time.sleep(hold_s)
+            with lock:
+                held[0] -= 1
+
+    threads = [threading.Thread(target=holder) for _ in range(holders)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    waits.sort()
+    return {"seats": seats, "holders": holders, "peak": peak[0], "elapsed_s": time.perf_counter() - t0,
+            "wait_p50_s": waits[len(waits) // 2], "wait_max_s": waits[-1], "left_held": sem.in_use()}
+
+def _stub_stages(nsd_order:list):
+    import worker.worker as w
+
+    def sof(job, path):
+        pathlib.Path(path).write_bytes(b"%PDF-1.4 bench\n")
+
+    def nsd(job, sof_pdf_path, out_pdf_path):
+        nsd_order.append(job.job_id)
+        shutil.copyfile(sof_pdf_path, out_pdf_path)
+        return {"estimate_no": f"EST-{job.job_id}"}
+
+    w.generate_sof_pdf, w.run_nsd_flow = sof, nsd
+    w.parse_estimate_pdf = lambda path: {"estimate_no": "EST", "total": 1.0}
+
+def routing_check(r, jobs:int, rush_every:int)->dict:
+    from rq import Queue, SimpleWorker
+    from rq.job import Job
+    from api.jobs import enqueue_specs, pipeline_tail
+    from api.metrics import merge, worker_snapshots
+    from api.models import JobSpec
+    from api.queues import LANES, queue_names, queue_report
+
+    base = json.loads((pathlib.Path(__file__).resolve().parent.parent / "sample-job.json").read_text(encoding="utf-8"))
+    specs = [JobSpec(**{**base, "job_id": f"ROUTE-{i:03d}",
+                        "priority": "rush" if rush_every and i % rush_every == rush_every - 1 else "normal"})
+             for i in range(jobs)]
+    rush = {s.job_id for s in specs if s.priority == "rush"}
+    results = enqueue_specs(specs, Queue(settings.rq_queue, connection=r))
+    assert all(res["enqueued"] for res in results), results
+    queued = {name: row["depth"] for name, row in queue_report(r).items() if row["depth"]}
+
+    nsd_order: list[str] = []
+    _stub_stages(nsd_order)
+    bursts = 0
+    t0 = time.perf_counter()
+    while any(Queue(name, connection=r).count for name in queue_names()):
+        for lane in LANES:
+            queues = [Queue(n, connection=r) for n in queue_names([lane])]
+            SimpleWorker(queues, connection=r).work(burst=True, logging_level="WARNING")
+            bursts += 1
+    elapsed = time.perf_counter() - t0
+
+    hops, failed = {}, []
+    for spec, job in zip(specs, Job.fetch_many([s.job_id for s in specs], connection=r)):
+        tail = pipeline_tail(job)
+        hops[spec.job_id] = int(tail.meta.get("hop", 0)) + 1
+        if tail.get_status() != "finished" or "estimate" not in (tail.return_value() or {}):
+            failed.append(spec.job_id)
+    first_normal = next((i for i, j in enumerate(nsd_order) if j not in rush), len(nsd_order))
+    # The workers ran in this process and published REGISTRY, so the published copy is the whole picture.
+    waits = merge(worker_snapshots(r)).get("queue_wait_seconds")
+    return {"jobs": jobs, "rush": len(rush), "queued": queued, "bursts": bursts, "elapsed_s": elapsed,
+            "hops": sorted(set(hops.values())), "failed": failed,
+            "rush_first": all(j in rush for j in nsd_order[:first_normal]) and
+                          not any(j in rush for j in nsd_order[first_normal:]),
+            "report": queue_report(r, waits)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=30)
+    ap.add_argument("--rush-every", type=int, default=5)
+    ap.add_argument("--seats", type=int, default=2)
+    ap.add_argument("--holders", type=int, default=8)
+    ap.add_argument("--hold-s", type=float, default=0.1)
+    ap.add_argument("--redis", help="Redis URL to use instead of fakeredis (the db is flushed)")
+    args = ap.parse_args()
+    r = _redis(args.redis)
+    settings.queue_routing = True
+
+    s = seats_check(r, args.seats, args.holders, args.hold_s)
+    print(f"seats: {s['holders']} holders on {s['seats']} seats, peak {s['peak']} held, "
+          f"wait p50 {s['wait_p50_s'] * 1000:.0f} ms max {s['wait_max_s'] * 1000:.0f} ms, {s['left_held']} left held")
+
+    root = pathlib.Path(__file__).resolve().parent.parent
+    with tempfile.TemporaryDirectory() as tmp:
+        # Jobs write artifacts/ relative to the cwd; keep them out of the tree.
+        os.symlink(root / "templates", pathlib.Path(tmp) / "templates")
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        settings.filestore_root = str(pathlib.Path(tmp) / "store")
+        try:
+            rt = routing_check(r, args.jobs, args.rush_every)
+        finally:
+            os.chdir(cwd)
+    print(f"routing: {rt['jobs']} jobs ({rt['rush']} rush) in {rt['elapsed_s']:.2f} s over {rt['bursts']} worker bursts, "
+          f"hops per job {rt['hops']}, rush first on the browser lane: {rt['rush_first']}, failed {len(rt['failed'])}")
+    print("queued at entry: " + ", ".join(f"{k} {v}" for k, v in rt["queued"].items()))
+    for name, row in rt["report"].items():
+        if row.get("waited"):
+            print(f"  {name:<26} waited {row['waited']:>3}  p50 <= {row['wait_p50_s']} s  p95 <= {row['wait_p95_s']} s")
+
+    ok = s["peak"] <= s["seats"] and not s["left_held"] and not rt["failed"] and rt["rush_first"]
+    print("routing OK" if ok else "routing FAILED")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
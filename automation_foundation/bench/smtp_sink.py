@@ -0,0 +1,53 @@
+
+"""Local SMTP sink (aiosmtpd-style stand-in): accepts and counts messages, never delivers."""
+import socketserver, threading
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line:str):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        srv = self.server
+        with srv.lock:
+            srv.connections += 1
+        self._reply("220 sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode("latin-1").strip().upper()
+            if cmd.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250-sink\r\n250-8BITMIME\r\n250 SIZE 0\r\n")
+            elif cmd.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self._reply("250 OK")
+            elif cmd == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk == b".\r\n":
+                        break
+                    size += len(chunk)
+                with srv.lock:
+                    srv.messages += 1
+                    srv.bytes += size
+                    fail = srv.fail_every and srv.messages % srv.fail_every == 0
+                self._reply("451 Try again later" if fail else "250 Queued")
+            elif cmd == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Not implemented")
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve(fail_every:int=0)->SinkServer:
+    """Start on a background thread. ``fail_every=n`` answers every n-th DATA with a 451."""
+    server = SinkServer(("127.0.0.1", 0), _Handler)
+    server.lock = threading.Lock()
+    server.messages = server.bytes = server.connections = 0
+    server.fail_every = fail_every
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,57 @@
+
+"""PDFs per second for SOF rendering: per-call setup vs the warm renderer vs a batch pool.
+
+    python -m bench.sof_render --jobs 40 --workers 4
+"""
+import argparse, json, pathlib, tempfile, time
+from api.models import JobSpec
+from automation import sof
+
+def _jobs(n:int)->list[JobSpec]:
+    base = json.loads(open("sample-job.json", encoding="utf-8").read())
+    return [JobSpec(**{**base, "job_id": f"BENCH-{i:05d}"}) for i in range(n)]
+
+def cold_render(job:JobSpec, out_path:str):
+    # The pre-service path: template lookup, CSS parsing and font discovery on every call.
+    from weasyprint import CSS, HTML
+    html = sof.env.get_template("sof.html.j2").render(job=job.model_dump())
+    HTML(string=html).write_pdf(out_path, stylesheets=[CSS(filename=str(sof.TEMPLATES / "sof.css"))])
+
+def _rate(label:str, n:int, elapsed:float):
+    print(f"{label:<18} {n:>4} PDFs in {elapsed:6.2f}s  ->  {n / elapsed:7.1f} PDFs/s")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=20)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    jobs = _jobs(args.jobs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = lambda tag, j: f"{tmp}/{tag}/{j.job_id}.pdf"
+        for tag in ("cold", "warm", "batch"):
+            (pathlib.Path(tmp) / tag).mkdir()
+
+        t0 = time.perf_counter()
+        for j in jobs:
+            cold_render(j, out("cold", j))
+        _rate("cold per-call", len(jobs), time.perf_counter() - t0)
+
+        renderer = sof.SofRenderer(cache_dir=f"{tmp}/cache-warm")
+        t0 = time.perf_counter()
+        for j in jobs:
+            renderer.render(j.model_dump(), out("warm", j))
+        _rate("warm single", len(jobs), time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        for j in jobs:
+            renderer.render(j.model_dump(), out("warm", j))
+        _rate("warm cache hit", len(jobs), time.perf_counter() - t0)
+
+        sof.settings.sof_cache_dir = f"{tmp}/cache-batch"
+        t0 = time.perf_counter()
+        sof.render_batch([(j, out("batch", j)) for j in jobs], max_workers=args.workers)
+        _rate("batch pool", len(jobs), time.perf_counter() - t0)
+
+if __name__ == "__main__":
+    main()
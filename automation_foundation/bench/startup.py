@@ -0,0 +1,124 @@
+
+"""Startup cost: import time of the API and worker, and first-job latency per forked job process.
+
+Import times are measured in fresh interpreters with ``-X importtime``.
+First-job latency forks one process per job, as RQ does, either from a
+plain parent (the default worker: every child imports the pipeline) or
+from one warmed by ``worker.prefork.warm``. NSD is replaced by a file copy
+so the numbers are about our own startup, not the browser.
+
+    python -m bench.startup --jobs 5
+    python -m bench.startup --max-import-ms api.main=900 --max-first-job-ms 400   # exit 1 over budget
+"""
+import argparse, json, os, pathlib, shutil, statistics, subprocess, sys, tempfile, time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+MODULES = ("api.main", "worker.worker")
+
+def import_ms(module:str, runs:int)->tuple[float, list[tuple[str, float]]]:
+    """Median cumulative import time of ``module`` and its heaviest direct imports."""
+    totals, children = [], {}
+    for _ in range(runs):
+        p = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                           cwd=ROOT, capture_output=True, text=True, check=True)
+        for line in p.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+                continue
+            _, cum, name = line.split("|")
+            depth = (len(name) - len(name.lstrip())) // 2
+            if depth == 0 and name.strip() == module:
+                totals.append(int(cum) / 1000)
+            elif depth == 1:
+                children.setdefault(name.strip(), []).append(int(cum) / 1000)
+    top = sorted(((n, statistics.median(v)) for n, v in children.items()), key=lambda x: -x[1])[:6]
+    return statistics.median(totals), top
+
+def _copy_nsd(job, sof_pdf_path:str, out_pdf_path:str)->dict:
+    shutil.copyfile(sof_pdf_path, out_pdf_path)
+    return {"estimate_no": "EST-STARTUP"}
+
+def _run_job(job_dict:dict):
+    import worker.worker as w
+    w.run_nsd_flow = _copy_nsd
+    w.run_pipeline(job_dict)
+
+def _forked_jobs(mode:str, jobs:int)->dict:
+    """Runs in its own interpreter: optionally warm, then time ``jobs`` forked job processes."""
+    base = json.loads((ROOT / "sample-job.json").read_text(encoding="utf-8"))
+    warm_s = 0.0
+    if mode == "warm":
+        from worker.prefork import warm
+        t0 = time.perf_counter()
+        warm()
+        warm_s = time.perf_counter() - t0
+    latencies, failed = [], 0
+    for i in range(jobs):
+        job = {**base, "job_id": f"STARTUP-{mode}-{i}"}
+        t0 = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_job(job)
+            except BaseException:
+                os._exit(1)
+            os._exit(0)
+        _, status = os.waitpid(pid, 0)
+        latencies.append(time.perf_counter() - t0)
+        failed += os.waitstatus_to_exitcode(status) != 0
+    return {"mode": mode, "warm_s": warm_s, "latencies_s": latencies, "failed": failed}
+
+def first_job(mode:str, jobs:int)->dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Jobs write artifacts/ relative to the cwd; keep them out of the tree.
+        os.symlink(ROOT / "templates", pathlib.Path(tmp) / "templates")
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+        p = subprocess.run([sys.executable, "-m", "bench.startup", "--_child", mode, "--jobs", str(jobs)],
+                           cwd=tmp, env=env, capture_output=True, text=True, check=True)
+        return json.loads(p.stdout.splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5, help="fresh interpreters per import measurement")
+    ap.add_argument("--jobs", type=int, default=5, help="forked jobs per mode")
+    ap.add_argument("--max-import-ms", action="append", default=[], metavar="MODULE=MS")
+    ap.add_argument("--max-first-job-ms", type=float, help="budget for the pre-warmed median")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--_child", choices=("cold", "warm"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args._child:
+        print(json.dumps(_forked_jobs(args._child, args.jobs)))
+        return
+
+    report = {"imports": {}, "first_job": {}}
+    for module in MODULES:
+        total, top = import_ms(module, args.runs)
+        report["imports"][module] = {"ms": total, "top": top}
+        if not args.json:
+            print(f"import {module:<16} {total:7.1f} ms   " + ", ".join(f"{n} {ms:.0f}" for n, ms in top))
+    for mode in ("cold", "warm"):
+        r = first_job(mode, args.jobs)
+        median = statistics.median(r["latencies_s"]) * 1000
+        report["first_job"][mode] = {"median_ms": median, "warmup_ms": r["warm_s"] * 1000, "failed": r["failed"]}
+        if not args.json:
+            print(f"first job ({mode}) median {median:7.1f} ms over {args.jobs} forks"
+                  f"   warm-up once {r['warm_s'] * 1000:.0f} ms   failed {r['failed']}")
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+    over = []
+    for spec in args.max_import_ms:
+        module, ms = spec.split("=")
+        if module not in report["imports"]:
+            report["imports"][module] = {"ms": import_ms(module, args.runs)[0]}
+        if report["imports"][module]["ms"] > float(ms):
+            over.append(f"import {module} {report['imports'][module]['ms']:.0f} ms > {ms} ms")
+    if args.max_first_job_ms is not None and report["first_job"]["warm"]["median_ms"] > args.max_first_job_ms:
+        over.append(f"first job {report['first_job']['warm']['median_ms']:.0f} ms > {args.max_first_job_ms:.0f} ms")
+    if any(r["failed"] for r in report["first_job"].values()):
+        over.append("some benchmark jobs failed")
+    for msg in over:
+        print(f"OVER BUDGET: {msg}", file=sys.stderr)
+    sys.exit(1 if over else 0)
+
+if __name__ == "__main__":
+    main()
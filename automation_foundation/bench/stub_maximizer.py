@@ -0,0 +1,58 @@
+
+"""Local stand-in for the Maximizer Octopus ``Read`` endpoint, with a call counter.
+
+Honours ``Top``; ``server.calls["rows"]`` is the row count of the last response.
+"""
+import json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ["Acme", "Apex", "Atlas", "Beacon", "Birch", "Cedar", "Crown", "Delta", "Eagle", "Summit", "Stoll", "Northern"]
+SUFFIXES = ["Builders", "Construction", "Developments", "Contracting", "Holdings", "Properties"]
+
+def companies(n:int=2000, seed:int=7)->list[dict]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(SUFFIXES)} {i}"
+        rows.append({"Key": f"AB-{i:05d}", "CompanyName": name,
+                     "Phone1": {"Value": f"555-{i:04d}"}, "Address": {"City": "Toronto"}})
+    return sorted(rows, key=lambda r: r["CompanyName"].lower())
+
+class _Handler(BaseHTTPRequestHandler):
+    rows: list = []
+    latency = 0.0
+    calls = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        with self.calls["lock"]:
+            self.calls["n"] += 1
+        time.sleep(self.latency)
+        query = body["AbEntry"]["Criteria"]["SearchQuery"]
+        if "Key" in query:
+            data = [r for r in self.rows if r["Key"] == query["Key"]["$EQ"]]
+        else:
+            prefix = query["CompanyName"]["$LIKE"].rstrip("%").lower()
+            data = [r for r in self.rows if r["CompanyName"].lower().startswith(prefix)]
+        if "Top" in body["AbEntry"]:
+            data = data[:body["AbEntry"]["Top"]]
+        with self.calls["lock"]:
+            self.calls["rows"] = len(data)
+        out = json.dumps({"Code": 0, "AbEntry": {"Data": data}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+def serve(latency:float=0.08, n_companies:int=2000)->ThreadingHTTPServer:
+    """Start on a background thread; ``server.calls["n"]`` counts upstream requests."""
+    calls = {"n": 0, "rows": 0, "lock": threading.Lock()}
+    handler = type("Handler", (_Handler,), {"rows": companies(n_companies), "latency": latency, "calls": calls})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.calls = calls
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
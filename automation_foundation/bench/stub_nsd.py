@@ -0,0 +1,112 @@
+
+"""Minimal stand-in for the NSD web app: a login form, a dashboard and estimate printing behind a cookie.
+
+``POST /estimates`` takes an uploaded SOF and answers with an estimate PDF
+(``estimate_pdf``) carrying an estimate number, line items, tax and total
+that ``parse_estimate_pdf`` can read.
+"""
+import itertools, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOGIN = b"""<!doctype html><html><body>
+<form method="post" action="/login">
+  <input id="username" name="username"><input id="password" name="password" type="password">
+  <button type="submit">Sign in</button>
+</form></body></html>"""
+DASHBOARD = b"<!doctype html><html><body><h1>Dashboard</h1></body></html>"
+ITEMS = [("Solid core door 36x84", 450.00), ("Hollow metal frame", 310.00), ("Lever set, passage", 95.50),
+         ("Overhead door 10x12", 4200.00), ("Closer, heavy duty", 240.00), ("Weatherstrip kit", 38.25)]
+
+def _pdf_text(lines:list[str])->bytes:
+    body = ["BT /F1 10 Tf 14 TL 54 750 Td"]
+    body += [f"({line}) '" for line in lines]
+    body.append("ET")
+    return "\n".join(body).encode("latin-1")
+
+def estimate_pdf(estimate_no:str, items:int=6, pages:int=1, tax_rate:float=0.13)->bytes:
+    """A text PDF shaped like an NSD estimate: number on page one, totals on the last page."""
+    rows = [ITEMS[i % len(ITEMS)] for i in range(items)]
+    per_page = -(-len(rows) // pages) if rows else 0
+    subtotal, contents = 0.0, []
+    for p in range(pages):
+        lines = [f"Estimate No: {estimate_no}"] if p == 0 else [f"Page {p + 1}"]
+        for i in range(p * per_page, min((p + 1) * per_page, len(rows))):
+            (desc, price), qty = rows[i], i % 4 + 1
+            subtotal += qty * price
+            lines.append(f"{qty} {desc} {price:,.2f} {qty * price:,.2f}")
+        if p == pages - 1:
+            tax = round(subtotal * tax_rate, 2)
+            lines += [f"Subtotal ${subtotal:,.2f}", f"HST {tax_rate * 100:g}%: ${tax:,.2f}", f"Total ${subtotal + tax:,.2f}"]
+        contents.append(_pdf_text(lines))
+
+    n = len(contents)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n))
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>", f"<< /Type /Pages /Kids [{kids}] /Count {n} >>".encode(),
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, content in enumerate(contents):
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {5 + 2 * i} 0 R "
+                    f"/Resources << /Font << /F1 3 0 R >> >> >>".encode())
+        objs.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+class _Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    print_latency = 0.0
+    counter = None
+
+    def log_message(self, *args):
+        pass
+
+    def _logged_in(self)->bool:
+        return "nsd_session=ok" in (self.headers.get("Cookie") or "")
+
+    def _send(self, status:int, body:bytes=b"", headers:dict|None=None, content_type:str="text/html"):
+        time.sleep(self.latency)
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/login"):
+            if self._logged_in():
+                return self._send(303, headers={"Location": "/dashboard"})
+            return self._send(200, LOGIN)
+        if self.path.startswith("/dashboard"):
+            if not self._logged_in():
+                return self._send(303, headers={"Location": "/login"})
+            return self._send(200, DASHBOARD)
+        self._send(404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.startswith("/estimates"):
+            if not self._logged_in():
+                return self._send(303, headers={"Location": "/login"})
+            # Uploading the SOF and printing the estimate is the slow part of a real session.
+            time.sleep(self.print_latency)
+            estimate_no = f"EST-{next(self.counter):06d}"
+            return self._send(200, estimate_pdf(estimate_no), {"X-Estimate-No": estimate_no}, "application/pdf")
+        self._send(303, headers={"Location": "/dashboard", "Set-Cookie": "nsd_session=ok; Path=/"})
+
+def serve(port:int=0, latency:float=0.0, print_latency:float=0.0)->ThreadingHTTPServer:
+    """Start the stub on a background thread; ``server.server_address`` has the port.
+
+    ``latency`` delays every response, ``print_latency`` additionally each printed estimate.
+    """
+    handler = type("Handler", (_Handler,), {"latency": latency, "print_latency": print_latency,
+                                            "counter": itertools.count(1)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
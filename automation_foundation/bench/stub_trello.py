@@ -0,0 +1,51 @@
+
+"""Local stand-in for the Trello REST API: cards and attachments, with call counters."""
+import itertools, json, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ATTACHMENTS = re.compile(r"^/1/cards/([^/?]+)/attachments")
+
+class _Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status:int, body:dict):
+        out = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def do_POST(self):
+        # Attachments arrive as multipart bodies; only their size matters here.
+        size = int(self.headers.get("Content-Length") or 0)
+        while size > 0:
+            size -= len(self.rfile.read(min(size, 1 << 16)))
+        time.sleep(self.latency)
+        calls = self.calls
+        if self.path.startswith("/1/cards?") or self.path == "/1/cards":
+            with calls["lock"]:
+                calls["cards"] += 1
+            return self._send(200, {"id": f"card-{next(calls['ids'])}"})
+        m = ATTACHMENTS.match(self.path)
+        if m:
+            with calls["lock"]:
+                calls["attachments"] += 1
+            return self._send(200, {"id": f"att-{next(calls['ids'])}", "card": m.group(1)})
+        self._send(404, {"message": "not found"})
+
+def serve(latency:float=0.05)->ThreadingHTTPServer:
+    """Start on a background thread; point ``TRELLO_BASE_URL`` at ``http://127.0.0.1:<port>/1``.
+
+    ``server.calls`` counts created cards and attachments.
+    """
+    calls = {"cards": 0, "attachments": 0, "ids": itertools.count(1), "lock": threading.Lock()}
+    handler = type("Handler", (_Handler,), {"latency": latency, "calls": calls})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.calls = calls
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
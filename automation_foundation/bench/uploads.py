@@ -0,0 +1,159 @@
+
+"""Sustained MB/s and peak RSS for a large attachment upload.
+
+Each mode uploads ``--mb`` megabytes through the real endpoints in a fresh
+process and reports throughput, the process's peak RSS before and after,
+and whether the stored file's SHA-256 matches:
+
+* ``stream``: one ``PUT /uploads/{id}`` body;
+* ``multipart``: one ``POST /jobs/{job_id}/files`` form;
+* ``chunks``: ``PUT /uploads/{id}/chunks/{n}`` with ``--parallel`` in flight, then complete.
+
+The request body is generated as it is sent, 64 KiB at a time (what a
+server socket read hands the app), and driven straight into the ASGI app,
+so the numbers are the endpoint's own: streaming, hashing and writing,
+with fakeredis for upload state.
+
+    python -m bench.uploads --mb 1024 --parallel 4
+"""
+import argparse, asyncio, hashlib, json, os, resource, subprocess, sys, tempfile, time
+
+PIECE = 64 * 1024
+MODES = ("stream", "multipart", "chunks")
+
+def _pieces(total:int, offset:int=0, block:bytes|None=None):
+    # Deterministic content without holding it: one random MiB, rotated by position.
+    block = block or _BLOCK
+    pos, end = offset, offset + total
+    while pos < end:
+        i = pos % len(block)
+        n = min(PIECE, end - pos, len(block) - i)
+        yield block[i:i + n]
+        pos += n
+
+_BLOCK = hashlib.sha256(b"seed").digest() * (1 << 15)  # 1 MiB
+
+async def call(app, method:str, path:str, body=(), headers:dict|None=None)->tuple[int, object]:
+    """One request through the ASGI app, the body fed from an iterable of bytes."""
+    body = iter(body)
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+             "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+             "server": ("bench", 80), "client": ("127.0.0.1", 1)}
+    status, chunks = 0, []
+
+    async def receive():
+        piece = next(body, None)
+        return {"type": "http.request", "body": piece or b"", "more_body": piece is not None}
+
+    async def send(msg):
+        nonlocal status
+        if msg["type"] == "http.response.start":
+            status = msg["status"]
+        elif msg["type"] == "http.response.body":
+            chunks.append(msg.get("body", b""))
+
+    await app(scope, receive, send)
+    raw = b"".join(chunks)
+    return status, json.loads(raw) if raw else None
+
+def _multipart(total:int, boundary:str):
+    yield (f'--{boundary}\r\nContent-Disposition: form-data; name="kind"\r\n\r\nPlans\r\n'
+           f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="drawings.pdf"\r\n'
+           f'Content-Type: application/pdf\r\n\r\n').encode()
+    yield from _pieces(total)
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+async def _run(app, mode:str, total:int, chunk_size:int, parallel:int)->dict:
+    job_id = "BENCH-UPLOAD"
+    json_headers = {"content-type": "application/json"}
+    if mode == "multipart":
+        status, res = await call(app, "POST", f"/jobs/{job_id}/files", _multipart(total, "benchBOUNDARY"),
+                                 {"content-type": "multipart/form-data; boundary=benchBOUNDARY"})
+        return res[0] if status == 200 else {"error": res}
+    spec = {"job_id": job_id, "filename": "drawings.pdf", "size": total, "chunk_size": chunk_size}
+    status, up = await call(app, "POST", "/uploads", [json.dumps(spec).encode()], json_headers)
+    if mode == "stream":
+        status, res = await call(app, "PUT", f"/uploads/{up['upload_id']}", _pieces(total))
+        return res if status == 200 else {"error": res}
+    gate = asyncio.Semaphore(parallel)
+
+    async def put(i:int):
+        async with gate:
+            n = min(chunk_size, total - i * chunk_size)
+            status, res = await call(app, "PUT", f"/uploads/{up['upload_id']}/chunks/{i}", _pieces(n, i * chunk_size))
+            if status != 200:
+                raise RuntimeError(res)
+
+    await asyncio.gather(*(put(i) for i in range(up["chunks"])))
+    status, res = await call(app, "POST", f"/uploads/{up['upload_id']}/complete")
+    return res if status == 200 else {"error": res}
+
+def _child(mode:str, mb:float, chunk_mb:float, parallel:int)->dict:
+    import fakeredis
+    import api.jobs
+    api.jobs._redis = fakeredis.FakeRedis()
+    from api.main import app
+    total = int(mb * 1024 * 1024)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    t0 = time.perf_counter()
+    res = asyncio.run(_run(app, mode, total, int(chunk_mb * 1024 * 1024), parallel))
+    elapsed = time.perf_counter() - t0
+    out = {"mode": mode, "mb": mb, "elapsed_s": elapsed, "mb_s": mb / elapsed,
+           "rss_before_mb": rss_before, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    if "error" in res:
+        return {**out, "error": res["error"]}
+    out["digest"] = res["sha256"] or res["chunks_sha256"]
+    out["path"] = res["path"]
+    return out
+
+def expected(total:int, chunk_size:int)->tuple[str, str]:
+    whole, per_chunk = hashlib.sha256(), []
+    for i in range(0, total, chunk_size):
+        h = hashlib.sha256()
+        for piece in _pieces(min(chunk_size, total - i), i):
+            h.update(piece)
+            whole.update(piece)
+        per_chunk.append(h.digest())
+    return whole.hexdigest(), hashlib.sha256(b"".join(per_chunk)).hexdigest()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=1024)
+    ap.add_argument("--chunk-mb", type=float, default=8)
+    ap.add_argument("--parallel", type=int, default=4)
+    ap.add_argument("--modes", nargs="*", choices=MODES, default=list(MODES))
+    ap.add_argument("--_child", choices=MODES, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args._child:
+        print(json.dumps(_child(args._child, args.mb, args.chunk_mb, args.parallel)))
+        return
+
+    total, chunk_size = int(args.mb * 1024 * 1024), int(args.chunk_mb * 1024 * 1024)
+    whole, tree = expected(total, chunk_size)
+    failed = False
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Fresh process per mode so peak RSS is that mode's alone; uploads land in tmp.
+            env = {**os.environ, "UPLOAD_DIR": tmp,
+                   "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+            p = subprocess.run([sys.executable, "-m", "bench.uploads", "--_child", mode, "--mb", str(args.mb),
+                                "--chunk-mb", str(args.chunk_mb), "--parallel", str(args.parallel)],
+                               cwd=tmp, env=env, capture_output=True, text=True)
+            if p.returncode:
+                print(p.stderr, file=sys.stderr)
+                failed = True
+                continue
+            r = json.loads(p.stdout.splitlines()[-1])
+        ok = "error" not in r and r["digest"] == (tree if mode == "chunks" else whole)
+        failed |= not ok
+        extra = f" x{args.parallel} of {args.chunk_mb:g} MB" if mode == "chunks" else ""
+        print(f"{mode:<9}{extra:<14} {r['mb']:.0f} MB in {r['elapsed_s']:6.2f} s  {r['mb_s']:7.1f} MB/s   "
+              f"peak RSS {r['peak_rss_mb']:5.0f} MB (idle {r['rss_before_mb']:.0f} MB)   "
+              f"{'sha256 ok' if ok else 'FAILED: ' + str(r.get('error', 'digest mismatch'))}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
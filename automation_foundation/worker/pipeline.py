@@ -0,0 +1,156 @@
+
+"""Run pipeline stages as a dependency graph with per-stage checkpoints.
+
+Each :class:`Stage` names the values it reads and the values it returns.
+Stages whose inputs are ready run concurrently on a thread pool; stages
+marked ``inline`` (e.g. sync Playwright, which is bound to the thread that
+started it) run on the calling thread instead.
+
+Every finished stage writes ``logs/stages/<name>.json``. When a job is
+retried, stages with a checkpoint are skipped and their recorded outputs
+reused, unless an upstream stage had to run again or one of the stage's
+``files`` is missing.
+
+Each stage also names the ``resource`` it needs (``"api"``, ``"cpu"`` or
+``"browser"``). Given ``resources``, ``run_stages`` runs only the stages
+needing one of them and returns the rest as ``run.deferred``, so the worker
+can hand the job to a queue whose workers have that resource. The next hop
+resumes from the checkpoints; a checkpoint older than one of its inputs'
+checkpoints is run again.
+
+Each stage is also timed as a span (see ``api.metrics``): the duration goes
+to the ``stage_seconds`` histogram and a line to ``logs/spans.jsonl``.
+"""
+import contextvars, json, pathlib, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+from api.metrics import log_span, span
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[..., dict]
+    inputs: tuple = ()
+    outputs: tuple = ()
+    files: tuple = ()  # output keys holding paths that must still exist on resume
+    inline: bool = False
+    resource: str = "cpu"  # "api" (fast outbound calls), "cpu" (rendering, parsing) or "browser"
+
+@dataclass
+class StageResult:
+    name: str
+    outputs: dict
+    duration_s: float
+    resumed: bool = False
+
+@dataclass
+class PipelineRun:
+    values: dict
+    results: dict = field(default_factory=dict)
+    deferred: list = field(default_factory=list)  # ready stages left for a worker with another resource
+
+def _checkpoint(logs:pathlib.Path, name:str)->pathlib.Path:
+    return logs / "stages" / f"{name}.json"
+
+def _load(stage:Stage, logs:pathlib.Path)->tuple[dict, float]|None:
+    """The checkpointed outputs and when they were saved, or ``None`` if the stage must run."""
+    p = _checkpoint(logs, stage.name)
+    if not p.exists():
+        return None
+    rec = json.loads(p.read_text(encoding="utf-8"))
+    outputs = rec.get("outputs", {})
+    if set(stage.outputs) - outputs.keys():
+        return None
+    if any(not pathlib.Path(outputs[k]).exists() for k in stage.files):
+        return None
+    return outputs, rec.get("saved_at", 0.0)
+
+def _save(stage:Stage, logs:pathlib.Path, outputs:dict, duration:float)->float:
+    p = _checkpoint(logs, stage.name)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".tmp")
+    saved_at = time.time()
+    tmp.write_text(json.dumps({"stage": stage.name, "duration_s": duration, "saved_at": saved_at, "outputs": outputs},
+                              indent=2, default=str), encoding="utf-8")
+    tmp.replace(p)
+    return saved_at
+
+def _validate(stages:list[Stage], initial:dict):
+    producers = {k: None for k in initial}
+    for s in stages:
+        for k in s.outputs:
+            if k in producers:
+                raise ValueError(f"{k!r} is produced twice (stage {s.name!r})")
+            producers[k] = s.name
+    for s in stages:
+        missing = [k for k in s.inputs if k not in producers]
+        if missing:
+            raise ValueError(f"stage {s.name!r} needs {missing} which nothing produces")
+    return producers
+
+def run_stages(stages:list[Stage], initial:dict, logs:pathlib.Path, max_workers:int=4,
+               resources:set[str]|None=None)->PipelineRun:
+    """Run every stage, or with ``resources`` only the ones needing those (the rest end up in ``run.deferred``)."""
+    producers = _validate(stages, initial)
+    run = PipelineRun(values=dict(initial))
+    rerun: set[str] = set()  # stages that executed this time; their dependents cannot resume
+    saved_at: dict[str, float] = {}  # checkpoint time of every finished stage, resumed ones included
+    pending = {s.name: s for s in stages}
+    running = {}
+
+    def ready(s:Stage)->bool:
+        return all(k in run.values for k in s.inputs)
+
+    def execute(s:Stage):
+        t0 = time.perf_counter()
+        with span(s.name, logs):
+            out = s.fn(**{k: run.values[k] for k in s.inputs}) or {}
+            missing = set(s.outputs) - out.keys()
+            if missing:
+                raise RuntimeError(f"stage {s.name!r} did not return {sorted(missing)}")
+        duration = time.perf_counter() - t0
+        # Checkpoint from the executing thread so finished siblings survive a failing stage.
+        return out, duration, _save(s, logs, out, duration)
+
+    def finish(s:Stage, out:dict, duration:float, at:float, resumed:bool):
+        run.values.update({k: out[k] for k in s.outputs})
+        run.results[s.name] = StageResult(s.name, out, duration, resumed)
+        saved_at[s.name] = at
+        if not resumed:
+            rerun.add(s.name)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        while pending or running:
+            progressed = False
+            for name, s in list(pending.items()):
+                if not ready(s):
+                    continue
+                upstream = [producers[k] for k in s.inputs if producers[k] is not None]
+                saved = None if any(u in rerun for u in upstream) else _load(s, logs)
+                if saved is not None and saved[1] < max((saved_at[u] for u in upstream), default=0.0):
+                    saved = None  # an input was redone by an earlier hop after this checkpoint
+                if saved is None and resources is not None and s.resource not in resources:
+                    continue
+                del pending[name]
+                progressed = True
+                if saved is not None:
+                    log_span(logs, s.name, time.time(), 0.0, resumed=True)
+                    finish(s, saved[0], 0.0, saved[1], True)
+                elif s.inline:
+                    finish(s, *execute(s), False)
+                else:
+                    # copy_context carries the job_id onto the pool thread.
+                    running[ex.submit(contextvars.copy_context().run, execute, s)] = s
+            if progressed:
+                continue
+            if not running:
+                run.deferred = [s for s in pending.values() if ready(s)]
+                if run.deferred:
+                    return run
+                raise RuntimeError(f"stages cannot run, inputs never produced: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                s = running.pop(fut)
+                finish(s, *fut.result(), False)
+    return run
@@ -0,0 +1,53 @@
+
+"""RQ worker that warms the heavy modules once and forks pre-warmed job processes.
+
+RQ's default ``Worker`` forks a work horse per job from a parent that has
+imported little, so every job process pays for Pydantic models, Jinja
+environments, pdfplumber, WeasyPrint and its font configuration again.
+``PrewarmedWorker`` does all of that in the parent before it starts taking
+jobs, then freezes the warmed objects out of the garbage collector so
+forked children share those pages copy-on-write instead of dirtying them.
+
+Browsers do not survive a fork, so each child still launches its own NSD
+session (``get_pool`` notices the new pid); use ``SimpleWorker`` when the
+warm browser pool matters more than per-job process isolation.
+
+    rq worker -w worker.prefork.PrewarmedWorker -u redis://localhost:6379 $(python -m api.queues --names cpu)
+"""
+import gc, importlib, logging, time
+from rq import Worker
+from api import metrics
+
+log = logging.getLogger(__name__)
+
+# Imported by the pipeline lazily; importing them here puts them in the shared parent image.
+HEAVY_MODULES = ("worker.worker", "pdfplumber", "playwright.sync_api", "weasyprint")
+
+def warm()->dict[str, float]:
+    """Import and initialize everything a job needs; returns seconds spent per step."""
+    timings = {}
+    def step(name, fn):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:  # a missing optional piece only costs the child the lazy path
+            log.warning("prewarm %s failed: %r", name, e)
+        timings[name] = time.perf_counter() - t0
+
+    for mod in HEAVY_MODULES:
+        step(mod, lambda mod=mod: importlib.import_module(mod))
+    from api.clients.emailer import _template
+    from automation.sof import get_renderer
+    step("sof_renderer", get_renderer)  # template, parsed CSS, FontConfiguration
+    step("email_template", lambda: _template("email.html.j2"))
+    metrics.share_with_forks()
+    gc.collect()
+    gc.freeze()
+    return timings
+
+class PrewarmedWorker(Worker):
+    def work(self, *args, **kwargs):
+        timings = warm()
+        log.info("prewarmed in %.2fs: %s", sum(timings.values()),
+                 ", ".join(f"{k} {v * 1000:.0f}ms" for k, v in timings.items()))
+        return super().work(*args, **kwargs)
@@ -7,49 +7,124 @@ from automation.estimate_parser import parse_estimate_pdf
 from api.clients.storage import job_dir, canonical_paths, save_artifact
 from api.clients.trello import TrelloClient
 from api.clients.emailer import render_email, send_email
+from api.jobs import PIPELINE
+from api.metrics import JOB_SECONDS, JOBS, QUEUE_WAIT_SECONDS, job_context, publish, span
+from api.queues import LANES, get_lane_queue, pick_lane
+from api.semaphore import RedisSemaphore, nsd_seats
+from api.settings import settings
+from worker.pipeline import Stage, run_stages
+from datetime import datetime, timezone
+from rq import get_current_job
+from contextlib import nullcontext
 import json, pathlib
 
-def run_pipeline(job_dict: dict):
-    job = JobSpec(**job_dict)
-    base = job_dir(job.job_id)
-    logs = base / "logs"
-    outputs = base / "outputs"
-    logs.mkdir(parents=True, exist_ok=True)
-    outputs.mkdir(parents=True, exist_ok=True)
-
+def build_stages(logs:pathlib.Path, outputs:pathlib.Path, seats:RedisSemaphore|None=None)->list[Stage]:
     # 1) Create Opportunity (API-first)
-    opp = create_opportunity_api(job)
-    (logs / "opportunity.json").write_text(json.dumps(opp, indent=2), encoding="utf-8")
+    def opportunity(job):
+        opp = create_opportunity_api(job)
+        (logs / "opportunity.json").write_text(json.dumps(opp, indent=2), encoding="utf-8")
+        return {"opportunity": opp}
 
     # 2) Generate SOF PDF
-    sof_pdf = outputs / "SOF.pdf"
-    generate_sof_pdf(job, str(sof_pdf))
+    def sof(job):
+        sof_pdf = outputs / "SOF.pdf"
+        generate_sof_pdf(job, str(sof_pdf))
+        return {"sof_pdf": str(sof_pdf)}
 
     # 3) NSD UI: upload and print estimate -> outputs/Estimate.pdf
-    estimate_pdf = outputs / "Estimate.pdf"
-    nsd_meta = run_nsd_flow(job, str(sof_pdf), str(estimate_pdf))
-    (logs / "nsd_meta.json").write_text(json.dumps(nsd_meta, indent=2), encoding="utf-8")
+    def nsd(job, sof_pdf):
+        estimate_pdf = outputs / "Estimate.pdf"
+        # One licensed seat per session, counted across every browser worker.
+        with seats.hold(timeout=settings.nsd_seat_timeout) if seats else nullcontext():
+            nsd_meta = run_nsd_flow(job, sof_pdf, str(estimate_pdf))
+        (logs / "nsd_meta.json").write_text(json.dumps(nsd_meta, indent=2), encoding="utf-8")
+        return {"nsd_meta": nsd_meta, "estimate_pdf": str(estimate_pdf)}
 
     # 4) Parse estimate; collect totals
-    parsed = parse_estimate_pdf(str(estimate_pdf))
-    (outputs / "estimate_meta.json").write_text(json.dumps(parsed, indent=2), encoding="utf-8")
+    def parse(estimate_pdf):
+        parsed = parse_estimate_pdf(estimate_pdf)
+        (outputs / "estimate_meta.json").write_text(json.dumps(parsed, indent=2), encoding="utf-8")
+        return {"estimate": parsed}
 
     # 5) Store files canonically (optional — adjust paths)
-    paths = canonical_paths(job.job_id, job.customer.name, parsed.get("estimate_no",""))
-    save_artifact(str(sof_pdf), paths["sof"])
-    save_artifact(str(estimate_pdf), paths["estimate"])
+    def store(job, sof_pdf, estimate_pdf, estimate):
+        paths = canonical_paths(job.job_id, job.customer.name, estimate.get("estimate_no",""))
+        return {"stored": {
+            "sof": save_artifact(sof_pdf, paths["sof"]),
+            "estimate": save_artifact(estimate_pdf, paths["estimate"]),
+        }}
 
     # 6) Trello (optional)
-    # trello = TrelloClient()
-    # card_id = trello.create_card(f"Estimate {parsed.get('estimate_no','')} — {job.customer.name}", "Automated estimate")
-    # (logs / "trello_card.txt").write_text(card_id, encoding="utf-8")
+    # def trello(job, estimate):
+    #     card_id = TrelloClient().create_card(f"Estimate {estimate.get('estimate_no','')} — {job.customer.name}", "Automated estimate")
+    #     (logs / "trello_card.txt").write_text(card_id, encoding="utf-8")
+    #     return {"trello_card": card_id}
 
     # 7) Email draft/send (optional, set to draft logic if you use Gmail API)
-    html = render_email({
-        "customer": job.customer.name,
-        "total": parsed.get("total"),
-        "estimate_no": parsed.get("estimate_no",""),
-    })
-    # send_email(job.customer.email or "ops@example.com", f"Estimate {parsed.get('estimate_no','')}", html, [str(estimate_pdf)])
-
-    return {"ok": True, "opportunity": opp, "estimate": parsed}
+    def email(job, estimate, estimate_pdf):
+        html = render_email({
+            "customer": job.customer.name,
+            "total": estimate.get("total"),
+            "estimate_no": estimate.get("estimate_no",""),
+        })
+        # send_email(job.customer.email or "ops@example.com", f"Estimate {estimate.get('estimate_no','')}", html, [estimate_pdf])
+        return {"email_html": html}
+
+    # Opportunity and SOF are independent, as are storage/Trello/email once the estimate is parsed.
+    return [
+        Stage("opportunity", opportunity, inputs=("job",), outputs=("opportunity",), resource="api"),
+        Stage("sof", sof, inputs=("job",), outputs=("sof_pdf",), files=("sof_pdf",)),
+        # Sync Playwright is bound to the thread that started it, so NSD runs on the worker thread.
+        Stage("nsd", nsd, inputs=("job", "sof_pdf"), outputs=("nsd_meta", "estimate_pdf"), files=("estimate_pdf",),
+              inline=True, resource="browser"),
+        Stage("parse", parse, inputs=("estimate_pdf",), outputs=("estimate",)),
+        Stage("store", store, inputs=("job", "sof_pdf", "estimate_pdf", "estimate"), outputs=("stored",), resource="api"),
+        Stage("email", email, inputs=("job", "estimate", "estimate_pdf"), outputs=("email_html",), resource="api"),
+    ]
+
+def hand_off(rq_job, job:JobSpec, deferred:list[Stage])->str:
+    """Enqueue the rest of the job on the lane that can run ``deferred``; returns the new hop's id."""
+    lane = pick_lane(s.resource for s in deferred)
+    hop = int(rq_job.meta.get("hop", 0)) + 1
+    hop_id = f"{job.job_id}-hop{hop}"
+    get_lane_queue(lane, job.priority, rq_job.connection).enqueue_call(
+        PIPELINE, args=(job.model_dump(),), kwargs={"lane": lane}, job_id=hop_id,
+        meta={**rq_job.meta, "lane": lane, "hop": hop, "next": None},
+        result_ttl=settings.automate_result_ttl, failure_ttl=settings.automate_result_ttl)
+    rq_job.meta["next"] = hop_id
+    rq_job.save_meta()
+    return hop_id
+
+def run_pipeline(job_dict: dict, lane:str|None=None):
+    """Run the job's stages; with a ``lane``, only those its workers can run, handing the rest on."""
+    job = JobSpec(**job_dict)
+    base = job_dir(job.job_id)
+    logs = base / "logs"
+    outputs = base / "outputs"
+    logs.mkdir(parents=True, exist_ok=True)
+    outputs.mkdir(parents=True, exist_ok=True)
+
+    rq_job = get_current_job()
+    if rq_job is not None and rq_job.enqueued_at is not None:
+        enqueued = rq_job.enqueued_at.replace(tzinfo=timezone.utc)  # RQ stores naive UTC
+        QUEUE_WAIT_SECONDS.observe((datetime.now(timezone.utc) - enqueued).total_seconds(), queue=rq_job.origin)
+    routed = lane is not None and rq_job is not None
+    seats = nsd_seats(rq_job.connection) if rq_job is not None and settings.nsd_seats > 0 else None
+
+    outcome = "error"
+    try:
+        # Each hop is timed on its own, so job_seconds{stage="pipeline:<lane>"} sizes that lane's pool.
+        with job_context(job.job_id), span(f"pipeline:{lane}" if routed else "pipeline", logs, histogram=JOB_SECONDS):
+            run = run_stages(build_stages(logs, outputs, seats), {"job": job}, logs,
+                             resources=set(LANES[lane]) if routed else None)
+            if run.deferred:
+                next_hop = hand_off(rq_job, job, run.deferred)
+        outcome = "handed_off" if run.deferred else "ok"
+    finally:
+        if outcome != "handed_off":
+            JOBS.inc(outcome=outcome)
+        if rq_job is not None:
+            publish(rq_job.connection)
+    if run.deferred:
+        return {"ok": True, "next": next_hop, "deferred": [s.name for s in run.deferred]}
+    return {"ok": True, "opportunity": run.values["opportunity"], "estimate": run.values["estimate"]}
@@ -0,0 +1,247 @@
+"""Bulk import/export of ``JobBundle`` as JSON Lines, plus a columnar export.
+
+``iter_jsonl`` streams one bundle per line (``.gz`` is handled
+transparently) so memory stays bounded however large the file is, and
+``write_jsonl`` writes them the same way, atomically.
+
+``iter_records`` is the trusted fast path for files this code wrote: it
+yields the plain dicts without validating them or building models at all.
+(Pydantic validates JSON in native code, so building models while merely
+skipping validation is no faster.) ``write_columnar`` and
+``utils.bom.input_from_bundle`` take those dicts directly.
+
+``write_columnar`` flattens footprints into a NumPy ``.npz`` in the CSR
+layout used by ``utils/geometry_batch.py``: bundle ``i`` owns segments
+``seg_offsets[i]:seg_offsets[i + 1]`` and openings
+``opening_offsets[i]:opening_offsets[i + 1]``.
+
+    python -m schema.bulk_io export ./runs runs.jsonl.gz
+    python -m schema.bulk_io import runs.jsonl.gz ./runs
+    python -m schema.bulk_io columnar runs.jsonl.gz footprints.npz
+    python -m schema.bulk_io bench --count 100000
+"""
+from __future__ import annotations
+
+import gzip
+import os
+from array import array
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+import numpy as np
+import orjson
+
+from schema.job_schema import JobBundle
+from schema.run_archive import archived_runs
+
+
+def _open(path: str | os.PathLike, mode: str) -> IO[bytes]:
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, compresslevel=5)
+    return open(path, mode)
+
+
+def iter_jsonl(path: str | os.PathLike) -> Iterator[JobBundle]:
+    """Yield bundles one line at a time; blank lines are skipped.
+
+    A bad line raises ``ValueError`` naming its line number.
+    """
+    with _open(path, "rb") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                bundle = JobBundle.model_validate_json(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: {e}") from e
+            yield bundle
+
+
+def iter_records(path: str | os.PathLike) -> Iterator[dict]:
+    """Yield each line as a plain dict, unvalidated (trusted files only)."""
+    with _open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def write_jsonl(bundles: Iterable[JobBundle], path: str | os.PathLike) -> int:
+    """Write one bundle per line via a temp file; returns the number written."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Keep a trailing .gz so _open compresses the temp file too.
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp" + (".gz" if path.suffix == ".gz" else ""))
+    n = 0
+    try:
+        with _open(tmp, "wb") as f:
+            for b in bundles:
+                f.write(b.model_dump_json().encode("utf-8"))
+                f.write(b"\n")
+                n += 1
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return n
+
+
+def iter_runs(root: str | os.PathLike) -> Iterator[JobBundle]:
+    """Bundles saved under ``<root>/<job_id>/job.json`` (loose or archived), in job_id order."""
+    for p in sorted([*Path(root).glob("*/job.json"), *archived_runs(root)]):
+        yield JobBundle.from_json(str(p))
+
+
+def import_runs(src: str | os.PathLike, root: str | os.PathLike) -> int:
+    """Unpack a JSONL file into ``<root>/<job_id>/job.json`` (indexed as usual)."""
+    n = 0
+    for b in iter_jsonl(src):
+        b.to_json(str(Path(root) / b.job.id / "job.json"))
+        n += 1
+    return n
+
+
+# -- columnar export ---------------------------------------------------------------
+
+OPENING_TYPES = ("door", "dock", "window", "custom")
+
+
+def write_columnar(bundles: Iterable[JobBundle | dict], path: str | os.PathLike) -> int:
+    """Flatten bundles (models or ``iter_records`` dicts) into a compressed ``.npz``.
+
+    Returns the number of bundles. Opening types are stored as indexes into
+    ``opening_type_names``.
+    """
+    job_ids: list[str] = []
+    height, origin = array("d"), array("d")
+    seg_offsets, seg_length, seg_angle = array("q", [0]), array("d"), array("d")
+    op_offsets, op_type, op_width, op_height, op_wall, op_offset = (
+        array("q", [0]), array("b"), array("d"), array("d"), array("q"), array("d")
+    )
+    type_code = {t: i for i, t in enumerate(OPENING_TYPES)}
+    for b in bundles:
+        if not isinstance(b, dict):
+            b = b.model_dump(include={"job": {"id"}, "building": {"height_ft"}, "footprint": True})
+        fp = b["footprint"]
+        job_ids.append(b["job"]["id"])
+        height.append(b["building"]["height_ft"])
+        origin.extend(fp["origin"])
+        for s in fp["segments"]:
+            seg_length.append(s["length_ft"])
+            seg_angle.append(s["angle_deg"])
+        seg_offsets.append(len(seg_length))
+        for o in fp["openings"]:
+            op_type.append(type_code[o["type"]])
+            op_width.append(o["width_ft"])
+            op_height.append(o["height_ft"])
+            op_wall.append(o["wall_index"])
+            op_offset.append(o["offset_ft"])
+        op_offsets.append(len(op_width))
+    np.savez_compressed(
+        path,
+        job_id=np.array(job_ids, dtype=str),
+        height_ft=np.frombuffer(height, dtype=np.float64),
+        origin=np.frombuffer(origin, dtype=np.float64).reshape(-1, 2),
+        seg_offsets=np.frombuffer(seg_offsets, dtype=np.int64),
+        seg_length_ft=np.frombuffer(seg_length, dtype=np.float64),
+        seg_angle_deg=np.frombuffer(seg_angle, dtype=np.float64),
+        opening_offsets=np.frombuffer(op_offsets, dtype=np.int64),
+        opening_type=np.frombuffer(op_type, dtype=np.int8),
+        opening_type_names=np.array(OPENING_TYPES),
+        opening_width_ft=np.frombuffer(op_width, dtype=np.float64),
+        opening_height_ft=np.frombuffer(op_height, dtype=np.float64),
+        opening_wall_index=np.frombuffer(op_wall, dtype=np.int64),
+        opening_offset_ft=np.frombuffer(op_offset, dtype=np.float64),
+    )
+    return len(job_ids)
+
+
+def load_columnar(path: str | os.PathLike) -> dict[str, np.ndarray]:
+    with np.load(path) as z:
+        return {k: z[k] for k in z.files}
+
+
+# -- benchmark ---------------------------------------------------------------------
+
+
+def _synthetic(count: int, seed: int = 11) -> Iterator[JobBundle]:
+    import random
+
+    from schema.job_schema import Building, Footprint, JobInfo, Opening, Outputs, Scope, Segment
+
+    rng = random.Random(seed)
+    for i in range(count):
+        job_id = f"J-20250101-{i:06d}"
+        n = rng.randrange(4, 9)
+        yield JobBundle(
+            job=JobInfo(id=job_id, client=f"Client {i % 500}", site_address=f"{i} Main St",
+                        estimator="Bench", estimate_type="NSD"),
+            building=Building(type="Warehouse", material="RELINEPRO", height_ft=rng.uniform(10, 30)),
+            footprint=Footprint(
+                segments=[Segment(length_ft=rng.uniform(5, 200), angle_deg=90.0 * k) for k in range(n)],
+                openings=[Opening(type=rng.choice(OPENING_TYPES), width_ft=3.0, height_ft=7.0,
+                                  wall_index=rng.randrange(n), offset_ft=2.0) for _ in range(rng.randrange(4))],
+            ),
+            scope=Scope(description="bench"),
+            outputs=Outputs(project_root=f"./runs/{job_id}"),
+        )
+
+
+def _bench(count: int, workdir: Path) -> None:
+    import time
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    path = workdir / "bench.jsonl"
+    t0 = time.perf_counter()
+    write_jsonl(_synthetic(count), path)
+    print(f"write   {count} bundles: {time.perf_counter() - t0:6.2f} s ({path.stat().st_size / 1e6:.1f} MB)")
+
+    def timed(label, rows):
+        t0 = time.perf_counter()
+        n = sum(1 for _ in rows)
+        dt = time.perf_counter() - t0
+        print(f"{label:17} {dt:6.2f} s ({n / dt:>9,.0f} bundles/s)")
+        return n / dt
+
+    validated = timed("validated load:", iter_jsonl(path))
+    trusted = timed("trusted load:", iter_records(path))
+    print(f"trusted speedup: {trusted / validated:.1f}x")
+
+    t0 = time.perf_counter()
+    write_columnar(iter_records(path), workdir / "bench.npz")
+    print(f"columnar export: {time.perf_counter() - t0:6.2f} s ({(workdir / 'bench.npz').stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    ap = argparse.ArgumentParser(description="Bulk JSONL / columnar I/O for job bundles.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="runs tree -> JSONL")
+    ex.add_argument("root")
+    ex.add_argument("out")
+    im = sub.add_parser("import", help="JSONL -> runs tree")
+    im.add_argument("src")
+    im.add_argument("root")
+    co = sub.add_parser("columnar", help="JSONL -> .npz")
+    co.add_argument("src")
+    co.add_argument("out")
+    co.add_argument("--trusted", action="store_true", help="skip validation (our own output only)")
+    be = sub.add_parser("bench")
+    be.add_argument("--count", type=int, default=100_000)
+    be.add_argument("--dir")
+    a = ap.parse_args()
+
+    if a.cmd == "export":
+        print(f"Wrote {write_jsonl(iter_runs(a.root), a.out)} bundles -> {a.out}")
+    elif a.cmd == "import":
+        print(f"Imported {import_runs(a.src, a.root)} bundles -> {a.root}")
+    elif a.cmd == "columnar":
+        rows = iter_records(a.src) if a.trusted else iter_jsonl(a.src)
+        print(f"Wrote {write_columnar(rows, a.out)} bundles -> {a.out}")
+    elif a.dir:
+        _bench(a.count, Path(a.dir))
+    else:
+        with tempfile.TemporaryDirectory() as d:
+            _bench(a.count, Path(d))
@@ -3,6 +3,8 @@ from typing import Literal, Optional, List, Tuple
 from pydantic import BaseModel, Field
 import orjson, pathlib
 
+from schema.run_index import record_run
+
 def _dumps(v, *, default):
     return orjson.dumps(v, default=default)
 
@@ -63,16 +65,24 @@ class JobBundle(OrjsonModel):
     pricing: Optional[Pricing] = None
     outputs: Outputs
 
-    def to_json(self, path: str) -> str:
+    def to_json(self, path: str, index: bool = True) -> str:
         p = pathlib.Path(path)
         p.parent.mkdir(parents=True, exist_ok=True)
         p.write_bytes(self.model_dump_json().encode("utf-8"))
+        if index:
+            record_run(self, p)
         return str(p)
 
     @classmethod
     def from_json(cls, path: str) -> "JobBundle":
         p = pathlib.Path(path)
-        data = orjson.loads(p.read_bytes())
+        try:
+            raw = p.read_bytes()
+        except FileNotFoundError:
+            # Cold runs live in pack files under <root>/.archive (schema/run_archive.py).
+            from schema.run_archive import read_archived
+            raw = read_archived(p)
+        data = orjson.loads(raw)
         return cls.model_validate(data)
 
 if __name__ == "__main__":
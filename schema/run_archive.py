@@ -0,0 +1,598 @@
+"""Pack cold run directories into zstd pack files that stay readable in place.
+
+``pack`` takes every ``<root>/<dir>`` whose newest file is older than a
+threshold (``runs/<job_id>/`` or ``artifacts/job-*/``) and writes all its
+files into ``<root>/.archive/pack-<stamp>.zpk``, each as its own zstd
+frame, so one member is read with a single seek. Small text members
+(``job.json``, logs) share a dictionary trained on the pack itself, which
+is where most of the compression on them comes from; members that do not
+shrink (most PDFs) are stored as they are. Once every member has been
+read back and its hash checked against the file, the packed files are
+deleted, along with the directories that leaves empty. A directory that is already archived (say it was unpacked and
+edited) is packed again; the newest pack holding a directory owns all of
+it, so files dropped from the directory do not come back from older packs.
+
+Next to each pack, ``pack-<stamp>.idx`` is an open-addressing hash table
+of member paths (relative to ``root``). It is memory-mapped, so a lookup
+touches one or two pages of it and then reads one frame: no pack is ever
+unpacked to get at a file. The index is renamed into place last, so a pack
+without one is an interrupted run and is ignored.
+
+``read_archived`` resolves an ordinary path such as
+``runs/J-20250814-001/job.json`` against the nearest ``.archive``;
+``JobBundle.from_json`` falls back to it when the loose file is gone, and
+``RunIndex.rebuild`` and ``bulk_io.iter_runs`` include archived runs.
+
+    python -m schema.run_archive pack ./runs --older-than 365
+    python -m schema.run_archive pack automation_foundation/artifacts --glob 'job-*' --older-than 365
+    python -m schema.run_archive cat ./runs/J-20240102-001/job.json
+    python -m schema.run_archive unpack ./runs J-20240102-001
+    python -m schema.run_archive stats ./runs
+    python -m schema.run_archive bench --count 20000
+"""
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+ARCHIVE_DIR = ".archive"
+MAGIC = b"RPKI"
+VERSION = 1
+# magic, version, reserved, slots, members, names offset, dictionary offset/length in the pack
+HEADER = struct.Struct("<4sHHIIQQI4x")
+# key hash, offset, stored length, original length, name offset, name length, flags, mtime
+SLOT = struct.Struct("<QQIIIHHd")
+USED, RAW, DICT = 1, 2, 4
+
+LEVEL = 10
+DICT_SIZE = 112 * 1024
+DICT_MAX_MEMBER = 64 * 1024  # members this small train and use the dictionary
+STREAM_OVER = 16 << 20  # members this big are compressed from the file, not from memory
+SEARCH_DEPTH = 3  # how many directories above a path may hold its .archive
+HASH_BLOCK = 1 << 20
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("archived runs need the zstandard package (pip install zstandard)") from None
+    return zstandard
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+@dataclass(frozen=True)
+class Member:
+    name: str
+    offset: int
+    stored: int
+    size: int
+    flags: int
+    mtime: float
+
+
+# -- reading -----------------------------------------------------------------------
+
+
+class Pack:
+    """One pack file and its memory-mapped index."""
+
+    def __init__(self, idx_path: str | os.PathLike):
+        self.idx_path = Path(idx_path)
+        self.path = self.idx_path.with_suffix(".zpk")
+        with open(self.idx_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.slots, self.count, self._names, dict_off, dict_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.idx_path}: not a run archive index")
+        self._fd = os.open(self.path, os.O_RDONLY)
+        self._dict_span = (dict_off, dict_len)
+        self._dict = None
+        self._dirs: Optional[set[str]] = None
+        self._local = threading.local()
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+    def _slot(self, i: int) -> tuple:
+        return SLOT.unpack_from(self._mm, HEADER.size + i * SLOT.size)
+
+    def _name(self, off: int, length: int) -> bytes:
+        start = self._names + off
+        return self._mm[start:start + length]
+
+    def find(self, name: str) -> Optional[Member]:
+        key = name.encode()
+        h = _hash(key)
+        mask = self.slots - 1
+        i = h & mask
+        while True:
+            kh, offset, stored, size, noff, nlen, flags, mtime = self._slot(i)
+            if not flags & USED:
+                return None
+            if kh == h and self._name(noff, nlen) == key:
+                return Member(name, offset, stored, size, flags, mtime)
+            i = (i + 1) & mask
+
+    def _decompressor(self, with_dict: bool):
+        # zstd contexts are not thread-safe; one pair per thread.
+        attr = "dict_dctx" if with_dict else "dctx"
+        dctx = getattr(self._local, attr, None)
+        if dctx is None:
+            zstd = _zstd()
+            if with_dict and self._dict is None:
+                self._dict = zstd.ZstdCompressionDict(os.pread(self._fd, self._dict_span[1], self._dict_span[0]))
+            dctx = zstd.ZstdDecompressor(dict_data=self._dict) if with_dict else zstd.ZstdDecompressor()
+            setattr(self._local, attr, dctx)
+        return dctx
+
+    def read(self, member: Member) -> bytes:
+        data = os.pread(self._fd, member.stored, member.offset)
+        if member.flags & RAW:
+            return data
+        return self._decompressor(bool(member.flags & DICT)).decompress(data)
+
+    def get(self, name: str) -> Optional[bytes]:
+        m = self.find(name)
+        return None if m is None else self.read(m)
+
+    def members(self) -> Iterator[Member]:
+        for i in range(self.slots):
+            kh, offset, stored, size, noff, nlen, flags, mtime = self._slot(i)
+            if flags & USED:
+                yield Member(self._name(noff, nlen).decode(), offset, stored, size, flags, mtime)
+
+    def dirs(self) -> set[str]:
+        """Top-level directories with members in this pack."""
+        if self._dirs is None:
+            self._dirs = {m.name.split("/", 1)[0] for m in self.members()}
+        return self._dirs
+
+    def digest(self, member: Member) -> bytes:
+        """blake2b of the member's original bytes; big members are decompressed as a stream."""
+        h = hashlib.blake2b()
+        if member.flags & RAW or member.size <= STREAM_OVER:
+            h.update(self.read(member))
+            return h.digest()
+        with open(self.path, "rb") as f:
+            f.seek(member.offset)
+            reader = self._decompressor(False).stream_reader(f, closefd=False)
+            left = member.size  # stop at the frame's end; the next member follows it directly
+            while left and (block := reader.read(min(HASH_BLOCK, left))):
+                h.update(block)
+                left -= len(block)
+        return h.digest()
+
+    @property
+    def dict_size(self) -> int:
+        return self._dict_span[1]
+
+
+class RunArchive:
+    """Every pack under ``<root>/.archive``; the newest pack holding a directory owns all of its files."""
+
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+        self.dir = self.root / ARCHIVE_DIR
+        self._packs: list[Pack] = []
+        self._owner: dict[str, Pack] = {}
+        self._seen: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def packs(self) -> list[Pack]:
+        try:
+            mtime = self.dir.stat().st_mtime
+        except FileNotFoundError:
+            return []
+        if mtime != self._seen:
+            with self._lock:
+                if mtime != self._seen:
+                    known = {p.idx_path: p for p in self._packs}
+                    packs = [known.get(p) or Pack(p) for p in sorted(self.dir.glob("pack-*.idx"), reverse=True)]
+                    owner = {}
+                    for pack in reversed(packs):  # oldest first, so newer packs overwrite
+                        owner.update(dict.fromkeys(pack.dirs(), pack))
+                    self._packs, self._owner, self._seen = packs, owner, mtime
+        return self._packs
+
+    def owner(self, dirname: str) -> Optional[Pack]:
+        """The pack that holds the current copy of ``dirname``."""
+        self.packs
+        return self._owner.get(dirname)
+
+    def find(self, name: str) -> Optional[tuple[Pack, Member]]:
+        pack = self.owner(name.split("/", 1)[0])
+        m = pack.find(name) if pack is not None else None
+        return None if m is None else (pack, m)
+
+    def get(self, name: str) -> Optional[bytes]:
+        hit = self.find(name)
+        return None if hit is None else hit[0].read(hit[1])
+
+    def names(self, suffix: str = "") -> list[str]:
+        """Archived member names ending with ``suffix``, sorted, each once."""
+        seen = set()
+        for pack in self.packs:
+            seen.update(m.name for m in pack.members()
+                        if m.name.endswith(suffix) and self._owner.get(m.name.split("/", 1)[0]) is pack)
+        return sorted(seen)
+
+    def dirs(self) -> set[str]:
+        self.packs
+        return set(self._owner)
+
+    def unpack(self, dirname: str) -> int:
+        """Write ``dirname``'s archived files back as loose files (the pack keeps its copy)."""
+        n = 0
+        for name in self.names():
+            if name.split("/", 1)[0] != dirname:
+                continue
+            pack, m = self.find(name)
+            dest = self.root / name
+            if not dest.exists():
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                dest.write_bytes(pack.read(m))
+                os.utime(dest, (m.mtime, m.mtime))
+                n += 1
+        return n
+
+    def stats(self) -> dict:
+        files = size = stored = 0
+        packs = self.packs
+        for pack in packs:
+            stored += pack.path.stat().st_size + pack.idx_path.stat().st_size
+            for m in pack.members():
+                files += 1
+                size += m.size
+        return {"packs": len(packs), "files": files, "bytes": size, "stored_bytes": stored,
+                "ratio": size / stored if stored else None}
+
+
+_archives: dict = {}
+
+
+def archive_for(root: str | os.PathLike) -> RunArchive:
+    # abspath, not resolve(): this sits on the read path of every archived file.
+    key = os.path.abspath(root)
+    a = _archives.get(key)
+    if a is None:
+        a = _archives[key] = RunArchive(key)
+    return a
+
+
+def read_archived(path: str | os.PathLike) -> bytes:
+    """The archived copy of ``path``; ``FileNotFoundError`` if no nearby archive has it."""
+    root, name = os.path.split(os.path.abspath(path))
+    for _ in range(SEARCH_DEPTH):
+        root, part = os.path.split(root)
+        name = f"{part}/{name}"
+        if root in _archives or os.path.isdir(os.path.join(root, ARCHIVE_DIR)):
+            data = archive_for(root).get(name)
+            if data is not None:
+                return data
+    raise FileNotFoundError(f"{path} is neither on disk nor archived")
+
+
+def read_bytes(path: str | os.PathLike) -> bytes:
+    """``path``'s contents, loose or archived."""
+    try:
+        return Path(path).read_bytes()
+    except FileNotFoundError:
+        return read_archived(path)
+
+
+def archived_runs(root: str | os.PathLike) -> list[Path]:
+    """``<root>/<job_id>/job.json`` paths of archived runs that are not also loose."""
+    if not (Path(root) / ARCHIVE_DIR).is_dir():
+        return []
+    root = Path(root)
+    return [root / n for n in archive_for(root).names("/job.json") if n.count("/") == 1 and not (root / n).exists()]
+
+
+def iter_archived(root: str | os.PathLike, filename: str = "job.json") -> Iterator[tuple[Path, bytes, float]]:
+    """``(path, contents, mtime)`` of each archived ``<root>/<dir>/<filename>`` that is not also loose."""
+    root = Path(root)
+    if not (root / ARCHIVE_DIR).is_dir():
+        return
+    arc = archive_for(root)
+    for n in arc.names("/" + filename):
+        if n.count("/") == 1 and not (root / n).exists():
+            pack, m = arc.find(n)
+            yield root / n, pack.read(m), m.mtime
+
+
+# -- writing -----------------------------------------------------------------------
+
+
+def _newest_mtime(d: Path) -> tuple[float, list[Path]]:
+    files, newest = [], d.stat().st_mtime
+    for dirpath, _, filenames in os.walk(d):
+        for f in filenames:
+            p = Path(dirpath, f)
+            files.append(p)
+            newest = max(newest, p.stat().st_mtime)
+    return newest, files
+
+
+def _remove(d: Path, files: list[Path]) -> bool:
+    """Delete ``files`` and then whatever directories under ``d`` that leaves empty; True if ``d`` is gone."""
+    for p in files:
+        p.unlink(missing_ok=True)
+    for dirpath, _, _ in os.walk(d, topdown=False):
+        try:
+            os.rmdir(dirpath)
+        except OSError:
+            pass  # something not in the pack landed here; it stays loose
+    return not d.exists()
+
+
+def cold_dirs(root: str | os.PathLike, older_than_days: float, glob: str = "*") -> list[tuple[Path, list[Path]]]:
+    """Directories under ``root`` whose newest file is older than the threshold, with their files."""
+    cutoff = time.time() - older_than_days * 86400
+    out = []
+    for d in sorted(Path(root).glob(glob)):
+        if not d.is_dir() or d.name.startswith("."):
+            continue
+        newest, files = _newest_mtime(d)
+        if newest < cutoff and files:
+            out.append((d, files))
+    return out
+
+
+def _train(zstd, files: list[Path]):
+    samples = []
+    for p in files:
+        size = p.stat().st_size
+        if 0 < size <= DICT_MAX_MEMBER:
+            samples.append(p.read_bytes())
+            if len(samples) >= 5000:
+                break
+    if len(samples) < 16:
+        return None
+    try:
+        return zstd.train_dictionary(DICT_SIZE, samples, level=LEVEL)
+    except zstd.ZstdError:
+        return None  # too few distinct samples; every member goes without
+
+
+def write_pack(root: str | os.PathLike, dirs: list[tuple[Path, list[Path]]], level: int = LEVEL) -> Optional[Pack]:
+    """Write the files of ``dirs`` (from ``cold_dirs``) into a new pack; returns it, or ``None`` if empty."""
+    zstd = _zstd()
+    root = Path(root)
+    files = [p for _, fs in dirs for p in fs]
+    if not files:
+        return None
+    out_dir = root / ARCHIVE_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Sub-second digits keep two packs written in the same second apart and in order.
+    stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 10**9:09d}-{os.getpid()}"
+    pack_path, idx_path = out_dir / f"pack-{stamp}.zpk", out_dir / f"pack-{stamp}.idx"
+    tmp_pack, tmp_idx = pack_path.with_suffix(".zpk.tmp"), idx_path.with_suffix(".idx.tmp")
+
+    zdict = _train(zstd, files)
+    plain = zstd.ZstdCompressor(level=level, write_checksum=True)
+    with_dict = zstd.ZstdCompressor(level=level, dict_data=zdict, write_checksum=True) if zdict else None
+    entries, names = [], bytearray()
+    try:
+        with open(tmp_pack, "wb") as out:
+            dict_bytes = zdict.as_bytes() if zdict else b""
+            out.write(dict_bytes)
+            for p in files:
+                name = p.relative_to(root).as_posix().encode()
+                st = p.stat()
+                offset = out.tell()
+                if st.st_size > STREAM_OVER:
+                    with open(p, "rb") as f:
+                        plain.copy_stream(f, out, size=st.st_size)
+                    flags = USED
+                else:
+                    raw = p.read_bytes()
+                    use_dict = with_dict is not None and len(raw) <= DICT_MAX_MEMBER
+                    packed = (with_dict if use_dict else plain).compress(raw)
+                    if len(packed) >= len(raw):
+                        packed, flags = raw, USED | RAW
+                    else:
+                        flags = USED | (DICT if use_dict else 0)
+                    out.write(packed)
+                entries.append((_hash(name), offset, out.tell() - offset, st.st_size, len(names), len(name), flags,
+                                st.st_mtime))
+                names += name
+            out.flush()
+            os.fsync(out.fileno())
+
+        slots = 1 << max(4, (2 * len(entries) - 1).bit_length())  # load factor <= 1/2
+        table = [None] * slots
+        for e in entries:
+            i = e[0] & (slots - 1)
+            while table[i] is not None:
+                i = (i + 1) & (slots - 1)
+            table[i] = e
+        empty = SLOT.pack(0, 0, 0, 0, 0, 0, 0, 0.0)
+        with open(tmp_idx, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, slots, len(entries), HEADER.size + slots * SLOT.size,
+                                0, len(dict_bytes)))
+            f.write(b"".join(SLOT.pack(*e) if e else empty for e in table))
+            f.write(names)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_pack, pack_path)
+        os.replace(tmp_idx, idx_path)  # last: a pack counts only once its index is in place
+    except BaseException:
+        tmp_pack.unlink(missing_ok=True)
+        tmp_idx.unlink(missing_ok=True)
+        raise
+    return Pack(idx_path)
+
+
+def _file_digest(p: Path) -> bytes:
+    h = hashlib.blake2b()
+    with open(p, "rb") as f:
+        while block := f.read(HASH_BLOCK):
+            h.update(block)
+    return h.digest()
+
+
+def _verify(pack: Pack, root: Path, files: list[Path]) -> None:
+    for p in files:
+        m = pack.find(p.relative_to(root).as_posix())
+        if m is None or m.size != p.stat().st_size or pack.digest(m) != _file_digest(p):
+            raise RuntimeError(f"{p}: archived copy does not match; loose files kept")
+
+
+def pack(root: str | os.PathLike, older_than_days: float, glob: str = "*", remove: bool = True,
+         level: int = LEVEL) -> dict:
+    """Archive cold directories of ``root`` into one new pack and (by default) delete them.
+
+    Directories that are already archived are packed again as they are on
+    disk: the new pack supersedes every older copy of them. Only the files
+    that went into the pack are deleted, and only from directories that are
+    still cold once the pack is verified; anything written in the meantime
+    stays loose, and loose files win over archived ones on every read.
+    """
+    root = Path(root)
+    t0 = time.perf_counter()
+    cutoff = time.time() - older_than_days * 86400
+    dirs = cold_dirs(root, older_than_days, glob)
+    created = write_pack(root, dirs, level)
+    removed = 0
+    if remove and created is not None:
+        for d, fs in dirs:
+            _verify(created, root, fs)
+        for d, fs in dirs:
+            try:
+                still_cold = _newest_mtime(d)[0] < cutoff
+            except FileNotFoundError:
+                continue
+            if still_cold:
+                removed += _remove(d, fs)
+    size = sum(p.stat().st_size for _, fs in dirs for p in fs) if not remove else None
+    return {"dirs": len(dirs), "removed": removed,
+            "files": created.count if created else 0, "pack": str(created.path) if created else None,
+            "stored_bytes": created.path.stat().st_size + created.idx_path.stat().st_size if created else 0,
+            "bytes": size if size is not None else (sum(m.size for m in created.members()) if created else 0),
+            "seconds": time.perf_counter() - t0}
+
+
+# -- benchmark ---------------------------------------------------------------------
+
+
+def _fake_pdf(rng, size: int) -> bytes:
+    # PDF-ish: a text header and xref around a body that is already compressed (random).
+    head = b"%PDF-1.7\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n" * 4
+    return head + rng.randbytes(max(0, size - 2 * len(head))) + head
+
+
+def _bench(count: int, workdir: Path, pdf_kb: int, reads: int) -> None:
+    import random
+    import statistics
+
+    from schema.bulk_io import _synthetic
+    from schema.job_schema import JobBundle
+
+    rng = random.Random(7)
+    runs = workdir / "runs"
+    old = time.time() - 400 * 86400
+    t0 = time.perf_counter()
+    for b in _synthetic(count):
+        d = runs / b.job.id
+        d.mkdir(parents=True)
+        (d / "job.json").write_bytes(b.model_dump_json().encode())
+        if pdf_kb:
+            (d / "Estimate.pdf").write_bytes(_fake_pdf(rng, pdf_kb * 1024))
+        for p in (d, *d.iterdir()):
+            os.utime(p, (old, old))
+    print(f"wrote {count} runs ({count * (2 if pdf_kb else 1)} files) in {time.perf_counter() - t0:.1f} s")
+
+    ids = sorted(p.name for p in runs.iterdir())
+    sample = [rng.choice(ids) for _ in range(reads)]
+
+    def latency(label: str, fn) -> None:
+        times = []
+        for job_id in sample:
+            t = time.perf_counter()
+            fn(job_id)
+            times.append(time.perf_counter() - t)
+        times.sort()
+        print(f"  {label:<26} p50 {statistics.median(times) * 1e6:7.1f} us   p99 {times[int(len(times) * 0.99)] * 1e6:7.1f} us")
+
+    print("loose, random reads:")
+    latency("JobBundle.from_json", lambda j: JobBundle.from_json(str(runs / j / "job.json")))
+    if pdf_kb:
+        latency("Estimate.pdf", lambda j: (runs / j / "Estimate.pdf").read_bytes())
+
+    r = pack(runs, older_than_days=365)
+    json_bytes = sum(m.size for p in archive_for(runs).packs for m in p.members() if m.name.endswith(".json"))
+    json_stored = sum(m.stored for p in archive_for(runs).packs for m in p.members() if m.name.endswith(".json"))
+    left = sum(1 for _ in runs.rglob("*") if _.is_file())
+    print(f"packed {r['files']} files in {r['seconds']:.1f} s: {r['bytes'] / 1e6:.1f} MB -> {r['stored_bytes'] / 1e6:.1f} MB "
+          f"(ratio {r['bytes'] / r['stored_bytes']:.2f}; job.json alone {json_bytes / json_stored:.1f}), "
+          f"{left} files on disk afterwards")
+
+    print("archived, random reads:")
+    latency("JobBundle.from_json", lambda j: JobBundle.from_json(str(runs / j / "job.json")))
+    if pdf_kb:
+        latency("Estimate.pdf", lambda j: read_bytes(runs / j / "Estimate.pdf"))
+    a = archive_for(runs)
+    latency("index lookup only", lambda j: a.find(f"{j}/job.json"))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import tempfile
+
+    ap = argparse.ArgumentParser(description="Pack cold runs into zstd pack files and read them back.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    pk = sub.add_parser("pack")
+    pk.add_argument("root")
+    pk.add_argument("--older-than", type=float, default=365, help="days since the newest file in the directory")
+    pk.add_argument("--glob", default="*", help="directories of root to consider (e.g. 'job-*')")
+    pk.add_argument("--keep", action="store_true", help="leave the loose directories in place")
+    pk.add_argument("--level", type=int, default=LEVEL)
+    ca = sub.add_parser("cat")
+    ca.add_argument("path")
+    un = sub.add_parser("unpack")
+    un.add_argument("root")
+    un.add_argument("dirs", nargs="+")
+    st = sub.add_parser("stats")
+    st.add_argument("root")
+    be = sub.add_parser("bench")
+    be.add_argument("--count", type=int, default=20_000)
+    be.add_argument("--pdf-kb", type=int, default=40, help="size of a fake Estimate.pdf per run (0: none)")
+    be.add_argument("--reads", type=int, default=2000)
+    be.add_argument("--dir")
+    a = ap.parse_args()
+
+    if a.cmd == "pack":
+        r = pack(a.root, a.older_than, a.glob, remove=not a.keep, level=a.level)
+        ratio = f"{r['bytes'] / r['stored_bytes']:.2f}" if r["stored_bytes"] else "-"
+        print(f"Packed {r['dirs']} dirs ({r['files']} files, ratio {ratio}) in {r['seconds']:.1f} s -> {r['pack']}; "
+              f"removed {r['removed']} dirs")
+    elif a.cmd == "cat":
+        sys.stdout.buffer.write(read_bytes(a.path))
+    elif a.cmd == "unpack":
+        arc = RunArchive(a.root)
+        for d in a.dirs:
+            print(f"{d}: {arc.unpack(d)} files restored")
+    elif a.cmd == "stats":
+        s = RunArchive(a.root).stats()
+        ratio = f"{s['ratio']:.2f}" if s["ratio"] else "-"
+        print(f"{s['packs']} packs, {s['files']} files, {s['bytes'] / 1e6:.1f} MB stored as "
+              f"{s['stored_bytes'] / 1e6:.1f} MB (ratio {ratio})")
+    elif a.dir:
+        _bench(a.count, Path(a.dir), a.pdf_kb, a.reads)
+    else:
+        with tempfile.TemporaryDirectory() as d:
+            _bench(a.count, Path(d), a.pdf_kb, a.reads)
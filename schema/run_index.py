@@ -0,0 +1,241 @@
+"""SQLite catalogue of saved runs so lookups never glob ``runs/*/job.json``.
+
+The index lives at ``<runs root>/.runs.sqlite3`` and is updated by
+``JobBundle.to_json`` whenever a bundle is written in the standard
+``<runs root>/<job_id>/job.json`` layout. ``rebuild`` re-scans an existing
+tree; searches return :class:`RunSummary` rows without loading bundles.
+
+    python -m schema.run_index rebuild ./runs
+    python -m schema.run_index search ./runs --client acme --since 2025-08-01
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import orjson
+
+INDEX_NAME = ".runs.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    job_id        TEXT PRIMARY KEY,
+    client        TEXT NOT NULL COLLATE NOCASE,
+    site_address  TEXT NOT NULL COLLATE NOCASE,
+    estimator     TEXT NOT NULL COLLATE NOCASE,
+    estimate_type TEXT NOT NULL,
+    building_type TEXT NOT NULL,
+    job_date      TEXT NOT NULL,
+    path          TEXT NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_client ON runs (client);
+CREATE INDEX IF NOT EXISTS runs_estimator ON runs (estimator);
+CREATE INDEX IF NOT EXISTS runs_date ON runs (job_date);
+CREATE INDEX IF NOT EXISTS runs_type_date ON runs (estimate_type, job_date);
+"""
+
+_COLUMNS = "job_id, client, site_address, estimator, estimate_type, building_type, job_date, path, updated_at"
+
+_JOB_DATE = re.compile(r"^J-(\d{4})(\d{2})(\d{2})-")
+
+
+@dataclass(frozen=True)
+class RunSummary:
+    job_id: str
+    client: str
+    site_address: str
+    estimator: str
+    estimate_type: str
+    building_type: str
+    job_date: str
+    path: str
+    updated_at: float
+
+
+def _job_date(job_id: str, fallback_ts: float) -> str:
+    m = _JOB_DATE.match(job_id)
+    if m:
+        return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
+    return datetime.fromtimestamp(fallback_ts).date().isoformat()
+
+
+def _row(data: dict, path: Path, ts: float) -> tuple:
+    job = data["job"]
+    return (
+        job["id"],
+        job["client"],
+        job["site_address"],
+        job["estimator"],
+        job["estimate_type"],
+        data["building"]["type"],
+        _job_date(job["id"], ts),
+        str(path),
+        ts,
+    )
+
+
+class RunIndex:
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+        self.path = self.root / INDEX_NAME
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # One connection per thread (and per process after a fork): the explicit
+        # BEGIN/COMMIT in record_many and rebuild must not interleave.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, bundle, path: str | os.PathLike) -> None:
+        """Upsert one bundle; ``bundle`` is a ``JobBundle``."""
+        data = bundle.model_dump(include={"job": True, "building": {"type"}})
+        self._upsert([_row(data, Path(path), time.time())])
+
+    def record_many(self, items: Iterable[tuple[dict, str | os.PathLike]]) -> None:
+        """Upsert ``(bundle dict, path)`` pairs in one transaction."""
+        ts = time.time()
+        rows = [_row(data, Path(path), ts) for data, path in items]
+        if not rows:
+            return
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            self._upsert(rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _upsert(self, rows: Iterable[tuple]) -> None:
+        self.conn.executemany(f"INSERT OR REPLACE INTO runs ({_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?)", rows)
+
+    def rebuild(self) -> int:
+        """Re-scan ``<root>/*/job.json`` (loose and archived) and replace the index contents."""
+        rows = []
+        for p in self.root.glob("*/job.json"):
+            try:
+                data = orjson.loads(p.read_bytes())
+                rows.append(_row(data, p, p.stat().st_mtime))
+            except (OSError, orjson.JSONDecodeError, KeyError, TypeError):
+                continue
+        if (self.root / ".archive").is_dir():
+            from schema.run_archive import iter_archived
+            for p, raw, mtime in iter_archived(self.root):
+                try:
+                    rows.append(_row(orjson.loads(raw), p, mtime))
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    continue
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            conn.execute("DELETE FROM runs")
+            self._upsert(rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def get(self, job_id: str) -> Optional[RunSummary]:
+        row = self.conn.execute(f"SELECT {_COLUMNS} FROM runs WHERE job_id = ?", (job_id,)).fetchone()
+        return RunSummary(*row) if row else None
+
+    def search(
+        self,
+        client: Optional[str] = None,
+        site_address: Optional[str] = None,
+        estimator: Optional[str] = None,
+        estimate_type: Optional[str] = None,
+        since: Optional[date | str] = None,
+        until: Optional[date | str] = None,
+        limit: int = 100,
+    ) -> List[RunSummary]:
+        """Newest first. Text filters are case-insensitive prefix matches."""
+        where, args = [], []
+        for col, val in (("client", client), ("site_address", site_address), ("estimator", estimator)):
+            if val:
+                where.append(f"{col} LIKE ? ESCAPE '\\'")
+                args.append(_like_prefix(val))
+        if estimate_type:
+            where.append("estimate_type = ?")
+            args.append(estimate_type)
+        if since:
+            where.append("job_date >= ?")
+            args.append(str(since))
+        if until:
+            where.append("job_date <= ?")
+            args.append(str(until))
+        sql = f"SELECT {_COLUMNS} FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY job_date DESC, job_id DESC LIMIT ?"
+        args.append(limit)
+        return [RunSummary(*r) for r in self.conn.execute(sql, args)]
+
+
+def _like_prefix(val: str) -> str:
+    return val.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+_indexes: dict = {}
+
+
+def index_for(root: str | os.PathLike) -> RunIndex:
+    key = str(Path(root).resolve())
+    idx = _indexes.get(key)
+    if idx is None:
+        idx = _indexes[key] = RunIndex(root)
+    return idx
+
+
+def record_run(bundle, path: str | os.PathLike) -> None:
+    """Index ``bundle`` if ``path`` follows the ``<root>/<job_id>/job.json`` layout."""
+    p = Path(path)
+    if p.name == "job.json" and p.parent.name == bundle.job.id:
+        index_for(p.parent.parent).record(bundle, p)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Maintain and query the runs index.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rb = sub.add_parser("rebuild")
+    rb.add_argument("root", nargs="?", default=os.getenv("BASE_RUN_DIR", "./runs"))
+    se = sub.add_parser("search")
+    se.add_argument("root", nargs="?", default=os.getenv("BASE_RUN_DIR", "./runs"))
+    se.add_argument("--client")
+    se.add_argument("--site")
+    se.add_argument("--estimator")
+    se.add_argument("--type", choices=["NSD", "Excel"])
+    se.add_argument("--since")
+    se.add_argument("--until")
+    se.add_argument("--limit", type=int, default=100)
+    a = ap.parse_args()
+
+    idx = RunIndex(a.root)
+    t0 = time.perf_counter()
+    if a.cmd == "rebuild":
+        n = idx.rebuild()
+        print(f"Indexed {n} runs in {(time.perf_counter() - t0) * 1e3:.1f} ms -> {idx.path}")
+    else:
+        rows = idx.search(a.client, a.site, a.estimator, a.type, a.since, a.until, a.limit)
+        for r in rows:
+            print(f"{r.job_id}\t{r.job_date}\t{r.estimate_type}\t{r.client}\t{r.site_address}\t{r.estimator}")
+        print(f"{len(rows)} runs in {(time.perf_counter() - t0) * 1e3:.2f} ms")
@@ -0,0 +1,626 @@
+"""Headless port of the Nuform calculator: ``JobBundle`` in, BOM out.
+
+Mirrors ``CalcService``, ``BomService``, ``TrimPolicy`` and
+``PanelCodeResolver`` from ``Nuform.Core`` closely enough to match them line
+for line, including where the C# switches between ``double`` and ``decimal``
+arithmetic. The part catalog is read once from ``Nuform.Core/Data/parts.csv``
+and indexed by (category, colour, length), so every lookup is a dict hit.
+
+``Nuform.Tests/Golden/bom_cases.json`` holds BOMs produced by the C#
+``BomService``; ``BomGoldenTests.cs`` keeps it honest on the .NET side and
+``python -m utils.bom --golden`` checks this module against it.
+
+    python -m utils.bom --golden
+    python -m utils.bom --bench 20000
+    python -m utils.bom runs/J-20250814-001/job.json
+"""
+from __future__ import annotations
+
+import csv
+import math
+import pathlib
+import re
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from utils.geometry import poly_points, perimeter as poly_perimeter
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+PARTS_CSV = ROOT / "Nuform.Core" / "Data" / "parts.csv"
+GOLDEN = ROOT / "Nuform.Tests" / "Golden" / "bom_cases.json"
+
+DEFAULT_EXTRA_PERCENT = 5.0
+WARN_WHEN_ROUNDED_EXCEEDS_PERCENT = 7.5
+STD_LENGTHS = (10, 12, 14, 16, 18, 20)
+
+LENGTH_LETTER = {10: "B", 12: "C", 14: "D", 16: "E", 18: "F", 20: "G"}
+# Colour enum name (as the C# prints it), SKU suffix, catalog name.
+COLORS = {
+    "BRIGHT WHITE": ("BrightWhite", "BW"),
+    "NUFORM WHITE": ("NuformWhite", "WH"),
+    "BLACK": ("Black", "BK"),
+    "GRAY": ("Gray", "GA"),
+    "TAN": ("Tan", "TN"),
+}
+PIECES_PER_PACKAGE = {
+    "J": 10, "F": 10, "H": 5, "InsideCorner": 5, "OutsideCorner": 5, "DripEdge": 10,
+    "Cove": 5, "CrownBaseBase": 5, "CrownBaseCap": 5, "Transition": 10,
+}
+# F-Trim ("Transition") has no part numbers of its own and ships as J-Trim.
+TRIM_CATEGORY = {
+    "J": "J", "InsideCorner": "CornerInside", "OutsideCorner": "CornerOutside", "Transition": "J",
+    "DripEdge": "DripEdge", "Cove": "Cove", "CrownBaseBase": "CrownBaseBase",
+    "CrownBaseCap": "CrownBaseCap", "H": "H", "F": "J",
+}
+CORNERS = ("InsideCorner", "OutsideCorner")
+
+
+# -- inputs and results --------------------------------------------------------
+
+
+@dataclass
+class OpeningInput:
+    type: str = "custom"
+    width: float = 0.0
+    height: float = 0.0
+    count: int = 1
+    treatment: str = "BUTT"  # or "WRAPPED"
+    header_height_ft: float = 0.0
+    sill_height_ft: float = 0.0
+
+
+@dataclass
+class BuildingInput:
+    """Same fields and defaults as ``Nuform.Core.Domain.BuildingInput``.
+
+    ``perimeter_ft`` and ``inside_corners`` are Python-only overrides for
+    footprints that are not a plain rectangle; left as ``None`` the C# rules
+    (``2 * (L + W)`` and four corners per room) apply.
+    """
+
+    mode: str = "ROOM"
+    length: float = 0.0
+    width: float = 0.0
+    height: float = 0.0
+    openings: list[OpeningInput] = field(default_factory=list)
+    panel_coverage_width_ft: float = 1.0
+    extra_percent: Optional[float] = None
+    j_trim_enabled: bool = True
+    ceiling_transition: Optional[str] = None  # "crown-base" | "cove" | "f-trim"
+    include_ceiling_panels: bool = False
+    include_wall_screws: bool = True
+    include_ceiling_screws: bool = True
+    include_plugs: bool = True
+    include_spacers: bool = True
+    include_expansion_tool: bool = True
+    wall_panel_series: str = "R3"
+    wall_panel_width_inches: int = 12
+    wall_panel_length_ft: float = 12.0
+    wall_panel_color: str = "NUFORM WHITE"
+    ceiling_panel_series: str = "R3"
+    ceiling_panel_width_inches: int = 12
+    ceiling_panel_length_ft: float = 12.0
+    ceiling_panel_color: str = "NUFORM WHITE"
+    ceiling_orientation: str = "Lengthwise"  # or "Widthwise"
+    perimeter_ft: Optional[float] = None
+    inside_corners: Optional[int] = None
+
+
+@dataclass
+class PanelCalc:
+    base_panels: int
+    extra_percent_applied: float
+    rounded_panels: int
+    overage_percent_rounded: float
+    warn_exceeds_configured: bool
+    manual_extra_override: bool
+
+
+@dataclass
+class TrimCalc:
+    j_trim_lf: float
+    ceiling_trim_lf: float
+    ceiling_transition: Optional[str]
+
+
+@dataclass
+class BomLine:
+    part_number: str
+    name: str
+    quantity: float
+    unit: str
+    category: str
+    overage: float = 0.0
+
+
+@dataclass
+class Estimate:
+    panels: PanelCalc
+    trims: TrimCalc
+    inside_corners: int
+    bom: list[BomLine]
+    missing: list[str]  # what BomService would have reported on stderr
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# -- catalog -------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class PartSpec:
+    part_number: str
+    description: str
+    units: str
+    pack_pieces: int
+    length_ft: float
+    color: str
+    category: str
+
+
+class Catalog:
+    """``parts.csv`` indexed by part number and by (category, colour, length)."""
+
+    def __init__(self, path: str | pathlib.Path = PARTS_CSV):
+        parts: dict[str, PartSpec] = {}
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = csv.reader(f)
+            next(rows, None)
+            for cols in rows:
+                if len(cols) < 7:
+                    continue
+                cols = [c.strip() for c in cols]
+                parts[cols[0].upper()] = PartSpec(
+                    cols[0], cols[1], cols[2], int(cols[3]), float(cols[4]), cols[5], cols[6]
+                )
+        self.parts = parts
+        self._index: dict[tuple[str, str, float], PartSpec] = {}
+        for spec in parts.values():
+            # First in file order wins, as with the C# closest-length search.
+            self._index.setdefault((spec.category.upper(), spec.color.upper(), round(spec.length_ft, 2)), spec)
+
+    def find(self, color: str, category: str, length_ft: float) -> Optional[PartSpec]:
+        """The part of exactly this category, colour and length, or ``None``."""
+        return self._index.get((category.upper(), color.upper(), round(float(length_ft), 2)))
+
+    def hardware(self, code: str) -> PartSpec:
+        try:
+            return self.parts[code.upper()]
+        except KeyError:
+            raise KeyError(f"Hardware SKU not found: {code}") from None
+
+
+@lru_cache(maxsize=None)
+def get_catalog(path: str = str(PARTS_CSV)) -> Catalog:
+    return Catalog(path)
+
+
+# -- small ports of the C# helpers ----------------------------------------------
+
+
+def parse_color(color: str) -> str:
+    """``PanelCodeResolver.ParseColor``, returning the catalog colour name."""
+    if not color or not color.strip():
+        return "NUFORM WHITE"
+    key = re.sub(r"\s+", " ", re.sub(r"[-_]+", " ", color.strip().upper()))
+    if key == "GREY":
+        key = "GRAY"
+    return key if key in COLORS else "NUFORM WHITE"
+
+
+def panel_sku(width_inches: int, length_ft: int, color: str) -> Optional[tuple[str, str]]:
+    """``PanelCodeResolver.PanelSku``; ``None`` where the C# throws."""
+    letter = LENGTH_LETTER.get(length_ft)
+    if letter is None:
+        return None
+    enum_name, suffix = COLORS[color]
+    if width_inches == 18:
+        return f"GELPRO{letter}A{suffix}", f'RELINE PRO 18" Panel ({enum_name}) {length_ft}′'
+    return f"GEL2PL{letter}A{suffix}", f'RELINE R3 12" Panel ({enum_name}) {length_ft}′'
+
+
+def round_panels(qty: float) -> int:
+    return math.ceil(qty / 2.0) * 2 if qty <= 150 else math.ceil(qty / 5.0) * 5
+
+
+def _dec(x: float) -> Decimal:
+    # C#'s (decimal)double keeps 15 significant digits.
+    return Decimal(format(x, ".15g"))
+
+
+def _round_up_std(ft: Decimal) -> int:
+    v = min(max(math.ceil(ft), 10), 20)
+    return v + 1 if v % 2 else v
+
+
+def decide_trim_length(kind: str, any_panel_over_12: bool, required_lf: float) -> int:
+    """``TrimPolicy.DecideTrimLengthFeet`` with the policy's own pack sizes."""
+    if kind in CORNERS and any_panel_over_12:
+        return 16
+    if not any_panel_over_12:
+        return 12
+    pcs = PIECES_PER_PACKAGE[kind]
+    packs16 = math.ceil(required_lf / (pcs * 16.0))
+    packs12 = math.ceil(required_lf / (pcs * 12.0))
+    waste16 = 0.0 if packs16 == 0 else (packs16 * pcs * 16.0 - required_lf) / (packs16 * pcs * 16.0)
+    waste12 = 0.0 if packs12 == 0 else (packs12 * pcs * 12.0 - required_lf) / (packs12 * pcs * 12.0)
+    if waste16 > 0.55 and waste12 <= 0.40:
+        return 12
+    return 16
+
+
+def wall_perimeter(inp: BuildingInput) -> float:
+    if inp.perimeter_ft is not None:
+        return inp.perimeter_ft
+    return 2 * (inp.length + inp.width) if inp.mode == "ROOM" else inp.length
+
+
+def compute_inside_corners(inp: BuildingInput) -> int:
+    if inp.inside_corners is not None:
+        return inp.inside_corners
+    if inp.mode == "ROOM" and inp.length > 1 and inp.width > 1:
+        return 4
+    return 0
+
+
+# -- CalcService.CalcEstimate ----------------------------------------------------
+
+
+def calc_estimate(inp: BuildingInput) -> tuple[PanelCalc, TrimCalc, int]:
+    per = wall_perimeter(inp)
+    butt_per = width_lf = header_lf = 0.0
+    panel_width = inp.panel_coverage_width_ft
+    for op in inp.openings:
+        if op.treatment == "WRAPPED":
+            continue
+        butt_per += 2 * (op.width + op.height) * op.count
+        width_lf += op.width * op.count
+        header_and_sill = max(0.0, op.header_height_ft) + max(0.0, op.sill_height_ft)
+        if header_and_sill > 0:
+            pieces_per_full = inp.wall_panel_length_ft / header_and_sill
+            if pieces_per_full > 0:
+                header_lf += (op.width * op.count) / pieces_per_full * panel_width
+
+    net = per - width_lf + header_lf
+    extra = DEFAULT_EXTRA_PERCENT if inp.extra_percent is None else inp.extra_percent
+    with_extra = net * (1 + extra / 100.0)
+    base = math.ceil(with_extra / panel_width)
+    rounded = round_panels(base)
+    overage = 0.0 if rounded == 0 else (rounded * panel_width - with_extra) / (rounded * panel_width) * 100.0
+    panels = PanelCalc(
+        base, extra, rounded, overage, overage > WARN_WHEN_ROUNDED_EXCEEDS_PERCENT, extra != DEFAULT_EXTRA_PERCENT
+    )
+
+    j_lf = 0.0
+    if inp.j_trim_enabled:
+        j_lf = (1 if inp.ceiling_transition is not None else 3) * per + butt_per
+    ceiling_lf = per if inp.ceiling_transition is not None else 0.0
+    return panels, TrimCalc(j_lf, ceiling_lf, inp.ceiling_transition), compute_inside_corners(inp)
+
+
+# -- BomService.Build ------------------------------------------------------------
+
+
+def _ceiling(inp: BuildingInput) -> tuple[int, int, int, float]:
+    """Ceiling panel quantity, ship length, rows and H-Trim LF, in decimal like the C#."""
+    ft_per_panel = Decimal("1.5") if inp.ceiling_panel_width_inches == 18 else Decimal(1)
+    length, width = _dec(inp.length), _dec(inp.width)
+    extra = _dec(DEFAULT_EXTRA_PERCENT if inp.extra_percent is None else inp.extra_percent)
+
+    if inp.ceiling_orientation != "Lengthwise" and width <= 25:
+        ship = math.ceil(width) if width > 20 else _round_up_std(width)
+        rows = 1
+        total = math.ceil(length / ft_per_panel)
+    else:
+        per_row = math.ceil(width / ft_per_panel)
+        # BomService reads CeilingPanelLengthFt by reflection; an even 10-20 ft value wins.
+        user_len = math.ceil(_dec(inp.ceiling_panel_length_ft))
+        if 10 <= user_len <= 20 and user_len % 2 == 0:
+            ship = user_len
+            rows = math.ceil(length / ship)
+        else:
+            min_rows = math.ceil(length / 20)
+            max_rows = max(math.ceil(length / 10), min_rows)
+            rows, ship, best = min_rows, 20, None
+            for r in range(min_rows, max_rows + 1):
+                s = _round_up_std(length / r)
+                waste = r * s - length
+                if best is None or waste < best or (abs(waste - best) < Decimal("0.0001") and s > ship):
+                    best, ship, rows = waste, s, r
+        total = per_row * rows
+    qty = round_panels(math.ceil(total * (1 + extra / 100)))
+    h_lf = float(max(0, rows - 1) * width) if rows > 1 else 0.0
+    return qty, ship, rows, h_lf
+
+
+def _add_lf(lfs: dict, key: tuple[str, str], lf: float) -> None:
+    if lf > 0:
+        lfs[key] = lfs.get(key, 0.0) + lf
+
+
+def build_bom(
+    inp: BuildingInput, panels: PanelCalc, trims: TrimCalc, catalog: Catalog
+) -> tuple[list[BomLine], list[str]]:
+    bom: list[BomLine] = []
+    missing: list[str] = []
+    wall_color = parse_color(inp.wall_panel_color)
+    ceiling_color = parse_color(inp.ceiling_panel_color)
+
+    wall_panel_lf = 0.0
+    sku = panel_sku(inp.wall_panel_width_inches, int(inp.wall_panel_length_ft), wall_color)
+    if sku is None:
+        missing.append("Missing panel specification")
+    else:
+        bom.append(BomLine(sku[0], sku[1], panels.rounded_panels, "PCS", "Panels"))
+        wall_panel_lf = panels.rounded_panels * int(inp.wall_panel_length_ft)
+
+    wall_lf: dict[tuple[str, str], float] = {}
+    ceiling_lf: dict[tuple[str, str], float] = {}
+    ceiling_ship = 0
+    ceiling_panel_lf = 0.0
+    if inp.include_ceiling_panels:
+        qty, ceiling_ship, _, h_lf = _ceiling(inp)
+        sku = panel_sku(inp.ceiling_panel_width_inches, ceiling_ship, ceiling_color)
+        if sku is None:
+            missing.append("Missing ceiling panel specification")
+        else:
+            bom.append(BomLine(sku[0], sku[1], qty, "PCS", "Panels"))
+            ceiling_panel_lf = qty * ceiling_ship
+        _add_lf(ceiling_lf, ("H", ceiling_color), h_lf)
+
+    per = wall_perimeter(inp)
+    butt_per = sum(2 * (o.width + o.height) * o.count for o in inp.openings if o.treatment != "WRAPPED")
+    wrapped_per = sum(2 * (o.width + o.height) * o.count for o in inp.openings if o.treatment == "WRAPPED")
+    if inp.j_trim_enabled:
+        j_lf = per + butt_per + wrapped_per
+        _add_lf(wall_lf, ("J", wall_color), j_lf)
+        if inp.include_ceiling_panels and trims.ceiling_transition is None:
+            # Without a transition trim, J-Trim also runs the top and ceiling tracks.
+            _add_lf(wall_lf, ("J", wall_color), j_lf * 2.0)
+        _add_lf(wall_lf, ("OutsideCorner", wall_color), wrapped_per)
+
+    corners = compute_inside_corners(inp)
+    if corners > 0:
+        _add_lf(wall_lf, ("InsideCorner", wall_color), corners * inp.height)
+
+    transition = {"cove": ("Cove",), "crown-base": ("CrownBaseBase", "CrownBaseCap"), "f-trim": ("Transition",)}
+    for kind in transition.get(trims.ceiling_transition, ()):
+        _add_lf(ceiling_lf, (kind, ceiling_color), per)
+
+    for lfs, over_12 in ((wall_lf, inp.wall_panel_length_ft > 12), (ceiling_lf, ceiling_ship > 12)):
+        for (kind, color), lf in lfs.items():
+            length = decide_trim_length(kind, over_12, lf)
+            category = TRIM_CATEGORY[kind]
+            spec = catalog.find(color, category, length) or catalog.find("BRIGHT WHITE", category, length)
+            if spec is None:
+                missing.append(f"Missing {kind} specification")
+                continue
+            packs = math.ceil(lf / (spec.pack_pieces * length))
+            provided = packs * (spec.pack_pieces * length)
+            bom.append(BomLine(spec.part_number, spec.description, packs, spec.units, spec.category, provided - lf))
+
+    trim_lf = sum(wall_lf.values()) + sum(ceiling_lf.values())
+    for enabled, panel_lf, divisor, code in (
+        (inp.include_wall_screws, wall_panel_lf, 2.0, "HPR016AANA"),
+        (inp.include_ceiling_screws, ceiling_panel_lf, 1.5, "HPR017AANA"),
+    ):
+        if not enabled:
+            continue
+        pkgs = calc_screw_packages(panel_lf, trim_lf, divisor)
+        if pkgs > 0:
+            spec = catalog.hardware(code)
+            over = pkgs * 500 - (panel_lf + trim_lf) / divisor
+            bom.append(BomLine(spec.part_number, spec.description, pkgs, spec.units, "Screws", over))
+
+    accessories = []
+    if inp.include_plugs:
+        plug = {"BLACK": "GEL1PPAABK", "BRIGHT WHITE": "GEL1PPAABW"}.get(inp.wall_panel_color.upper(), "GEL1PPAAWH")
+        accessories.append(plug)
+    if inp.include_spacers:
+        accessories.append("GEL1PSADWH")
+    if inp.include_expansion_tool:
+        accessories.append("HPR018AENA")
+    for code in accessories:
+        spec = catalog.hardware(code)
+        bom.append(BomLine(spec.part_number, spec.description, 1, spec.units, "Accessories"))
+    return bom, missing
+
+
+def calc_screw_packages(panel_lf: float, trim_lf: float, divisor: float) -> int:
+    return math.ceil((panel_lf + trim_lf) / divisor / 500.0)
+
+
+def estimate(inp: BuildingInput, catalog: Optional[Catalog] = None) -> Estimate:
+    panels, trims, corners = calc_estimate(inp)
+    bom, missing = build_bom(inp, panels, trims, catalog or get_catalog())
+    return Estimate(panels, trims, corners, bom, missing)
+
+
+# -- JobBundle -> BuildingInput --------------------------------------------------
+
+
+def _get(obj, key):
+    return obj[key] if isinstance(obj, dict) else getattr(obj, key)
+
+
+def _footprint_shape(segments) -> tuple[float, float, float, int]:
+    """Bounding-box length and width, closed perimeter and convex corner count."""
+    segs = [{"length_ft": _get(s, "length_ft"), "angle_deg": _get(s, "angle_deg")} for s in segments]
+    pts = poly_points((0.0, 0.0), segs)
+    xs, ys = [p[0] for p in pts], [p[1] for p in pts]
+    ring = pts[:-1] if math.isclose(pts[0][0], pts[-1][0], abs_tol=1e-6) and math.isclose(
+        pts[0][1], pts[-1][1], abs_tol=1e-6
+    ) else pts
+    n = len(ring)
+    area2 = sum(ring[i][0] * ring[(i + 1) % n][1] - ring[(i + 1) % n][0] * ring[i][1] for i in range(n))
+    corners = 0
+    for i in range(n):
+        (ax, ay), (bx, by), (cx, cy) = ring[i - 1], ring[i], ring[(i + 1) % n]
+        cross = (bx - ax) * (cy - by) - (by - ay) * (cx - bx)
+        # Turning with the winding is a convex vertex, i.e. an inside corner of the room.
+        if abs(cross) > 1e-9 and (cross > 0) == (area2 > 0):
+            corners += 1
+    return max(xs) - min(xs), max(ys) - min(ys), poly_perimeter(pts), corners
+
+
+def input_from_bundle(bundle) -> BuildingInput:
+    """Map a ``JobBundle`` (model or plain dict) onto calculator input.
+
+    Wall panels are picked as the shortest stock length that covers the
+    building height, RELINE PRO materials get 18" panels and every opening
+    is treated as a single butt-trimmed opening. Footprints with segments
+    carry their own perimeter and corner count; an empty footprint stays a
+    zero-sized room exactly as the desktop calculator would see it.
+    """
+    building, footprint = _get(bundle, "building"), _get(bundle, "footprint")
+    height = float(_get(building, "height_ft"))
+    material = re.sub(r"[^A-Z0-9]", "", str(_get(building, "material")).upper())
+    panel_length = next((n for n in STD_LENGTHS if n >= height), STD_LENGTHS[-1]) if height > 0 else 12
+    inp = BuildingInput(
+        height=height,
+        wall_panel_width_inches=18 if "RELINEPRO" in material or "PRO18" in material else 12,
+        wall_panel_length_ft=float(panel_length),
+        openings=[
+            OpeningInput(type=_get(o, "type"), width=float(_get(o, "width_ft")), height=float(_get(o, "height_ft")))
+            for o in _get(footprint, "openings")
+        ],
+    )
+    segments = _get(footprint, "segments")
+    if segments:
+        inp.length, inp.width, inp.perimeter_ft, inp.inside_corners = _footprint_shape(segments)
+    return inp
+
+
+def estimate_bundle(bundle, catalog: Optional[Catalog] = None) -> Estimate:
+    return estimate(input_from_bundle(bundle), catalog)
+
+
+def _estimate_chunk(bundles: list) -> list[Estimate]:
+    catalog = get_catalog()
+    return [estimate_bundle(b, catalog) for b in bundles]
+
+
+def estimate_batch(bundles: Iterable, workers: int = 0, chunksize: int = 2000) -> list[Estimate]:
+    """Estimate many bundles against one shared catalog.
+
+    With ``workers > 1`` chunks are spread over a process pool; each worker
+    loads the catalog once. Results keep the input order.
+    """
+    bundles = list(bundles)
+    if workers <= 1 or len(bundles) <= chunksize:
+        return _estimate_chunk(bundles)
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = [bundles[i : i + chunksize] for i in range(0, len(bundles), chunksize)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=get_catalog) as ex:
+        return [e for part in ex.map(_estimate_chunk, chunks) for e in part]
+
+
+# -- golden cases -----------------------------------------------------------------
+
+
+def _snake(name: str) -> str:
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", name).lower()
+
+
+def input_from_csharp(data: dict) -> BuildingInput:
+    """A ``BuildingInput`` serialized by System.Text.Json (PascalCase, string enums)."""
+    kwargs = {}
+    for key, value in data.items():
+        if key == "Trims":
+            kwargs["j_trim_enabled"] = value.get("JTrimEnabled", True)
+            kwargs["ceiling_transition"] = value.get("CeilingTransition")
+        elif key == "Openings":
+            kwargs["openings"] = [OpeningInput(**{_snake(k): v for k, v in o.items()}) for o in value]
+        else:
+            kwargs[_snake(key)] = value
+    return BuildingInput(**kwargs)
+
+
+def check_golden(path: str | pathlib.Path = GOLDEN, tol: float = 1e-6) -> int:
+    """Compare every golden case with this module; returns the number checked."""
+    import json
+
+    cases = json.loads(pathlib.Path(path).read_text(encoding="utf-8"))
+    catalog = get_catalog()
+    for case in cases:
+        inp = input_from_csharp(case["input"])
+        if case.get("source"):
+            from schema.job_schema import JobBundle
+
+            mapped = input_from_bundle(JobBundle.from_json(str(ROOT / case["source"])))
+            assert mapped == inp, f"{case['name']}: {case['source']} maps to {mapped}, golden input is {inp}"
+        got = estimate(inp, catalog)
+        want = case["expected"]
+        assert got.panels.base_panels == want["basePanels"], case["name"]
+        assert got.panels.rounded_panels == want["roundedPanels"], case["name"]
+        assert math.isclose(got.trims.j_trim_lf, want["jTrimLF"], abs_tol=tol), case["name"]
+        assert got.inside_corners == want["insideCorners"], case["name"]
+        assert bool(got.missing) == want["missing"], (case["name"], got.missing)
+        assert len(got.bom) == len(want["bom"]), (case["name"], got.bom)
+        for line, exp in zip(got.bom, want["bom"]):
+            assert (line.part_number, line.name, line.unit, line.category) == (
+                exp["partNumber"], exp["name"], exp["unit"], exp["category"]
+            ), (case["name"], line, exp)
+            assert math.isclose(line.quantity, exp["quantity"], abs_tol=tol), (case["name"], line, exp)
+            assert math.isclose(line.overage, exp["overage"], abs_tol=1e-4), (case["name"], line, exp)
+    return len(cases)
+
+
+def _random_bundles(count: int, seed: int = 7) -> list[dict]:
+    import random
+
+    rng = random.Random(seed)
+    out = []
+    for i in range(count):
+        length, width = rng.uniform(20, 400), rng.uniform(20, 300)
+        segments = [
+            {"length_ft": length, "angle_deg": 0}, {"length_ft": width, "angle_deg": 90},
+            {"length_ft": length, "angle_deg": 180}, {"length_ft": width, "angle_deg": 270},
+        ]
+        openings = [
+            {"type": "door", "width_ft": rng.choice((3, 12, 14)), "height_ft": rng.choice((7, 12, 14)),
+             "wall_index": rng.randrange(4), "offset_ft": 1.0}
+            for _ in range(rng.randrange(4))
+        ]
+        out.append({
+            "building": {"type": "Warehouse", "material": rng.choice(("RELINEPRO", "R3")), "height_ft": rng.uniform(8, 24)},
+            "footprint": {"origin": (0.0, 0.0), "segments": segments, "openings": openings},
+        })
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    ap = argparse.ArgumentParser(description="Headless Nuform BOM calculator.")
+    ap.add_argument("jobs", nargs="*", help="job.json files to estimate")
+    ap.add_argument("--golden", action="store_true", help="check against the C# golden cases")
+    ap.add_argument("--bench", type=int, metavar="N", help="time N random bundles")
+    ap.add_argument("--workers", type=int, default=0)
+    a = ap.parse_args()
+
+    if a.golden:
+        print(f"bom golden OK ({check_golden()} cases)")
+    if a.bench:
+        bundles = _random_bundles(a.bench)
+        t0 = time.perf_counter()
+        get_catalog()
+        t_catalog = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        results = estimate_batch(bundles, workers=a.workers)
+        elapsed = time.perf_counter() - t0
+        print(
+            f"{len(results)} bundles in {elapsed * 1e3:.1f} ms ({len(results) / elapsed:,.0f}/s, "
+            f"catalog load {t_catalog * 1e3:.1f} ms)"
+        )
+    if a.jobs:
+        from schema.job_schema import JobBundle
+
+        for path in a.jobs:
+            print(json.dumps(estimate_bundle(JobBundle.from_json(path)).to_dict(), indent=2, ensure_ascii=False))
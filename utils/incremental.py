@@ -0,0 +1,453 @@
+"""Incremental re-estimation: after an edit, recompute only the walls it touched.
+
+Each wall is keyed by its segment, the openings on it and the building
+height. The key is a plain tuple, so it is its own hash. ``WallCache``
+memoizes the per-wall work under that key: opening placement, net run,
+net area, spans and opening sums. A wall that is unchanged, or changed
+back, costs one dict lookup. Footprint-wide quantities come from a
+segment tree over the walls, so a changed wall refreshes them in
+O(log n): closure, shoelace area, bounding box, inside corners and the
+totals. The BOM is then calculated from those totals without touching
+the walls again.
+
+``FootprintState.update(bundle)`` returns a :class:`Diff` naming the
+walls, quantities and BOM lines that changed; ``set_wall`` edits one wall
+without re-reading the bundle. ``diff_bundles`` compares two versions.
+
+    python -m utils.incremental --walls 400 --openings 800
+"""
+from __future__ import annotations
+
+import math
+import operator
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+from utils import bom
+from utils.geometry import OpeningIssue, place_wall
+
+WALL_CACHE_SIZE = 100_000
+TURN_EPS = 1e-9  # same threshold as bom._footprint_shape
+
+
+@dataclass(frozen=True)
+class WallResult:
+    dx: float
+    dy: float
+    length_ft: float
+    net_length_ft: float
+    net_area_sqft: float
+    spans: tuple
+    opening_count: int
+    opening_width_ft: float
+    opening_height_ft: float
+    issues: tuple  # OpeningIssue with indexes local to the wall's sorted openings
+
+
+class WallCache:
+    """LRU of :class:`WallResult` by wall key; share one across bundles and versions."""
+
+    def __init__(self, maxsize: int = WALL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key: tuple) -> WallResult:
+        res = self._data.get(key)
+        if res is not None:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return res
+        self.misses += 1
+        res = self._data[key] = _compute_wall(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return res
+
+
+_default_cache = WallCache()
+
+
+OPENING_FIELDS = ("offset_ft", "width_ft", "height_ft", "type", "wall_index")
+SEGMENT_FIELDS = ("length_ft", "angle_deg")
+
+
+def _rows(objs: list, names: tuple) -> list[tuple]:
+    # One getter for the whole list instead of a dict-or-model check per field.
+    if not objs:
+        return []
+    get = operator.itemgetter(*names) if isinstance(objs[0], dict) else operator.attrgetter(*names)
+    return [get(o) for o in objs]
+
+
+def _opening_key(row: tuple) -> tuple:
+    offset, width, height, kind = row[:4]
+    return (float(offset), float(width), float(height), str(kind))
+
+
+def wall_key(segment, openings: list, height_ft: float) -> tuple:
+    """``(length, angle, height, openings sorted by offset)``; ``openings`` are this wall's only."""
+    (length, angle), = _rows([segment], SEGMENT_FIELDS)
+    return (float(length), float(angle), float(height_ft),
+            tuple(sorted(_opening_key(r) for r in _rows(openings, OPENING_FIELDS))))
+
+
+def _compute_wall(key: tuple) -> WallResult:
+    length, angle, height, ops = key
+    rad = math.radians(angle)
+    placed = [{"offset_ft": o, "width_ft": w, "height_ft": h} for o, w, h, _ in ops]
+    net, issues = place_wall(0, length, height, placed, range(len(placed)))
+    return WallResult(
+        dx=length * math.cos(rad),
+        dy=length * math.sin(rad),
+        length_ft=abs(length),
+        net_length_ft=net.net_length_ft,
+        net_area_sqft=net.net_area_sqft,
+        spans=tuple(net.spans),
+        opening_count=len(ops),
+        opening_width_ft=math.fsum(w for _, w, _, _ in ops),
+        opening_height_ft=math.fsum(h for _, _, h, _ in ops),
+        issues=tuple(issues),
+    )
+
+
+# -- segment tree over walls ----------------------------------------------------------
+#
+# A node summarizes a run of consecutive walls relative to the run's start:
+# (sum dx, sum dy, shoelace cross sum, min/max x, min/max y of the points,
+#  wall length, net length, net area, openings, opening width, opening height,
+#  left turns, right turns, first vector, last vector).
+
+SX, SY, CROSS, MINX, MAXX, MINY, MAXY, LEN, NET, AREA, NOPEN, OPW, OPH, LEFT, RIGHT, FIRST, LAST = range(17)
+
+
+def _leaf(w: WallResult) -> tuple:
+    v = (w.dx, w.dy)
+    return (w.dx, w.dy, 0.0, w.dx, w.dx, w.dy, w.dy, w.length_ft, w.net_length_ft, w.net_area_sqft,
+            w.opening_count, w.opening_width_ft, w.opening_height_ft, 0, 0, v, v)
+
+
+def _turn(u, v) -> int:
+    c = u[0] * v[1] - u[1] * v[0]
+    return 0 if abs(c) <= TURN_EPS else (1 if c > 0 else -1)
+
+
+def _combine(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    ax, ay = a[SX], a[SY]
+    t = _turn(a[LAST], b[FIRST])
+    return (
+        ax + b[SX], ay + b[SY], a[CROSS] + b[CROSS] + ax * b[SY] - ay * b[SX],
+        min(a[MINX], ax + b[MINX]), max(a[MAXX], ax + b[MAXX]),
+        min(a[MINY], ay + b[MINY]), max(a[MAXY], ay + b[MAXY]),
+        a[LEN] + b[LEN], a[NET] + b[NET], a[AREA] + b[AREA],
+        a[NOPEN] + b[NOPEN], a[OPW] + b[OPW], a[OPH] + b[OPH],
+        a[LEFT] + b[LEFT] + (t > 0), a[RIGHT] + b[RIGHT] + (t < 0), a[FIRST], b[LAST],
+    )
+
+
+class _Tree:
+    def __init__(self, leaves: list):
+        size = 1
+        while size < len(leaves):
+            size *= 2
+        self.size = size
+        self.t = [None] * (2 * size)
+        self.t[size:size + len(leaves)] = leaves
+        for i in range(size - 1, 0, -1):
+            self.t[i] = _combine(self.t[2 * i], self.t[2 * i + 1])
+
+    def set(self, i: int, leaf: tuple) -> None:
+        i += self.size
+        self.t[i] = leaf
+        i //= 2
+        while i:
+            self.t[i] = _combine(self.t[2 * i], self.t[2 * i + 1])
+            i //= 2
+
+    @property
+    def root(self):
+        return self.t[1]
+
+
+# -- state -----------------------------------------------------------------------------
+
+
+@dataclass
+class Diff:
+    walls: list[int]  # walls whose result changed, by index in the new version
+    quantities: dict[str, tuple] = field(default_factory=dict)  # name -> (old, new)
+    bom: dict[str, tuple] = field(default_factory=dict)  # part number -> (old qty, new qty)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.walls or self.quantities or self.bom)
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-12, abs_tol=1e-9)
+    return a == b
+
+
+class FootprintState:
+    """Derived quantities of one bundle's footprint, kept current wall by wall."""
+
+    def __init__(self, cache: Optional[WallCache] = None):
+        self.cache = cache or _default_cache
+        self.height = 0.0
+        self.material = ""
+        self.keys: list[tuple] = []
+        self.walls: list[WallResult] = []
+        self.orders: list[list[int]] = []  # per wall: global opening indexes in key order
+        self.unplaced: list[tuple[int, int, float, float]] = []  # (opening, wall_index, width, height)
+        self._tree = _Tree([])
+        self._estimate: Optional[bom.Estimate] = None
+
+    # -- updates -------------------------------------------------------------------
+
+    def update(self, bundle, with_bom: bool = False) -> Diff:
+        """Bring the state up to ``bundle`` (model or dict), recomputing only changed walls."""
+        g = bom._get
+        building, footprint = g(bundle, "building"), g(bundle, "footprint")
+        segments = _rows(list(g(footprint, "segments")), SEGMENT_FIELDS)
+        openings = _rows(list(g(footprint, "openings")), OPENING_FIELDS)
+        before = self.quantities()
+        old_bom = self._bom_lines() if with_bom else None
+
+        self.height = float(g(building, "height_ft"))
+        self.material = str(g(building, "material"))
+        per_wall: list[list[int]] = [[] for _ in segments]
+        okeys: list = [None] * len(openings)
+        self.unplaced = []
+        for i, row in enumerate(openings):
+            wi = int(row[4])
+            if 0 <= wi < len(segments):
+                per_wall[wi].append(i)
+                okeys[i] = _opening_key(row)
+            else:
+                self.unplaced.append((i, wi, float(row[1]), float(row[2])))
+
+        keys, orders = [], []
+        height = self.height
+        for (length, angle), idx in zip(segments, per_wall):
+            if len(idx) > 1:
+                idx.sort(key=okeys.__getitem__)
+            keys.append((float(length), float(angle), height, tuple(okeys[i] for i in idx)))
+            orders.append(idx)
+
+        if len(keys) != len(self.keys):
+            # Walls were added or removed: indexes shift, so rebuild the tree (O(n)).
+            changed = [i for i, k in enumerate(keys) if i >= len(self.keys) or self.keys[i] != k]
+            self.walls = [self.cache.get(k) for k in keys]
+            self._tree = _Tree([_leaf(w) for w in self.walls])
+        else:
+            changed = [i for i, (k, old) in enumerate(zip(keys, self.keys)) if k != old]
+            for i in changed:
+                self.walls[i] = self.cache.get(keys[i])
+                self._tree.set(i, _leaf(self.walls[i]))
+        self.keys, self.orders = keys, orders
+        self._estimate = None
+        return self._diff(changed, before, old_bom)
+
+    def set_wall(self, index: int, length_ft: float | None = None, angle_deg: float | None = None,
+                 with_bom: bool = False) -> Diff:
+        """Change one wall's length or angle in place: O(log n), no bundle needed."""
+        length, angle, height, ops = self.keys[index]
+        key = (float(length if length_ft is None else length_ft), float(angle if angle_deg is None else angle_deg),
+               height, ops)
+        before = self.quantities()
+        old_bom = self._bom_lines() if with_bom else None
+        changed = []
+        if key != self.keys[index]:
+            self.keys[index] = key
+            self.walls[index] = self.cache.get(key)
+            self._tree.set(index, _leaf(self.walls[index]))
+            self._estimate = None
+            changed = [index]
+        return self._diff(changed, before, old_bom)
+
+    def _diff(self, changed: list[int], before: dict, old_bom: Optional[dict]) -> Diff:
+        after = self.quantities()
+        diff = Diff(walls=changed)
+        for name in after.keys() | before.keys():
+            a, b = before.get(name), after.get(name)
+            if a is None or b is None or not _same(a, b):
+                diff.quantities[name] = (a, b)
+        if old_bom is not None:
+            new_bom = self._bom_lines()
+            for part in old_bom.keys() | new_bom.keys():
+                a, b = old_bom.get(part, 0), new_bom.get(part, 0)
+                if a != b:
+                    diff.bom[part] = (a, b)
+        return diff
+
+    # -- reads ---------------------------------------------------------------------
+
+    def quantities(self) -> dict:
+        r = self._tree.root
+        if r is None:
+            return {"walls": 0, "opening_count": len(self.unplaced)}
+        closure = math.hypot(r[SX], r[SY])
+        return {
+            "walls": len(self.walls),
+            "wall_length_ft": r[LEN],
+            "perimeter_ft": r[LEN] + (closure if r[SX] or r[SY] else 0.0),
+            "closure_error_ft": closure,
+            "area_sqft": abs(r[CROSS]) / 2.0,
+            "bbox_length_ft": max(0.0, r[MAXX]) - min(0.0, r[MINX]),
+            "bbox_width_ft": max(0.0, r[MAXY]) - min(0.0, r[MINY]),
+            "inside_corners": self._inside_corners(r, closure),
+            "net_length_ft": r[NET],
+            "net_wall_area_sqft": r[AREA],
+            "opening_count": r[NOPEN] + len(self.unplaced),
+            "issues": sum(len(w.issues) for w in self.walls) + len(self.unplaced),
+        }
+
+    def _inside_corners(self, r, closure: float) -> int:
+        # bom._footprint_shape: convex vertices of the ring, counting the closing
+        # edge as a wall when the footprint does not return to its origin.
+        left, right = r[LEFT], r[RIGHT]
+        if closure <= 1e-6:
+            t = _turn(r[LAST], r[FIRST])
+            left, right = left + (t > 0), right + (t < 0)
+        else:
+            c = (-r[SX], -r[SY])
+            for t in (_turn(r[LAST], c), _turn(c, r[FIRST])):
+                left, right = left + (t > 0), right + (t < 0)
+        return left if r[CROSS] > 0 else right if r[CROSS] < 0 else 0
+
+    def issues(self) -> list[OpeningIssue]:
+        """Placement issues, with opening and wall indexes of the current version."""
+        out = [OpeningIssue("no_wall", wi, (i,)) for i, wi, _, _ in self.unplaced]
+        for wi, (w, order) in enumerate(zip(self.walls, self.orders)):
+            out += [replace(x, wall_index=wi, openings=tuple(order[j] for j in x.openings)) for x in w.issues]
+        return out
+
+    def building_input(self) -> bom.BuildingInput:
+        """What ``bom.input_from_bundle`` would build, from the cached totals.
+
+        The openings are all butt-trimmed with no header or sill, so the
+        calculator only ever needs their summed widths and heights. They are
+        passed as one aggregate opening.
+        """
+        r = self._tree.root
+        widths = (r[OPW] if r else 0.0) + math.fsum(w for _, _, w, _ in self.unplaced)
+        heights = (r[OPH] if r else 0.0) + math.fsum(h for _, _, _, h in self.unplaced)
+        count = (r[NOPEN] if r else 0) + len(self.unplaced)
+        shell = {"building": {"height_ft": self.height, "material": self.material},
+                 "footprint": {"segments": [], "openings": []}}
+        inp = bom.input_from_bundle(shell)
+        if count:
+            inp.openings = [bom.OpeningInput(type="custom", width=widths, height=heights)]
+        if r is not None:
+            q = self.quantities()
+            inp.length, inp.width = q["bbox_length_ft"], q["bbox_width_ft"]
+            inp.perimeter_ft, inp.inside_corners = q["perimeter_ft"], q["inside_corners"]
+        return inp
+
+    def estimate(self, catalog: Optional[bom.Catalog] = None) -> bom.Estimate:
+        if self._estimate is None:
+            self._estimate = bom.estimate(self.building_input(), catalog)
+        return self._estimate
+
+    def _bom_lines(self) -> dict:
+        return {line.part_number: line.quantity for line in self.estimate().bom}
+
+
+def diff_bundles(old, new, with_bom: bool = True, cache: Optional[WallCache] = None) -> Diff:
+    """What changed between two versions of a bundle; walls shared by both are computed once."""
+    state = FootprintState(cache)
+    state.update(old)
+    return state.update(new, with_bom=with_bom)
+
+
+# -- self-check and benchmark -----------------------------------------------------------
+
+
+def _big_bundle(walls: int, openings: int, seed: int = 5) -> dict:
+    import random
+
+    rng = random.Random(seed)
+    # A closed, roughly round footprint with many short walls.
+    segs = [{"length_ft": round(rng.uniform(20, 60), 2), "angle_deg": 360.0 * k / walls} for k in range(walls)]
+    ops = [{"type": "dock", "width_ft": 9.0, "height_ft": rng.choice((10.0, 40.0)), "wall_index": rng.randrange(walls),
+            "offset_ft": round(rng.uniform(0, 50), 1)} for _ in range(openings)]
+    return {"job": {"id": "J-INCR"}, "building": {"type": "Warehouse", "material": "RELINEPRO", "height_ft": 24.0},
+            "footprint": {"origin": (0.0, 0.0), "segments": segs, "openings": ops}}
+
+
+def _check(state: FootprintState, bundle: dict) -> None:
+    from utils.geometry import place_openings
+
+    fresh = FootprintState(WallCache())
+    fresh.update(bundle)
+    for name, value in fresh.quantities().items():
+        assert _same(state.quantities()[name], value), (name, state.quantities()[name], value)
+    layout = place_openings(bundle["footprint"]["segments"], bundle["footprint"]["openings"], 24.0)
+    assert math.isclose(state.quantities()["net_wall_area_sqft"], layout.net_area_sqft, rel_tol=1e-9)
+    kinds = lambda issues: sorted((i.kind, i.wall_index) for i in issues)
+    assert kinds(state.issues()) == kinds(layout.issues)
+    want = {line.part_number: line.quantity for line in bom.estimate_bundle(bundle).bom}
+    assert state._bom_lines() == want, (state._bom_lines(), want)
+
+
+if __name__ == "__main__":
+    import argparse
+    import copy
+    import random
+    import time
+
+    ap = argparse.ArgumentParser(description="Incremental re-estimation self-check and benchmark.")
+    ap.add_argument("--walls", type=int, default=400)
+    ap.add_argument("--openings", type=int, default=800)
+    ap.add_argument("--edits", type=int, default=200)
+    a = ap.parse_args()
+
+    rng = random.Random(1)
+    bundle = _big_bundle(a.walls, a.openings)
+    state = FootprintState()
+    state.update(bundle)
+    _check(state, bundle)
+
+    for _ in range(20):  # mixed edits, each checked against a from-scratch evaluation
+        b = copy.deepcopy(bundle)
+        w = rng.randrange(a.walls)
+        b["footprint"]["segments"][w]["length_ft"] += rng.uniform(-5, 5)
+        b["footprint"]["openings"][rng.randrange(a.openings)]["wall_index"] = rng.randrange(a.walls)
+        diff = state.update(b, with_bom=True)
+        assert w in diff.walls and "perimeter_ft" in diff.quantities
+        _check(state, b)
+        bundle = b
+
+    from utils.geometry import place_openings
+
+    t0 = time.perf_counter()
+    for _ in range(a.edits):
+        bom.estimate_bundle(bundle)
+        place_openings(bundle["footprint"]["segments"], bundle["footprint"]["openings"], 24.0)
+    full = (time.perf_counter() - t0) / a.edits
+
+    t0 = time.perf_counter()
+    for i in range(a.edits):
+        bundle["footprint"]["segments"][i % a.walls]["length_ft"] += 0.5
+        state.update(bundle)
+        state.estimate()
+    rescan = (time.perf_counter() - t0) / a.edits
+
+    t0 = time.perf_counter()
+    for i in range(a.edits):
+        state.set_wall(i % a.walls, length_ft=30 + i % 7)
+        state.estimate()
+    inplace = (time.perf_counter() - t0) / a.edits
+
+    print(f"{a.walls} walls, {a.openings} openings, per single-wall edit:")
+    print(f"  from scratch      {full * 1e3:8.3f} ms")
+    print(f"  update(bundle)    {rescan * 1e3:8.3f} ms  ({full / rescan:5.1f}x)")
+    print(f"  set_wall          {inplace * 1e3:8.3f} ms  ({full / inplace:5.1f}x)")
+    print(f"  wall cache hits {state.cache.hits}, misses {state.cache.misses}")
+    print("incremental OK")